@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Time the start of fresh interpreters: importing stage modules, creating the
+providers and `main.py --help`, and whether each of them imports web3.
+
+    python3 -m benchmarks.bench_cold_start [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ("import aggregate_daily_points", ["-c", "import src.aggregate_daily_points"]),
+    ("import daily_states_and_points", ["-c", "import src.daily_states_and_points"]),
+    ("import copy_last_aggregated_points", ["-c", "import src.copy_last_aggregated_points_file_to_latest_folder"]),
+    ("import nft_events", ["-c", "import src.nft_events"]),
+    ("import and create providers", ["-c", "from src.utils.aggregated_w3_request import get_w3_instances; get_w3_instances()"]),
+    ("main.py --help", ["main.py", "--help"]),
+]
+
+
+def run(args):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {result.stderr}")
+    return time.perf_counter() - started, result
+
+
+def get_imported_modules(args):
+    """Top-level packages imported by running `args`, from -X importtime"""
+    _, result = run(["-X", "importtime", *args])
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = min(run(["-c", "pass"])[0] for _ in range(args.repeat))
+    print(f"\nInterpreter start: {baseline * 1000:.0f} ms, subtracted below")
+    print(f"  {'Command':<36} {'ms':>8}  web3")
+    for name, command in COMMANDS:
+        seconds = min(run(command)[0] for _ in range(args.repeat))
+        imports_web3 = "web3" in get_imported_modules(command)
+        print(f"  {name:<36} {(seconds - baseline) * 1000:8.0f}  {'yes' if imports_web3 else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
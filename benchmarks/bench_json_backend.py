@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of load/dump throughput for every available JSON backend.
+
+    python3 -m benchmarks.bench_json_backend [--events 5000] [--holders 20000]
+"""
+import argparse
+import time
+from src.utils import json_backend
+from src.utils.schemas import DailyStateFile, EventsFile
+from benchmarks.synthetic import make_addresses, make_events_file, make_state_file
+
+
+def available_backends():
+    backends = ["json"]
+    if json_backend.orjson is not None:
+        backends.append("orjson")
+    if json_backend.msgspec is not None:
+        backends.append("msgspec")
+    return backends
+
+
+def best_of(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench_artifact(name, document, schema, repeat):
+    reference = json_backend.dumps(document, backend="json")
+    size_mb = len(reference) / 1024 / 1024
+    print(f"\n{name}: {size_mb:.2f} MB")
+    print(f"  {'Backend':<10} {'dump MB/s':>12} {'load MB/s':>12} {'typed load MB/s':>16}")
+    for backend in available_backends():
+        encoded = json_backend.dumps(document, backend=backend)
+        assert encoded == reference, f"{backend} output differs from stdlib json"
+        assert json_backend.loads(encoded, backend=backend) == document
+
+        dump_time = best_of(lambda: json_backend.dumps(document, backend=backend), repeat)
+        load_time = best_of(lambda: json_backend.loads(encoded, backend=backend), repeat)
+        typed_time = best_of(lambda: json_backend.loads(encoded, schema=schema, backend=backend), repeat)
+        print(
+            f"  {backend:<10} {size_mb / dump_time:>12.1f} {size_mb / load_time:>12.1f} "
+            f"{size_mb / typed_time:>16.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000, help="Transfer events in the day file")
+    parser.add_argument("--holders", type=int, default=20000, help="Holders in the state file")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    holders = make_addresses(args.holders)
+    start_block = 24_000_000
+    bench_artifact("Day of events", make_events_file(args.events, holders, start_block), EventsFile, args.repeat)
+    bench_artifact("Full state file", make_state_file(holders, start_block), DailyStateFile, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
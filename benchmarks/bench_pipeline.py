@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Time the offline hot paths on synthetic data at several scales, and fail when
+they got slower than a saved baseline.
+
+    python3 -m benchmarks.bench_pipeline                                  # 10k holders, 1k events per day
+    python3 -m benchmarks.bench_pipeline --holders 10000 100000 --events 1000 50000
+    python3 -m benchmarks.bench_pipeline --save baseline.json
+    python3 -m benchmarks.bench_pipeline --compare baseline.json --threshold 0.2
+
+Every combination of --holders and --events is a scale with its own dataset
+(see synthetic.write_dataset). At each scale this times, best of --repeat:
+
+- process_event_above_user_state: replaying every event of every day,
+- read_combined_sorted_events: decoding and sorting a day's events,
+- get_points: one day's points,
+- process_daily_states: the states of every day,
+- aggregate_daily_points: the aggregated points of every day.
+
+With --compare, a metric that takes more than 1 + --threshold times its
+baseline, and at least MIN_REGRESSION_SECONDS more, fails the run. Metrics
+missing from the baseline are only printed.
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from src import daily_points_v2
+from src.aggregate_daily_points import aggregate_daily_points
+from src.daily_states_v2 import process_daily_states
+from src.utils.event_repository import event_repository
+from src.utils.json_backend import load_json, dump_json
+from src.utils.process_event_above_user_state import UserState, process_event_above_user_state
+from src.utils.read_combined_sorted_events import read_combined_sorted_events
+from benchmarks.synthetic import write_dataset
+
+THRESHOLD = 0.2
+# Slowdowns below this are timer noise, whatever their share of the baseline
+MIN_REGRESSION_SECONDS = 0.01
+
+
+def best_of(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def replay_events(days_amount):
+    user_state = defaultdict(UserState)
+    for day_index in range(days_amount):
+        for events in read_combined_sorted_events(day_index).values():
+            for event in events:
+                user_state = process_event_above_user_state(event, user_state)
+    return user_state
+
+
+def read_events_uncached(day_index):
+    event_repository.clear()
+    return read_combined_sorted_events(day_index)
+
+
+def aggregate_all_days():
+    # Without the manifests of the previous repeat no day is skipped
+    shutil.rmtree("data/manifests", ignore_errors=True)
+    aggregate_daily_points()
+
+
+def quiet(function):
+    """`function` with its progress output discarded"""
+    def run():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return function()
+    return run
+
+
+def bench_scale(holders, events, days_amount, blocks_per_day, repeat):
+    """{function: best seconds} at one scale"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        write_dataset(
+            root, days_amount=days_amount, holders_amount=holders, events_per_day=events, blocks_per_day=blocks_per_day
+        )
+        os.chdir(root)
+        event_repository.clear()
+        try:
+            results = {}
+            # Decoded events are cached, so the replay only times the state updates
+            for day_index in range(days_amount):
+                read_combined_sorted_events(day_index)
+            results["process_event_above_user_state"] = best_of(lambda: replay_events(days_amount), repeat)
+            results["read_combined_sorted_events"] = best_of(lambda: read_events_uncached(days_amount - 1), repeat)
+            results["process_daily_states"] = best_of(quiet(process_daily_states), repeat)
+            daily_points_v2.initialize_global_variables()
+            results["get_points"] = best_of(quiet(lambda: daily_points_v2.get_points(days_amount - 1)), repeat)
+            quiet(daily_points_v2.process_points)()
+            results["aggregate_daily_points"] = best_of(quiet(aggregate_all_days), repeat)
+        finally:
+            event_repository.clear()
+            os.chdir(cwd)
+    return results
+
+
+def get_metric_name(holders, events, function):
+    return f"{holders}_holders/{events}_events/{function}"
+
+
+def compare(metrics, baseline, threshold):
+    """Names of the metrics more than `threshold` slower than `baseline`"""
+    regressions = []
+    for name, seconds in metrics.items():
+        if name not in baseline:
+            print(f"  {name}: {seconds:.3f} s, not in the baseline")
+            continue
+        change = seconds / baseline[name] - 1
+        regressed = change > threshold and seconds - baseline[name] > MIN_REGRESSION_SECONDS
+        print(f"  {name}: {baseline[name]:.3f} s -> {seconds:.3f} s ({change:+.0%}){'  REGRESSED' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--holders", type=int, nargs="+", default=[10_000], help="Holder amounts to benchmark")
+    parser.add_argument("--events", type=int, nargs="+", default=[1_000], help="Events per day to benchmark")
+    parser.add_argument("--days", type=int, default=2, help="Days per dataset")
+    parser.add_argument("--blocks-per-day", type=int, default=7200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Write the metrics to this JSON file")
+    parser.add_argument("--compare", help="Fail on metrics slower than in this JSON file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed slowdown, 0.2 is 20%%")
+    args = parser.parse_args()
+
+    metrics = {}
+    for holders in args.holders:
+        for events in args.events:
+            print(f"\n{holders} holders, {events} events per day, {args.days} days of {args.blocks_per_day} blocks")
+            results = bench_scale(holders, events, args.days, args.blocks_per_day, args.repeat)
+            for function, seconds in results.items():
+                print(f"  {function:<32} {seconds:8.3f} s")
+                metrics[get_metric_name(holders, events, function)] = seconds
+
+    if args.save:
+        dump_json(metrics, args.save)
+        print(f"\nSaved {len(metrics)} metrics to {args.save}")
+    if args.compare:
+        print(f"\nCompared with {args.compare}:")
+        regressions = compare(metrics, load_json(args.compare), args.threshold)
+        if regressions:
+            raise ValueError(f"{len(regressions)} metrics regressed by more than {args.threshold:.0%}: {regressions}")
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Time the ingestion stages (find_deployment_blocks, find_daily_blocks,
+nft_events, pilot_vault_events) against a fixed RPC cassette and report
+wall-clock and RPC calls per stage.
+
+    python3 -m benchmarks.bench_rpc_stages                        # synthetic chain
+    python3 -m benchmarks.bench_rpc_stages --cassette DIR --record   # record from config.json endpoints
+    python3 -m benchmarks.bench_rpc_stages --cassette DIR            # replay DIR
+
+Without --cassette, a cassette is recorded from a seeded synthetic chain
+(see synthetic_chain.py) into a temporary directory first. Replays add
+--latency-ms +- --jitter-ms to every call.
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import tempfile
+import time
+from src import find_daily_blocks, find_deployment_blocks, nft_events, pilot_vault_events
+from src.utils import aggregated_w3_request
+from src.utils.rpc_cassette import RECORD, REPLAY, Cassette, use_cassette
+from benchmarks.synthetic_chain import SyntheticChain, SyntheticChainProvider
+
+STAGES = [
+    ("find_deployment_blocks", find_deployment_blocks.main),
+    ("find_daily_blocks", find_daily_blocks.main),
+    ("nft_events", nft_events.main),
+    ("pilot_vault_events", pilot_vault_events.main),
+]
+
+
+def run_stages(cassette, workdir, verbose=False):
+    """Run every stage in `workdir` through `cassette`; returns [(stage, seconds, calls, misses)]"""
+    results = []
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        with output, use_cassette(aggregated_w3_request.w3_instances, cassette):
+            for name, stage in STAGES:
+                cassette.reset_counts()
+                started = time.perf_counter()
+                stage()
+                results.append((name, time.perf_counter() - started, dict(cassette.calls), sum(cassette.misses.values())))
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def record_synthetic_cassette(directory, workdir, days_amount, seed, verbose=False):
+    chain = SyntheticChain(days_amount=days_amount, seed=seed)
+    original_providers = [w3.provider for w3 in aggregated_w3_request.w3_instances]
+    for w3, provider in zip(aggregated_w3_request.w3_instances, original_providers):
+        w3.provider = SyntheticChainProvider(chain, provider.endpoint_uri)
+    try:
+        return run_stages(Cassette(directory, RECORD), workdir, verbose)
+    finally:
+        for w3, provider in zip(aggregated_w3_request.w3_instances, original_providers):
+            w3.provider = provider
+
+
+def make_workdir(root, name):
+    workdir = os.path.join(root, name)
+    os.makedirs(workdir)
+    shutil.copy("config.json", os.path.join(workdir, "config.json"))
+    return workdir
+
+
+def print_results(title, results):
+    print(f"\n{title}")
+    print(f"{'stage':<24} {'seconds':>9} {'calls':>7}  by method")
+    for name, seconds, calls, misses in results:
+        by_method = ", ".join(f"{method}={amount}" for method, amount in sorted(calls.items()))
+        missed = f"  ({misses} not in cassette)" if misses else ""
+        print(f"{name:<24} {seconds:>9.3f} {sum(calls.values()):>7}  {by_method}{missed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", help="Cassette directory to replay, or to record into with --record")
+    parser.add_argument("--record", action="store_true", help="Record the cassette from the configured endpoints")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--days", type=int, default=3, help="Days of synthetic chain")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output")
+    args = parser.parse_args()
+
+    # Same routing decisions on every run
+    aggregated_w3_request.provider_manager = aggregated_w3_request.ProviderManager(seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as root:
+        if args.cassette and args.record:
+            results = run_stages(Cassette(args.cassette, RECORD), make_workdir(root, "record"), args.verbose)
+            print_results(f"Recorded {args.cassette}", results)
+            return
+        cassette_dir = args.cassette
+        if cassette_dir is None:
+            cassette_dir = os.path.join(root, "cassette")
+            results = record_synthetic_cassette(
+                cassette_dir, make_workdir(root, "record"), args.days, args.seed, args.verbose
+            )
+            print_results("Recorded synthetic chain cassette", results)
+
+        replay = Cassette(cassette_dir, REPLAY, args.latency_ms / 1000, args.jitter_ms / 1000, args.seed)
+        results = run_stages(replay, make_workdir(root, "replay"), args.verbose)
+        print_results(f"Replay with {args.latency_ms:g} +- {args.jitter_ms:g} ms per call", results)
+
+
+if __name__ == "__main__":
+    main()
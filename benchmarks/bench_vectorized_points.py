@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Compare the per-block Python points loop with the vectorized engine on a
+synthetic day.
+
+    python3 -m benchmarks.bench_vectorized_points [--holders 2000] [--events 2000]
+"""
+import argparse
+import os
+import tempfile
+import time
+from src import daily_points_v2
+from src.daily_states_v2 import process_daily_states
+from src.daily_points_vectorized import get_points_vectorized
+from benchmarks.synthetic import write_dataset
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--holders", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--blocks-per-day", type=int, default=7200)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        write_dataset(root, holders_amount=args.holders, events_per_day=args.events, blocks_per_day=args.blocks_per_day)
+        os.chdir(root)
+        try:
+            process_daily_states()
+            daily_points_v2.initialize_global_variables()
+            loop_points, loop_time = timed(lambda: daily_points_v2.get_points(0))
+            vectorized_points, vectorized_time = timed(lambda: get_points_vectorized(0))
+        finally:
+            os.chdir(cwd)
+
+    assert {a: p for a, p in loop_points.items() if p > 0} == {a: p for a, p in vectorized_points.items() if p > 0}
+    print(f"\n{args.holders} holders, {args.events} events, {args.blocks_per_day} blocks")
+    print(f"  Python loop: {loop_time:8.3f} s")
+    print(f"  Vectorized:  {vectorized_time:8.3f} s  ({loop_time / vectorized_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
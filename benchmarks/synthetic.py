@@ -0,0 +1,199 @@
+"""
+Synthetic pipeline artifacts for benchmarks.
+
+Values are shaped like mainnet data: checksummed-length hex addresses,
+18-decimal token amounts that overflow 64 bits, ~7,200 blocks per day.
+"""
+import json
+import os
+import random
+from datetime import datetime
+
+BLOCKS_PER_DAY = 7200
+ZERO_ADDRESS = "0x" + "0" * 40
+
+
+def make_addresses(amount, seed=0):
+    rng = random.Random(seed)
+    return ["0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40)) for _ in range(amount)]
+
+
+def make_transfer_events(events_amount, holders, start_block, rng):
+    """ERC-20 Transfer events spread over one day of blocks"""
+    blocks = sorted(rng.randrange(start_block, start_block + BLOCKS_PER_DAY) for _ in range(events_amount))
+    events = []
+    log_index_in_block = {}
+    for block_number in blocks:
+        log_index = log_index_in_block.get(block_number, 0)
+        log_index_in_block[block_number] = log_index + 1
+        events.append({
+            "blockNumber": block_number,
+            "transactionHash": "0x" + "%064x" % rng.getrandbits(256),
+            "logIndex": log_index,
+            "args": {
+                "from": rng.choice(holders),
+                "to": rng.choice(holders),
+                "value": rng.randrange(10**15, 10**21),
+            },
+            "transactionIndex": log_index,
+        })
+    return events
+
+
+def make_events_file(events_amount, holders, start_block, seed=0):
+    rng = random.Random(seed)
+    events = make_transfer_events(events_amount, holders, start_block, rng)
+    return {
+        "error": False,
+        "metadata": {
+            "contractAddress": "0xa260b049ddd6567e739139404c7554435c456d9e",
+            "eventName": "Transfer",
+            "startBlock": start_block,
+            "endBlock": start_block + BLOCKS_PER_DAY - 1,
+            "totalEvents": len(events),
+            "exportedAt": datetime(2025, 1, 1).isoformat(),
+        },
+        "events": events,
+    }
+
+
+def make_state_file(holders, start_block, day_index=0, nft_holders_share=0.3, seed=0):
+    rng = random.Random(seed)
+
+    def balances():
+        return {
+            address: {
+                "balance": rng.randrange(10**15, 10**22),
+                "last_positive_balance_update_block": rng.randrange(start_block - 10**5, start_block),
+                "last_negative_balance_update_block": rng.randrange(start_block - 10**5, start_block),
+            }
+            for address in holders
+        }
+
+    nft_owners = holders[: int(len(holders) * nft_holders_share)]
+    nft_state = {address: [token_id + 1] for token_id, address in enumerate(nft_owners)}
+    return {
+        "start_block": start_block,
+        "end_block": start_block + BLOCKS_PER_DAY - 1,
+        "date": "2025-01-01",
+        "day_index": day_index,
+        "nft": {"start_state": nft_state, "end_state": dict(nft_state)},
+        "pilot_vault": {"start_state": balances(), "end_state": balances()},
+    }
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def _event(block_number, log_index, args, rng):
+    return {
+        "blockNumber": block_number,
+        "transactionHash": "0x" + "%064x" % rng.getrandbits(256),
+        "logIndex": log_index,
+        "args": args,
+        "transactionIndex": log_index,
+    }
+
+
+def write_dataset(
+    root,
+    days_amount=1,
+    holders_amount=1000,
+    events_per_day=1000,
+    nft_share=0.3,
+    blocks_per_day=BLOCKS_PER_DAY,
+    seed=0,
+):
+    """
+    Write a consistent data/ directory under `root` with everything the
+    offline stages need: deployments, day boundaries, NFT and pilot vault
+    events and an LP snapshot.
+
+    Day 0 mints pilot vault tokens to every holder and one NFT to
+    `nft_share` of them; every day then has `events_per_day` transfers
+    between holders (about a tenth of them NFT transfers). Transfers never
+    overdraw a balance.
+    """
+    rng = random.Random(seed)
+    data_dir = os.path.join(root, "data")
+    first_block = 24_000_000
+    holders = make_addresses(holders_amount, seed)
+    balances = {}
+    token_owners = {}
+
+    _write_json(os.path.join(data_dir, "deployment_blocks.json"), {
+        "deployments": {
+            "nft": {"address": "0xf478f017cfe92aaf83b2963a073fabf5a5cd0244", "deployment_block": first_block, "block_number": first_block},
+            "pilot_vault": {"address": "0xa260b049ddd6567e739139404c7554435c456d9e", "deployment_block": first_block, "block_number": first_block},
+        }
+    })
+
+    for day_index in range(days_amount):
+        start_block = first_block + day_index * blocks_per_day
+        end_block = start_block + blocks_per_day - 1
+        day = f"2025-01-{day_index + 1:02d}" if day_index < 31 else f"day-{day_index}"
+        _write_json(os.path.join(data_dir, "days_blocks", f"{day_index}_{day}.json"), {
+            "day": day,
+            "last_block_of_day": {"number": end_block, "timestamp": end_block * 12, "utc_datetime": "", "hash": "0x%064x" % end_block},
+            "first_block_of_next_day": {"number": end_block + 1, "timestamp": (end_block + 1) * 12, "utc_datetime": "", "hash": "0x%064x" % (end_block + 1)},
+            "is_final_day": False,
+        })
+
+        transfer_events, nft_events = [], []
+        if day_index == 0:
+            for log_index, holder in enumerate(holders):
+                value = rng.randrange(10**18, 10**22)
+                balances[holder] = value
+                transfer_events.append(_event(start_block, log_index, {"from": ZERO_ADDRESS, "to": holder, "value": value}, rng))
+            for token_id, holder in enumerate(holders[: int(holders_amount * nft_share)], 1):
+                token_owners[token_id] = holder
+                nft_events.append(_event(start_block + 1, token_id - 1, {"from": ZERO_ADDRESS, "to": holder, "tokenId": token_id}, rng))
+
+        log_indexes = {}
+        for block_number in sorted(rng.randrange(start_block + 2, end_block + 1) for _ in range(events_per_day)):
+            log_index = log_indexes.get(block_number, 0)
+            log_indexes[block_number] = log_index + 1
+            if token_owners and rng.random() < 0.1:
+                token_id = rng.randrange(1, len(token_owners) + 1)
+                to_addr = rng.choice(holders)
+                nft_events.append(_event(block_number, log_index, {"from": token_owners[token_id], "to": to_addr, "tokenId": token_id}, rng))
+                token_owners[token_id] = to_addr
+            else:
+                from_addr, to_addr = rng.choice(holders), rng.choice(holders)
+                value = rng.randrange(0, balances[from_addr] // 10 + 1)
+                balances[from_addr] -= value
+                balances[to_addr] += value
+                transfer_events.append(_event(block_number, log_index, {"from": from_addr, "to": to_addr, "value": value}, rng))
+
+        for folder, events in (("pilot_vault", transfer_events), ("nft", nft_events)):
+            _write_json(os.path.join(data_dir, "events", folder, f"{day_index}.json"), {
+                "error": False,
+                "metadata": {
+                    "contractAddress": "",
+                    "eventName": "Transfer",
+                    "startBlock": start_block,
+                    "endBlock": end_block,
+                    "totalEvents": len(events),
+                    "exportedAt": "",
+                },
+                "events": events,
+            })
+
+    _write_json(os.path.join(data_dir, "lp_balances_snapshot.json"), {
+        "start_block": first_block + blocks_per_day // 2,
+        "end_block": first_block + blocks_per_day // 2,
+        "date": "2025-01-01",
+        "day_index": 0,
+        "nft": {"start_state": {}, "end_state": {}},
+        "pilot_vault": {
+            "start_state": {
+                holder: {"balance": 10**19, "last_positive_balance_update_block": 0, "last_negative_balance_update_block": 0}
+                for holder in holders[: holders_amount // 10]
+            },
+            "end_state": {},
+        },
+    })
+    return data_dir
@@ -0,0 +1,310 @@
+"""
+An in-process synthetic chain that answers the JSON-RPC calls the ingestion
+stages make (eth_blockNumber, eth_getBlockByNumber, eth_getCode, eth_getLogs),
+so RPC cassettes can be recorded without a network. eth_call answers the
+contracts' balanceOf, ownerOf, the NFT's totalSupply and the pilot vault's
+baseTotalSupply from the logs up to the block, and Multicall3's aggregate3
+when `multicall` is set.
+
+Blocks are 12 seconds apart starting at 2025-01-01T00:00:00Z, so every day
+has 7,200 blocks. The NFT and pilot vault contracts from config.json are
+deployed at `deployment_block`; the pilot vault mints to every holder on the
+deployment day, then both contracts get random transfers every day.
+`burn_nft(token_id, block_number)` adds an NFT burn.
+
+The `finalized` block tag trails the head by `finality_lag` blocks, and
+`reorg(from_block)` replaces every block from `from_block` on with a block
+of another hash, keeping the same logs.
+"""
+import random
+from eth_abi import decode, encode
+from eth_utils import keccak, to_checksum_address
+from web3.providers.base import JSONBaseProvider
+from benchmarks.synthetic import make_addresses
+
+GENESIS_TIMESTAMP = 1735689600  # 2025-01-01T00:00:00Z
+SECONDS_PER_BLOCK = 12
+BLOCKS_PER_DAY = 86400 // SECONDS_PER_BLOCK
+TRANSFER_TOPIC = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+NFT_ADDRESS = "0xF478F017cfe92AaF83b2963A073FaBf5A5cD0244"
+PILOT_VAULT_ADDRESS = to_checksum_address("0xa260b049ddd6567e739139404c7554435c456d9e")
+ZERO_ADDRESS = "0x" + "0" * 40
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+BALANCE_OF_SELECTOR = keccak(text="balanceOf(address)")[:4]
+OWNER_OF_SELECTOR = keccak(text="ownerOf(uint256)")[:4]
+TOTAL_SUPPLY_SELECTOR = keccak(text="totalSupply()")[:4]
+BASE_TOTAL_SUPPLY_SELECTOR = keccak(text="baseTotalSupply()")[:4]
+AGGREGATE3_SELECTOR = keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+
+class CallReverted(Exception):
+    pass
+
+
+def to_hex(value):
+    return hex(value)
+
+
+def pad_topic(value):
+    if isinstance(value, str):
+        value = int(value, 16)
+    return "0x%064x" % value
+
+
+def add_to_bloom(bloom, value: bytes):
+    digest = keccak(value)
+    for i in (0, 2, 4):
+        bloom |= 1 << (((digest[i] << 8) | digest[i + 1]) & 2047)
+    return bloom
+
+
+def get_log_bloom(log):
+    bloom = add_to_bloom(0, bytes.fromhex(log["address"][2:]))
+    for topic in log["topics"]:
+        bloom = add_to_bloom(bloom, bytes.fromhex(topic[2:]))
+    return bloom
+
+
+class SyntheticChain:
+    def __init__(
+        self,
+        days_amount=3,
+        deployment_block=BLOCKS_PER_DAY // 2,
+        holders_amount=50,
+        transfers_per_day=200,
+        nft_transfers_per_day=20,
+        seed=0,
+        finality_lag=0,
+        multicall=True,
+    ):
+        self.rng = random.Random(seed)
+        self.deployment_block = deployment_block
+        # Ends half way through the day after the last full day, which stays unsaved
+        self.latest_block = (days_amount + 1) * BLOCKS_PER_DAY + BLOCKS_PER_DAY // 2
+        self.finalized_block = self.latest_block - finality_lag
+        self.multicall = multicall
+        self.reorg_block = None
+        self.forks = 0
+        self.logs = {}  # {block_number: [log]}
+        self.generate_logs(days_amount, holders_amount, transfers_per_day, nft_transfers_per_day)
+
+    def get_block_hash(self, block_number):
+        if self.reorg_block is not None and block_number >= self.reorg_block:
+            return "0x" + keccak(text=f"synthetic block {block_number} fork {self.forks}").hex()
+        return "0x" + keccak(text=f"synthetic block {block_number}").hex()
+
+    def reorg(self, from_block):
+        self.reorg_block = from_block
+        self.forks += 1
+        for block_number, block_logs in self.logs.items():
+            if block_number >= from_block:
+                for log in block_logs:
+                    log["blockHash"] = self.get_block_hash(block_number)
+
+    def add_log(self, block_number, address, topics, data):
+        block_logs = self.logs.setdefault(block_number, [])
+        block_logs.append({
+            "address": address,
+            "topics": topics,
+            "data": data,
+            "blockNumber": to_hex(block_number),
+            "blockHash": self.get_block_hash(block_number),
+            "transactionHash": "0x%064x" % self.rng.getrandbits(256),
+            "transactionIndex": to_hex(len(block_logs)),
+            "logIndex": to_hex(len(block_logs)),
+            "removed": False,
+        })
+
+    def burn_nft(self, token_id, block_number):
+        """Transfer an NFT from its owner at `block_number` to the zero address"""
+        owner = None
+        for _, to_addr, transferred_id in self.iter_transfers(NFT_ADDRESS, block_number):
+            if transferred_id == token_id:
+                owner = to_addr
+        self.add_log(
+            block_number,
+            NFT_ADDRESS,
+            [TRANSFER_TOPIC, pad_topic(owner), pad_topic(ZERO_ADDRESS), pad_topic(token_id)],
+            "0x",
+        )
+
+    def generate_logs(self, days_amount, holders_amount, transfers_per_day, nft_transfers_per_day):
+        holders = make_addresses(holders_amount, seed=self.rng.randrange(2**32))
+        balances = {}
+        token_owners = {}
+        for holder in holders:
+            value = self.rng.randrange(10**18, 10**22)
+            balances[holder] = value
+            self.add_log(
+                self.deployment_block + 1,
+                PILOT_VAULT_ADDRESS,
+                [TRANSFER_TOPIC, pad_topic(ZERO_ADDRESS), pad_topic(holder)],
+                "0x%064x" % value,
+            )
+
+        last_block = (days_amount + 1) * BLOCKS_PER_DAY - 1
+        first_block = self.deployment_block + 2
+        days_with_events = days_amount + 1
+        for _ in range(transfers_per_day * days_with_events):
+            block_number = self.rng.randrange(first_block, last_block + 1)
+            from_addr, to_addr = self.rng.choice(holders), self.rng.choice(holders)
+            value = self.rng.randrange(0, balances[from_addr] // 10 + 1)
+            balances[from_addr] -= value
+            balances[to_addr] += value
+            self.add_log(
+                block_number,
+                PILOT_VAULT_ADDRESS,
+                [TRANSFER_TOPIC, pad_topic(from_addr), pad_topic(to_addr)],
+                "0x%064x" % value,
+            )
+        for _ in range(nft_transfers_per_day * days_with_events):
+            block_number = self.rng.randrange(first_block, last_block + 1)
+            token_id = len(token_owners) + 1
+            to_addr = self.rng.choice(holders)
+            token_owners[token_id] = to_addr
+            self.add_log(
+                block_number,
+                NFT_ADDRESS,
+                [TRANSFER_TOPIC, pad_topic(ZERO_ADDRESS), pad_topic(to_addr), pad_topic(token_id)],
+                "0x",
+            )
+
+    def get_block(self, block_number):
+        bloom = 0
+        for log in self.logs.get(block_number, ()):
+            bloom |= get_log_bloom(log)
+        return {
+            "number": to_hex(block_number),
+            "hash": self.get_block_hash(block_number),
+            "parentHash": self.get_block_hash(block_number - 1),
+            "timestamp": to_hex(GENESIS_TIMESTAMP + block_number * SECONDS_PER_BLOCK),
+            "logsBloom": "0x%0512x" % bloom,
+            "transactions": [],
+        }
+
+    def get_code(self, address, block_number):
+        if self.multicall and address.lower() == MULTICALL3_ADDRESS.lower():
+            return "0x6080"
+        deployed = address.lower() in (NFT_ADDRESS.lower(), PILOT_VAULT_ADDRESS.lower())
+        return "0x6080" if deployed and block_number >= self.deployment_block else "0x"
+
+    def iter_transfers(self, address, block_number):
+        """(from, to, value or token id) of the contract's transfers up to `block_number`"""
+        for number in sorted(self.logs):
+            if number > block_number:
+                break
+            for log in self.logs[number]:
+                if log["address"] != address:
+                    continue
+                from_addr, to_addr = "0x" + log["topics"][1][-40:], "0x" + log["topics"][2][-40:]
+                value = int(log["topics"][3], 16) if len(log["topics"]) > 3 else int(log["data"], 16)
+                yield from_addr, to_addr, value
+
+    def call(self, to, data, block_number):
+        """Return data of a view call, raises CallReverted like a reverting contract"""
+        selector, arguments = data[:4], data[4:]
+        if self.multicall and to.lower() == MULTICALL3_ADDRESS.lower() and selector == AGGREGATE3_SELECTOR:
+            results = []
+            for target, allow_failure, call_data in decode(["(address,bool,bytes)[]"], arguments)[0]:
+                try:
+                    results.append((True, self.call(target, call_data, block_number)))
+                except CallReverted:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b""))
+            return encode(["(bool,bytes)[]"], [results])
+        if to.lower() == PILOT_VAULT_ADDRESS.lower() and selector == BALANCE_OF_SELECTOR:
+            holder = decode(["address"], arguments)[0].lower()
+            balance = 0
+            for from_addr, to_addr, value in self.iter_transfers(PILOT_VAULT_ADDRESS, block_number):
+                balance += (value if to_addr == holder else 0) - (value if from_addr == holder else 0)
+            return encode(["uint256"], [balance])
+        if to.lower() == PILOT_VAULT_ADDRESS.lower() and selector == BASE_TOTAL_SUPPLY_SELECTOR:
+            supply = 0
+            for from_addr, to_addr, value in self.iter_transfers(PILOT_VAULT_ADDRESS, block_number):
+                supply += (value if from_addr == ZERO_ADDRESS else 0) - (value if to_addr == ZERO_ADDRESS else 0)
+            return encode(["uint256"], [supply])
+        if to.lower() == NFT_ADDRESS.lower() and selector == BALANCE_OF_SELECTOR:
+            holder = decode(["address"], arguments)[0].lower()
+            owners = {}
+            for _, to_addr, token_id in self.iter_transfers(NFT_ADDRESS, block_number):
+                owners[token_id] = to_addr
+            return encode(["uint256"], [sum(owner == holder for owner in owners.values())])
+        if to.lower() == NFT_ADDRESS.lower() and selector == TOTAL_SUPPLY_SELECTOR:
+            supply = 0
+            for from_addr, to_addr, _ in self.iter_transfers(NFT_ADDRESS, block_number):
+                supply += (from_addr == ZERO_ADDRESS) - (to_addr == ZERO_ADDRESS)
+            return encode(["uint256"], [supply])
+        if to.lower() == NFT_ADDRESS.lower() and selector == OWNER_OF_SELECTOR:
+            token_id = decode(["uint256"], arguments)[0]
+            owner = None
+            for _, to_addr, transferred_id in self.iter_transfers(NFT_ADDRESS, block_number):
+                if transferred_id == token_id:
+                    owner = to_addr
+            if owner in (None, ZERO_ADDRESS):
+                raise CallReverted(f"Token {token_id} does not exist")
+            return encode(["address"], [owner])
+        raise CallReverted(f"Unknown call to {to}")
+
+    def get_logs(self, log_filter):
+        address = log_filter.get("address")
+        addresses = {a.lower() for a in ([address] if isinstance(address, str) else address or [])}
+        topics = log_filter.get("topics") or []
+        from_block = self.parse_block_number(log_filter.get("fromBlock", "latest"))
+        to_block = self.parse_block_number(log_filter.get("toBlock", "latest"))
+        logs = []
+        for block_number in sorted(self.logs):
+            if not from_block <= block_number <= to_block:
+                continue
+            for log in self.logs[block_number]:
+                if addresses and log["address"].lower() not in addresses:
+                    continue
+                if topics and topics[0] is not None and log["topics"][0] != topics[0]:
+                    continue
+                logs.append(log)
+        return logs
+
+    def parse_block_number(self, block_identifier):
+        if block_identifier == "latest":
+            return self.latest_block
+        if block_identifier in ("finalized", "safe"):
+            return self.finalized_block
+        if block_identifier == "earliest":
+            return 0
+        return int(block_identifier, 16)
+
+
+class SyntheticChainProvider(JSONBaseProvider):
+    def __init__(self, chain: SyntheticChain, endpoint_uri="synthetic://node"):
+        super().__init__()
+        self.chain = chain
+        self.endpoint_uri = endpoint_uri
+
+    def make_request(self, method, params):
+        if method == "eth_blockNumber":
+            result = to_hex(self.chain.latest_block)
+        elif method == "eth_chainId":
+            result = "0x1"
+        elif method == "eth_getBlockByNumber":
+            result = self.chain.get_block(self.chain.parse_block_number(params[0]))
+        elif method == "eth_getCode":
+            result = self.chain.get_code(params[0], self.chain.parse_block_number(params[1]))
+        elif method == "eth_getLogs":
+            result = self.chain.get_logs(params[0])
+        elif method == "eth_call":
+            try:
+                data = self.chain.call(
+                    params[0]["to"], bytes.fromhex(params[0]["data"][2:]), self.chain.parse_block_number(params[1])
+                )
+            except CallReverted as e:
+                return {"jsonrpc": "2.0", "id": 0, "error": {"code": 3, "message": f"execution reverted: {e}", "data": "0x"}}
+            result = "0x" + data.hex()
+        else:
+            return {"jsonrpc": "2.0", "id": 0, "error": {"code": -32601, "message": f"Method {method} not supported"}}
+        return {"jsonrpc": "2.0", "id": 0, "result": result}
+
+    def make_batch_request(self, requests):
+        return [self.make_request(method, params) for method, params in requests]
+
+    def is_connected(self, show_traceback=False):
+        return True
@@ -1,20 +1,96 @@
-import src.aggregate_daily_points
-import src.daily_states_v2
-import src.daily_points_v2
-import src.find_deployment_blocks
-import src.find_daily_blocks
-import src.nft_events
-import src.pilot_vault_events
-import test.main_test
-from src.copy_last_aggregated_points_file_to_latest_folder import copy_last_aggregated_points_file_to_latest_folder
+import argparse
+# Stages are imported when they run: the RPC stages import web3 and the offline ones don't need it
+from src.utils.instrumentation import instrumentation, span
 
 if __name__ == "__main__":
-    src.find_deployment_blocks.main()
-    src.find_daily_blocks.main()
-    src.nft_events.main()
-    src.pilot_vault_events.main()
-    src.daily_states_v2.process_daily_states()
-    src.daily_points_v2.initialize_global_variables_and_process_points()
-    src.aggregate_daily_points.aggregate_daily_points()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--audit",
+        action="store_true",
+        help="Run the separate states and points stages instead of the fused one",
+    )
+    parser.add_argument(
+        "--async-ingestion",
+        action="store_true",
+        help="Fetch deployments, day boundaries and events with the asyncio pipeline",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Stream each day through all stages instead of running the stages one after another",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Skip the reorg check and fetching, recompute states, points and aggregates from data/",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run with cProfile, the stats are saved next to the run report",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Record each stage's peak allocated memory with tracemalloc",
+    )
+    args = parser.parse_args()
+    if args.streaming and (args.audit or args.async_ingestion):
+        parser.error("--streaming runs its own ingestion and the fused states and points stage")
+    if args.offline and (args.streaming or args.async_ingestion):
+        parser.error("--offline doesn't fetch, it can't be combined with --streaming or --async-ingestion")
+
+    instrumentation.start(trace_memory=args.trace_memory, profile=args.profile)
+    status = "failed"
+    try:
+        if not args.offline:
+            with span("verify recent days"):
+                import src.verify_recent_days
+                src.verify_recent_days.main()
+        if args.streaming:
+            with span("streaming pipeline"):
+                import src.streaming_pipeline
+                src.streaming_pipeline.main()
+        else:
+            if args.async_ingestion:
+                with span("async ingestion"):
+                    import src.async_ingestion
+                    src.async_ingestion.main()
+            elif not args.offline:
+                import src.find_deployment_blocks
+                import src.find_daily_blocks
+                import src.nft_events
+                import src.pilot_vault_events
+                with span("deployment blocks"):
+                    src.find_deployment_blocks.main()
+                with span("daily blocks"):
+                    src.find_daily_blocks.main()
+                with span("nft events"):
+                    src.nft_events.main()
+                with span("pilot vault events"):
+                    src.pilot_vault_events.main()
+            if args.audit:
+                import src.daily_states_v2
+                import src.daily_points_v2
+                with span("states"):
+                    src.daily_states_v2.process_daily_states()
+                with span("points"):
+                    src.daily_points_v2.initialize_global_variables_and_process_points()
+            else:
+                with span("states and points"):
+                    import src.daily_states_and_points
+                    src.daily_states_and_points.process_daily_states_and_points()
+            with span("aggregated points"):
+                import src.aggregate_daily_points
+                src.aggregate_daily_points.aggregate_daily_points()
+        with span("points history"):
+            from src.utils.points_history import points_history
+            points_history.sync()
+        status = "ok"
+    finally:
+        # Written before the tests, which run in this process but aren't part of the pipeline's report
+        print(f"Run report: {instrumentation.write_report(status)}")
+    import test.main_test
     test.main_test.run_all_tests()
-    copy_last_aggregated_points_file_to_latest_folder()
\ No newline at end of file
+    from src.copy_last_aggregated_points_file_to_latest_folder import copy_last_aggregated_points_file_to_latest_folder
+    copy_last_aggregated_points_file_to_latest_folder()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Print an address's daily points over time, from data/points_history.
+
+    python3 -m src.address_history 0xabc... [--json]
+    python3 -m src.address_history --rebuild
+
+See utils/points_history.py. `--rebuild` builds the history again from the
+data/points files, e.g. after they were copied from another machine.
+"""
+import argparse
+import json
+from .utils.points_history import points_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("address", nargs="?")
+    parser.add_argument("--json", action="store_true", help="Print [[day_index, points], ...]")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the history from data/points")
+    args = parser.parse_args()
+    if not args.address and not args.rebuild:
+        parser.error("an address or --rebuild is required")
+
+    if args.rebuild:
+        points_history.rebuild()
+        print(f"Rebuilt the points history of {len(points_history.get_days())} days")
+    if not args.address:
+        return
+    history = points_history.get_history(args.address)
+    if args.json:
+        print(json.dumps(history))
+        return
+    for day_index, points in history:
+        print(f"{day_index:>6} {points}")
+    print(f"{len(history)} days with points, {sum(points for _, points in history)} in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
-import json
 import os
 import glob
 import re
+import sys
 from collections import defaultdict
+from .utils import stage_cache
+from .utils.instrumentation import span
+from .utils.progress import progress
+from .utils.json_backend import load_json, dump_json
+from .utils.schemas import AggregatedPointsFile, PointsFile
+
+STAGE = "aggregated_points"
+PROGRESS_TASK = "aggregated points"
 
 def get_daily_points_files():
     """Get all daily points files sorted by index"""
@@ -26,6 +34,101 @@ def get_daily_points_files():
     return file_data
 
 
+def add_day_points(day_points, cumulative_points):
+    for addr, points in day_points.items():
+        cumulative_points[addr.lower()] += points
+
+
+def aggregate_day(day_index, day_data, cumulative_points, output_dir="data/aggregated_points"):
+    """
+    Add one day's points to `cumulative_points` and save that day's
+    aggregated file. Returns the day's users sorted by cumulative points.
+    """
+    day_date = day_data.get("date", "unknown")
+    day_points = day_data.get("points", {})
+    
+    # Build points structure with both day_points and cumulative_points for each user
+    user_points = {}
+    
+    # Process users who earned points today
+    add_day_points(day_points, cumulative_points)
+    for addr, points in day_points.items():
+        addr_lower = addr.lower()
+        user_points[addr_lower] = {
+            "day_points": points,
+            "cumulative_points": cumulative_points[addr_lower]
+        }
+    
+    # Include users who have cumulative points but didn't earn today
+    for addr, cum_points in cumulative_points.items():
+        if addr not in user_points:
+            user_points[addr] = {
+                "day_points": 0,
+                "cumulative_points": cum_points
+            }
+    
+    # Sort by cumulative points (descending)
+    sorted_user_points = dict(sorted(
+        user_points.items(), 
+        key=lambda x: x[1]["cumulative_points"], 
+        reverse=True
+    ))
+    
+    # Calculate statistics
+    total_users = len(sorted_user_points)
+    total_points_all = sum(p["cumulative_points"] for p in sorted_user_points.values())
+    day_total = sum(p["day_points"] for p in sorted_user_points.values())
+    
+    # Save cumulative aggregated points for this day
+    output_data = {
+        "day_index": day_index,
+        "date": day_date,
+        "start_block": day_data.get("start_block"),
+        "end_block": day_data.get("end_block"),
+        "metadata": {
+            "days_included": day_index + 1,
+            "total_users": total_users,
+            "total_points_all_users": total_points_all,
+            "day_points": day_total,
+            "day_users_count": len(day_points)
+        },
+        "points": sorted_user_points
+    }
+    
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{day_index}.json")
+    dump_json(output_data, output_file)
+    
+    print(f"  Day {day_index} ({day_date}): {len(day_points)} users earned points, {day_total:,} day points | "
+          f"Cumulative: {total_users} users, {total_points_all:,} total points")
+    return sorted_user_points
+
+
+def get_stage_version():
+    return stage_cache.get_code_version(sys.modules[__name__])
+
+
+def aggregate_day_if_changed(day_index, filepath, cumulative_points, version, output_dir="data/aggregated_points"):
+    """
+    `aggregate_day` unless the day is up to date, see utils/stage_cache.py.
+    A skipped day still adds its points to `cumulative_points` and returns None.
+    """
+    with span("day", day_index=day_index) as day_span:
+        day_data = load_json(filepath, PointsFile)
+        output_file = os.path.join(output_dir, f"{day_index}.json")
+        inputs = [filepath]
+        if day_index > 0:
+            inputs.append(os.path.join(output_dir, f"{day_index - 1}.json"))
+        if stage_cache.is_up_to_date(STAGE, day_index, version, inputs, [output_file]):
+            # Adding the points in the same order keeps ties sorted the same way
+            add_day_points(day_data.get("points", {}), cumulative_points)
+            day_span["attributes"]["skipped"] = True
+            return None
+        sorted_user_points = aggregate_day(day_index, day_data, cumulative_points, output_dir)
+        stage_cache.save_manifest(STAGE, day_index, version, inputs, [output_file])
+        return sorted_user_points
+
+
 def aggregate_daily_points():
     """Aggregate points from all daily periods, saving cumulative totals"""
     print("Loading daily points files...")
@@ -44,69 +147,21 @@ def aggregate_daily_points():
     cumulative_points = defaultdict(int)  # {address: cumulative_total_points}
     
     print("Aggregating points and saving cumulative totals...")
+    version = get_stage_version()
+    sorted_user_points = {}
+    skipped_days = 0
+    progress.start_task(PROGRESS_TASK, total_days=len(points_files))
     for day_index, filepath in points_files:
-        # Load daily points
-        with open(filepath, 'r') as f:
-            day_data = json.load(f)
-        
-        day_date = day_data.get("date", "unknown")
-        day_points = day_data.get("points", {})
-        
-        # Build points structure with both day_points and cumulative_points for each user
-        user_points = {}
-        
-        # Process users who earned points today
-        for addr, points in day_points.items():
-            addr_lower = addr.lower()
-            cumulative_points[addr_lower] += points
-            user_points[addr_lower] = {
-                "day_points": points,
-                "cumulative_points": cumulative_points[addr_lower]
-            }
-        
-        # Include users who have cumulative points but didn't earn today
-        for addr, cum_points in cumulative_points.items():
-            if addr not in user_points:
-                user_points[addr] = {
-                    "day_points": 0,
-                    "cumulative_points": cum_points
-                }
-        
-        # Sort by cumulative points (descending)
-        sorted_user_points = dict(sorted(
-            user_points.items(), 
-            key=lambda x: x[1]["cumulative_points"], 
-            reverse=True
-        ))
-        
-        # Calculate statistics
-        total_users = len(sorted_user_points)
-        total_points_all = sum(p["cumulative_points"] for p in sorted_user_points.values())
-        day_total = sum(p["day_points"] for p in sorted_user_points.values())
-        
-        # Save cumulative aggregated points for this day
-        output_data = {
-            "day_index": day_index,
-            "date": day_date,
-            "start_block": day_data.get("start_block"),
-            "end_block": day_data.get("end_block"),
-            "metadata": {
-                "days_included": day_index + 1,
-                "total_users": total_users,
-                "total_points_all_users": total_points_all,
-                "day_points": day_total,
-                "day_users_count": len(day_points)
-            },
-            "points": sorted_user_points
-        }
-        
-        output_file = os.path.join(output_dir, f"{day_index}.json")
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f, indent=2)
-        
-        print(f"  Day {day_index} ({day_date}): {len(day_points)} users earned points, {day_total:,} day points | "
-              f"Cumulative: {total_users} users, {total_points_all:,} total points")
+        sorted_user_points = aggregate_day_if_changed(day_index, filepath, cumulative_points, version, output_dir)
+        if sorted_user_points is None:
+            skipped_days += 1
+        progress.advance(PROGRESS_TASK, days=1)
+    progress.finish_task(PROGRESS_TASK)
+    if sorted_user_points is None:
+        sorted_user_points = load_json(os.path.join(output_dir, f"{day_index}.json"), AggregatedPointsFile)["points"]
     
+    if skipped_days:
+        print(f"Skipped {skipped_days} days with unchanged points")
     print(f"\nSaved cumulative aggregated points for all {len(points_files)} days")
     print(f"Output directory: {output_dir}/")
     
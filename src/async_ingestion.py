@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Asyncio ingestion pipeline.
+
+Does the work of find_deployment_blocks, find_daily_blocks, nft_events and
+pilot_vault_events as concurrent tasks, and writes the same files under data/:
+
+- both contracts' deployment searches run at once; they are skipped when
+  data/deployment_blocks.json already has both blocks, deployments don't move,
+- every day's boundary is found by its own binary search, all searches run
+  at once and share the blocks they fetch,
+- a day's NFT and pilot vault logs are fetched as soon as its boundaries are
+  known, chunks of a day concurrently.
+
+In-flight requests per provider are bounded by its `max_concurrency` in
+config.json; see utils/async_w3_request.py.
+
+    python3 -m src.async_ingestion
+"""
+import asyncio
+import os
+from datetime import timedelta
+from web3 import Web3
+from . import nft_events, pilot_vault_events
+from .find_daily_blocks import get_block_date, get_block_ref
+from .find_deployment_blocks import build_block_info, load_contract_addresses
+from .utils.aggregated_w3_request import STATE_READ_POLICY
+from .utils.async_w3_request import create_async_endpoints, make_aggregated_call_async
+from .utils.block_verification import (
+    check_logs,
+    get_block_policy,
+    get_logs_policy,
+    load_trusted_block_hashes,
+    normalize_hash,
+)
+from .utils.config import get_max_logs_block_range
+from .utils.header_cache import header_cache
+from .utils.json_backend import load_json, dump_json
+from .utils.log_ranges import split_block_range
+from .utils.progress import progress
+from .utils.schemas import DeploymentBlocks
+from .utils.stage_cache import events_file_matches
+
+DEPLOYMENT_BLOCKS_FILE = "data/deployment_blocks.json"
+MIN_LOGS_CHUNK_SIZE = 1000
+
+
+class BlockFetcher:
+    """Fetches each block once, however many searches ask for it concurrently"""
+
+    def __init__(self, endpoints, trusted_hashes):
+        self.endpoints = endpoints
+        self.trusted_hashes = trusted_hashes
+        self.tasks = {}
+
+    def get_block(self, block_number):
+        task = self.tasks.get(block_number)
+        if task is None:
+            task = asyncio.ensure_future(
+                make_aggregated_call_async(
+                    self.endpoints,
+                    lambda w3: w3.eth.get_block(block_number),
+                    get_block_policy(block_number, self.trusted_hashes),
+                )
+            )
+            self.tasks[block_number] = task
+        return task
+
+
+async def has_contract_code(endpoints, address, block_number):
+    try:
+        code = await make_aggregated_call_async(endpoints, lambda w3: w3.eth.get_code(address, block_number))
+        return len(code) > 0
+    except Exception as e:
+        print(f"Warning: Error checking code at block {block_number}: {e}")
+        return False
+
+
+async def find_deployment_block(endpoints, address, end_block):
+    """Binary search for the first block where the contract has code"""
+    if not await has_contract_code(endpoints, address, end_block):
+        print(f"  Error: {address} has no code at block {end_block}. Contract may not be deployed yet.")
+        return None
+    left, right, result = 0, end_block, None
+    while left <= right:
+        mid = (left + right) // 2
+        if await has_contract_code(endpoints, address, mid):
+            result = mid
+            right = mid - 1
+        else:
+            left = mid + 1
+    return result
+
+
+async def find_deployment(endpoints, blocks, address, latest_block):
+    deployment_block = await find_deployment_block(endpoints, address, latest_block)
+    if not deployment_block:
+        return {"address": address, "deployment_block": None, "error": "Could not find deployment block"}
+    block = await blocks.get_block(deployment_block)
+    print(f"  {address} deployed at block {deployment_block}")
+    return {"address": address, "deployment_block": deployment_block, **build_block_info(deployment_block, block)}
+
+
+async def get_deployments(endpoints, blocks, latest_block):
+    """Deployment entries from data/deployment_blocks.json, searching for them if missing"""
+    if os.path.exists(DEPLOYMENT_BLOCKS_FILE):
+        deployments = load_json(DEPLOYMENT_BLOCKS_FILE, DeploymentBlocks)["deployments"]
+        if all(deployments.get(name, {}).get("block_number") is not None for name in ("nft", "pilot_vault")):
+            return deployments
+
+    addresses = load_contract_addresses()
+    print("Finding deployment blocks...")
+    nft, pilot_vault = await asyncio.gather(
+        find_deployment(endpoints, blocks, addresses["nft"], latest_block),
+        find_deployment(endpoints, blocks, addresses["pilot_vault"], latest_block),
+    )
+    deployments = {"nft": nft, "pilot_vault": pilot_vault}
+    dump_json({"deployments": deployments}, DEPLOYMENT_BLOCKS_FILE)
+    return deployments
+
+
+async def find_first_block_strictly_after_day(blocks, start_block, latest_block, target_day):
+    """Async `find_daily_blocks.find_first_block_strictly_after_day`"""
+    lo, hi = start_block, latest_block + 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if get_block_date(await blocks.get_block(mid)) <= target_day:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo > latest_block:
+        return None
+    return lo
+
+
+async def find_day_boundary(blocks, start_block, latest_block, day):
+    first_after = await find_first_block_strictly_after_day(blocks, start_block, latest_block, day)
+    if first_after is None:
+        raise ValueError(f"No block after {day} up to block {latest_block}")
+    last_block, first_next_block = await asyncio.gather(
+        blocks.get_block(first_after - 1), blocks.get_block(first_after)
+    )
+    return {
+        "day": str(day),
+        "last_block_of_day": get_block_ref(last_block),
+        "first_block_of_next_day": get_block_ref(first_next_block),
+        "is_final_day": False,
+    }
+
+
+async def fetch_logs_range(endpoints, address, abi, from_block, to_block, trusted_hashes):
+    """Fetch one chunk of logs, splitting it in halves while the providers reject it"""
+
+    def get_logs(w3):
+        contract = w3.eth.contract(address=address, abi=abi)
+        return contract.events.Transfer().get_logs(from_block=from_block, to_block=to_block)
+
+    try:
+        headers = header_cache.get_cached_headers(from_block, to_block, trusted_hashes)
+        policy = get_logs_policy(address, from_block, to_block, trusted_hashes, headers)
+        logs = await make_aggregated_call_async(endpoints, get_logs, policy)
+        return check_logs(logs, address, from_block, to_block, trusted_hashes)
+    except Exception as e:
+        if to_block - from_block + 1 <= MIN_LOGS_CHUNK_SIZE:
+            raise
+        print(f"    Error fetching logs from block {from_block} to {to_block}: {e}, splitting the range")
+        middle = (from_block + to_block) // 2
+        first_half, second_half = await asyncio.gather(
+            fetch_logs_range(endpoints, address, abi, from_block, middle, trusted_hashes),
+            fetch_logs_range(endpoints, address, abi, middle + 1, to_block, trusted_hashes),
+        )
+        return first_half + second_half
+
+
+async def fetch_logs(endpoints, address, abi, start_block, end_block, trusted_hashes):
+    """All chunks of a range at once; chunked like the sync read_events_chunked"""
+    chunks = split_block_range(start_block, end_block, get_max_logs_block_range())
+    results = await asyncio.gather(
+        *(fetch_logs_range(endpoints, address, abi, chunk_start, chunk_end, trusted_hashes) for chunk_start, chunk_end in chunks)
+    )
+    return [log for logs in results for log in logs]
+
+
+async def ingest_nft_events(endpoints, day_index, address, start_block, end_block, trusted_hashes):
+    output_file = f"data/events/nft/{day_index}.json"
+    if events_file_matches(output_file, address, start_block, end_block, trusted_hashes.get(end_block)):
+        return
+    logs = await fetch_logs(endpoints, address, nft_events.TRANSFER_EVENT_ABI, start_block, end_block, trusted_hashes)
+    dump_json(
+        nft_events.build_events_file_data(address, start_block, end_block, logs, trusted_hashes.get(end_block)),
+        output_file,
+    )
+    print(f"  Day {day_index}: {len(logs)} NFT events saved to {output_file}")
+    progress.advance(nft_events.PROGRESS_TASK, blocks=end_block - start_block + 1, events=len(logs), days=1)
+
+
+async def ingest_pilot_vault_events(endpoints, day_index, address, start_block, end_block, trusted_hashes):
+    output_file = f"data/events/pilot_vault/{day_index}.json"
+    if events_file_matches(output_file, address, start_block, end_block, trusted_hashes.get(end_block)):
+        return
+    if start_block > end_block:
+        dump_json(pilot_vault_events.build_missing_contract_file_data(address, start_block, end_block), output_file)
+        progress.advance(pilot_vault_events.PROGRESS_TASK, days=1)
+        return
+    logs = await fetch_logs(
+        endpoints, address, pilot_vault_events.TRANSFER_EVENT_ABI, start_block, end_block, trusted_hashes
+    )
+    dump_json(
+        pilot_vault_events.build_events_file_data(address, start_block, end_block, logs, trusted_hashes.get(end_block)),
+        output_file,
+    )
+    print(f"  Day {day_index}: {len(logs)} pilot vault events saved to {output_file}")
+    progress.advance(pilot_vault_events.PROGRESS_TASK, blocks=end_block - start_block + 1, events=len(logs), days=1)
+
+
+async def ingest_day(endpoints, day_index, boundary_tasks, deployments, trusted_hashes):
+    """Save a day's boundaries, then fetch its NFT and pilot vault events concurrently"""
+    boundary = await boundary_tasks[day_index]
+    dump_json(boundary, f"data/days_blocks/{day_index}_{boundary['day']}.json")
+    print(f"Day {day_index} ({boundary['day']}): blocks up to {boundary['last_block_of_day']['number']}")
+    # Boundaries found by quorum let the chunks ending on them be read from one provider
+    for block in (boundary["last_block_of_day"], boundary["first_block_of_next_day"]):
+        trusted_hashes[block["number"]] = normalize_hash(block["hash"])
+
+    end_block = boundary["last_block_of_day"]["number"]
+    if day_index == 0:
+        nft_start_block = deployments["nft"]["block_number"]
+        pilot_vault_start_block = deployments["pilot_vault"]["block_number"]
+    else:
+        previous_boundary = await boundary_tasks[day_index - 1]
+        nft_start_block = pilot_vault_start_block = previous_boundary["first_block_of_next_day"]["number"]
+
+    await asyncio.gather(
+        ingest_nft_events(
+            endpoints,
+            day_index,
+            Web3.to_checksum_address(deployments["nft"]["address"]),
+            nft_start_block,
+            end_block,
+            trusted_hashes,
+        ),
+        ingest_pilot_vault_events(
+            endpoints,
+            day_index,
+            Web3.to_checksum_address(deployments["pilot_vault"]["address"]),
+            pilot_vault_start_block,
+            end_block,
+            trusted_hashes,
+        ),
+    )
+
+
+async def run_ingestion(endpoints=None):
+    endpoints = endpoints if endpoints is not None else create_async_endpoints()
+    for directory in ("data/days_blocks", "data/events/nft", "data/events/pilot_vault"):
+        os.makedirs(directory, exist_ok=True)
+
+    trusted_hashes = load_trusted_block_hashes()
+    blocks = BlockFetcher(endpoints, trusted_hashes)
+    # Only days ending on a finalized block are saved, see find_daily_blocks
+    finalized_block = await make_aggregated_call_async(
+        endpoints, lambda w3: w3.eth.get_block("finalized"), STATE_READ_POLICY
+    )
+    latest_block = finalized_block["number"]
+    print(f"Latest finalized block: {latest_block}")
+
+    deployments = await get_deployments(endpoints, blocks, latest_block)
+    start_block = min(deployments["nft"]["block_number"], deployments["pilot_vault"]["block_number"])
+    start_day = get_block_date(await blocks.get_block(start_block))
+    latest_day = get_block_date(await blocks.get_block(latest_block))
+    # The latest day isn't over yet, so it is not saved
+    days = [start_day + timedelta(days=i) for i in range((latest_day - start_day).days)]
+    print(f"Ingesting {len(days)} days from {start_day}")
+    # Totals in days only, block ranges are known once each day's boundaries are found
+    for task in (nft_events.PROGRESS_TASK, pilot_vault_events.PROGRESS_TASK):
+        progress.start_task(task, total_days=len(days))
+
+    boundary_tasks = [
+        asyncio.ensure_future(find_day_boundary(blocks, start_block, latest_block, day)) for day in days
+    ]
+    await asyncio.gather(
+        *(ingest_day(endpoints, day_index, boundary_tasks, deployments, trusted_hashes) for day_index in range(len(days)))
+    )
+    for task in (nft_events.PROGRESS_TASK, pilot_vault_events.PROGRESS_TASK):
+        progress.finish_task(task)
+    print(f"\nCompleted! Ingested {len(days)} days.")
+
+
+async def close_endpoints(endpoints):
+    for endpoint in endpoints:
+        disconnect = getattr(endpoint.w3.provider, "disconnect", None)
+        if disconnect is not None:
+            await disconnect()
+
+
+def main():
+    async def run():
+        endpoints = create_async_endpoints()
+        try:
+            await run_ingestion(endpoints)
+        finally:
+            await close_endpoints(endpoints)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
-import json
 from collections import defaultdict
 import os
 from typing import Dict, List
 from .utils.event_type import EventType
 from .utils.read_combined_sorted_events import read_combined_sorted_events
+from .utils.event_repository import event_repository
 from .utils.process_event_above_user_state import (
     process_event_above_user_state,
     UserState,
 )
 from .utils.get_days_amount import get_days_amount
+from .utils.instrumentation import span
+from .utils.json_backend import load_json, dump_json
+from .utils.points_history import points_history
+from .utils.schemas import DailyStateFile
 from .utils.get_additional_data import (
     get_start_block_for_day,
     get_end_block_for_day,
@@ -27,9 +31,11 @@ type Points = int
 
 
 def get_user_state(filename, state_key):
-    with open(filename, "r") as f:
-        state = json.load(f)
+    state = load_json(filename, DailyStateFile)
+    return get_user_state_from_state_data(state, state_key)
 
+
+def get_user_state_from_state_data(state, state_key):
     user_state = defaultdict(UserState)
     for address, nft in state["nft"][state_key].items():
         user_state[address.lower()].nft_ids = set(nft)
@@ -67,7 +73,10 @@ def give_points_for_user_state(user_state, points) -> Dict[str, Points]:
 
 def validate_end_state(day_index, result_user_balances):
     cached_user_balances = get_user_state_at_day(day_index, "end_state")
+    validate_user_states(day_index, result_user_balances, cached_user_balances)
+
 
+def validate_user_states(day_index, result_user_balances, cached_user_balances):
     result_user_balances_items = sorted(
         [
             [address.lower(), balance]
@@ -93,6 +102,9 @@ def validate_end_state(day_index, result_user_balances):
         assert (
             result_user_balance[1].nft_ids == cached_user_balance[1].nft_ids
         ), f"User NFT IDs mismatch: {result_user_balance[1].nft_ids} != {cached_user_balance[1].nft_ids}"
+        if result_user_balance[1].balance == 0:
+            # State files only keep the update blocks of positive balances, an NFT holder's are cleared
+            continue
         assert (
             result_user_balance[1].last_positive_balance_update_block
             == cached_user_balance[1].last_positive_balance_update_block
@@ -113,7 +125,7 @@ def get_points(day_index) -> Dict[str, Points]:
     points: Dict[str, Points] = defaultdict(int)
 
     for block_number in range(start_block, end_block + 1):
-        events = block_number_to_events[block_number]
+        events = block_number_to_events.get(block_number, ())
         for event in events:
             user_state = process_event_above_user_state(event, user_state)
         if block_number > lp_balances_snapshot_start_block:
@@ -123,36 +135,53 @@ def get_points(day_index) -> Dict[str, Points]:
     return points
 
 
+def write_points_to_file(day_index, points, date, start_block, end_block):
+    path = f"data/points/{day_index}.json"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    points = {
+        address.lower(): points for address, points in points.items() if points > 0
+    }
+    dump_json(
+        {
+            "day_index": day_index,
+            "date": date,
+            "start_block": start_block,
+            "end_block": end_block,
+            "points": points,
+        },
+        path,
+    )
+    points_history.append_day(day_index, points)
+
+
 def process_points():
     days_amount = get_days_amount()
     for day_index in range(days_amount):
-        points = get_points(day_index)
-        path = f"data/points/{day_index}.json"
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-
-        points = {
-            address.lower(): points for address, points in points.items() if points > 0
-        }
-        json.dump(
-            {
-                "day_index": day_index,
-                "date": get_day_date(day_index),
-                "start_block": get_start_block_for_day(day_index),
-                "end_block": get_end_block_for_day(day_index),
-                "points": points,
-            },
-            open(path, "w"),
-            indent=2,
-        )
+        with span("day", day_index=day_index):
+            event_repository.prefetch_window(day_index)
+            points = get_points(day_index)
+            write_points_to_file(
+                day_index,
+                points,
+                get_day_date(day_index),
+                get_start_block_for_day(day_index),
+                get_end_block_for_day(day_index),
+            )
 
 
-def initialize_global_variables_and_process_points():
+def initialize_global_variables():
     global lp_balances_snapshot, lp_balances_snapshot_start_block
     lp_balances_snapshot_data_dir = "data/lp_balances_snapshot.json"
-    lp_balances_snapshot = get_user_state(lp_balances_snapshot_data_dir, "start_state")
-    lp_balances_snapshot_start_block = json.load(
-        open(lp_balances_snapshot_data_dir, "r")
-    )["start_block"]
+    lp_balances_snapshot_data = load_json(lp_balances_snapshot_data_dir, DailyStateFile)
+    lp_balances_snapshot = get_user_state_from_state_data(
+        lp_balances_snapshot_data, "start_state"
+    )
+    lp_balances_snapshot_start_block = lp_balances_snapshot_data["start_block"]
+
+
+def initialize_global_variables_and_process_points():
+    initialize_global_variables()
     process_points()
 
 
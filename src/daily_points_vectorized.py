@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Vectorized points engine for bulk recomputes.
+
+`daily_points_v2.get_points` calls `give_points_for_user_state` for every
+block of the day, which costs blocks x users Python operations. Between two
+events a user's balance and NFT holdings don't change, so their points for a
+day are a sum of (points per block) x (blocks held) over the few step changes
+caused by the day's events. This module builds those step arrays with NumPy:
+
+- addresses are mapped to dense ids,
+- every event becomes balance-change and NFT-count-change rows,
+- per-user cumulative sums give the balance and NFT count after every step,
+- each step's points are multiplied by the number of blocks it lasts and
+  summed per user.
+
+Token values are 256-bit, so balances and points are kept in object arrays of
+Python ints to stay exact. The output is identical to `daily_points_v2`,
+including the order of addresses in the points files.
+
+    python3 -m src.daily_points_vectorized          # recompute data/points
+    python3 -m src.daily_points_vectorized --check  # compare with data/points
+"""
+import argparse
+import numpy as np
+from typing import Dict
+from . import daily_points_v2
+from .daily_points_v2 import (
+    POINTS_PER_PILOT_VAULT_TOKEN,
+    POINTS_PER_PILOT_VAULT_TOKEN_FOR_NFT,
+    Points,
+    get_user_state_at_day,
+    write_points_to_file,
+)
+from .utils.event_type import EventType
+from .utils.json_backend import dumps
+from .utils.process_event_above_user_state import ZERO_ADDRESS
+from .utils.read_combined_sorted_events import (
+    read_combined_sorted_events,
+    iter_events_in_block_range,
+)
+from .utils.event_repository import event_repository
+from .utils.get_days_amount import get_days_amount
+from .utils.get_additional_data import (
+    get_start_block_for_day,
+    get_end_block_for_day,
+    get_day_date,
+)
+
+
+class AddressIds:
+    """Dense ids for addresses, assigned in first-seen order"""
+
+    def __init__(self):
+        self.address_to_id = {}
+        self.addresses = []
+
+    def get(self, address):
+        address_id = self.address_to_id.get(address)
+        if address_id is None:
+            address_id = len(self.addresses)
+            self.address_to_id[address] = address_id
+            self.addresses.append(address)
+        return address_id
+
+    def __len__(self):
+        return len(self.addresses)
+
+
+def build_step_arrays(user_state, block_number_to_events, start_block, end_block):
+    """
+    Build per-day step arrays.
+
+    Every user gets an initial step at `start_block` carrying its start
+    balance and NFT count, then one row per event side. Rows are returned
+    sorted by (user id, event order).
+    """
+    address_ids = AddressIds()
+    blocks, ids, balance_deltas, nft_deltas = [], [], [], []
+
+    for address, state in user_state.items():
+        address_id = address_ids.get(address.lower())
+        blocks.append(start_block)
+        ids.append(address_id)
+        balance_deltas.append(state.balance)
+        nft_deltas.append(len(state.nft_ids))
+
+    for block_number, events in iter_events_in_block_range(
+        block_number_to_events, start_block, end_block
+    ):
+        for event in events:
+            from_addr = event["args"]["from"].lower()
+            to_addr = event["args"]["to"].lower()
+            if event["event_type"] == EventType.TRANSFER:
+                balance_delta, nft_delta = event["args"]["value"], 0
+            elif event["event_type"] == EventType.NFT:
+                balance_delta, nft_delta = 0, 1
+            else:
+                raise ValueError(f"Invalid event type: {event['event_type']}")
+            if from_addr != ZERO_ADDRESS:
+                blocks.append(block_number)
+                ids.append(address_ids.get(from_addr))
+                balance_deltas.append(-balance_delta)
+                nft_deltas.append(-nft_delta)
+            if to_addr != ZERO_ADDRESS:
+                blocks.append(block_number)
+                ids.append(address_ids.get(to_addr))
+                balance_deltas.append(balance_delta)
+                nft_deltas.append(nft_delta)
+
+    blocks = np.array(blocks, dtype=np.int64)
+    ids = np.array(ids, dtype=np.int64)
+    balance_deltas = np.array(balance_deltas, dtype=object)
+    nft_deltas = np.array(nft_deltas, dtype=np.int64)
+
+    # Stable sort keeps event order inside each user's group
+    order = np.argsort(ids, kind="stable")
+    return address_ids, blocks[order], ids[order], balance_deltas[order], nft_deltas[order]
+
+
+def compute_points_vectorized(
+    user_state,
+    block_number_to_events,
+    start_block,
+    end_block,
+    lp_balances_snapshot,
+    lp_balances_snapshot_start_block,
+):
+    """
+    Compute a day's points from its start state and events.
+
+    Returns (points, end_balances, end_nft_counts), the latter two keyed by
+    address, for end state validation.
+    """
+    address_ids, blocks, ids, balance_deltas, nft_deltas = build_step_arrays(
+        user_state, block_number_to_events, start_block, end_block
+    )
+    if len(ids) == 0:
+        return {}, {}, {}
+
+    group_starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    group_lengths = np.diff(np.r_[group_starts, len(ids)])
+
+    # Per-user running totals: global cumulative sum minus the total before the group
+    balance_cumsum = np.cumsum(balance_deltas)
+    balance_before_group = balance_cumsum[group_starts] - balance_deltas[group_starts]
+    balances = balance_cumsum - np.repeat(balance_before_group, group_lengths)
+    nft_cumsum = np.cumsum(nft_deltas)
+    nft_before_group = nft_cumsum[group_starts] - nft_deltas[group_starts]
+    nft_counts = nft_cumsum - np.repeat(nft_before_group, group_lengths)
+
+    # Each step lasts until the user's next step, or until the end of the day
+    next_blocks = np.empty_like(blocks)
+    next_blocks[:-1] = blocks[1:]
+    group_ends = group_starts + group_lengths - 1
+    next_blocks[group_ends] = end_block + 1
+    first_block_with_points = max(start_block, lp_balances_snapshot_start_block + 1)
+    durations = np.maximum(
+        0, next_blocks - np.maximum(blocks, first_block_with_points)
+    ).astype(object)
+
+    snapshot_balances = np.array(
+        [
+            lp_balances_snapshot[address].balance if address in lp_balances_snapshot else 0
+            for address in address_ids.addresses
+        ],
+        dtype=object,
+    )[ids]
+    balances_excluding_snapshot = balances - snapshot_balances
+    balances_excluding_snapshot = np.where(
+        balances_excluding_snapshot > 0, balances_excluding_snapshot, 0
+    )
+    points_per_block = np.where(
+        nft_counts > 0, POINTS_PER_PILOT_VAULT_TOKEN_FOR_NFT, POINTS_PER_PILOT_VAULT_TOKEN
+    ).astype(object)
+
+    step_points = balances_excluding_snapshot * points_per_block * durations
+    user_points = np.add.reduceat(step_points, group_starts)
+
+    user_ids = ids[group_starts]
+    points: Dict[str, Points] = {
+        address_ids.addresses[user_id]: int(user_points[position])
+        for position, user_id in enumerate(user_ids)
+    }
+    end_balances = {
+        address_ids.addresses[user_id]: int(balances[group_end])
+        for user_id, group_end in zip(user_ids, group_ends)
+    }
+    end_nft_counts = {
+        address_ids.addresses[user_id]: int(nft_counts[group_end])
+        for user_id, group_end in zip(user_ids, group_ends)
+    }
+    return points, end_balances, end_nft_counts
+
+
+def validate_end_balances(day_index, end_balances, end_nft_counts):
+    """Check the vectorized end state against the state file"""
+    cached_user_state = get_user_state_at_day(day_index, "end_state")
+    for address, balance in end_balances.items():
+        cached = cached_user_state.get(address)
+        cached_balance = cached.balance if cached is not None else 0
+        cached_nft_count = len(cached.nft_ids) if cached is not None else 0
+        assert (
+            balance == cached_balance
+        ), f"User balance mismatch for {address} on day {day_index}: {balance} != {cached_balance}"
+        assert (
+            end_nft_counts[address] == cached_nft_count
+        ), f"User NFT count mismatch for {address} on day {day_index}: {end_nft_counts[address]} != {cached_nft_count}"
+    missing = set(cached_user_state) - set(end_balances)
+    assert not missing, f"Users missing from vectorized end state on day {day_index}: {sorted(missing)}"
+
+
+def get_points_vectorized(day_index) -> Dict[str, Points]:
+    start_block = get_start_block_for_day(day_index)
+    end_block = get_end_block_for_day(day_index)
+    block_number_to_events = read_combined_sorted_events(day_index)
+    user_state = get_user_state_at_day(day_index, "start_state")
+
+    points, end_balances, end_nft_counts = compute_points_vectorized(
+        user_state,
+        block_number_to_events,
+        start_block,
+        end_block,
+        daily_points_v2.lp_balances_snapshot,
+        daily_points_v2.lp_balances_snapshot_start_block,
+    )
+    validate_end_balances(day_index, end_balances, end_nft_counts)
+    return points
+
+
+def process_points_vectorized(check=False):
+    daily_points_v2.initialize_global_variables()
+    days_amount = get_days_amount()
+    mismatched_days = []
+    for day_index in range(days_amount):
+        event_repository.prefetch_window(day_index)
+        points = get_points_vectorized(day_index)
+        date = get_day_date(day_index)
+        start_block = get_start_block_for_day(day_index)
+        end_block = get_end_block_for_day(day_index)
+        if not check:
+            write_points_to_file(day_index, points, date, start_block, end_block)
+            continue
+
+        expected = {
+            "day_index": day_index,
+            "date": date,
+            "start_block": start_block,
+            "end_block": end_block,
+            "points": {address: value for address, value in points.items() if value > 0},
+        }
+        with open(f"data/points/{day_index}.json", "rb") as f:
+            matches = f.read() == dumps(expected)
+        if not matches:
+            mismatched_days.append(day_index)
+        print(f"Day {day_index}: {'matches' if matches else 'DIFFERS from'} data/points/{day_index}.json")
+
+    if check:
+        if mismatched_days:
+            raise ValueError(f"Vectorized points differ from data/points for days {mismatched_days}")
+        print(f"All {days_amount} days match data/points")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute daily points with the vectorized engine")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Compare with the existing data/points files instead of writing them",
+    )
+    args = parser.parse_args()
+    process_points_vectorized(check=args.check)
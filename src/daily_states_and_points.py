@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Fused states + points stage.
+
+Replays every day's events once and produces, from that single replay, the
+state file (same as `daily_states_v2`) and the points file (same as
+`daily_points_v2`). Points are given only to users with a balance or NFTs,
+the users a state file has, so a block costs the current holders rather than
+every address ever seen. Those holders are kept up to date as events touch
+addresses, and at the end of the day they are validated against a full scan
+of the replayed end state.
+
+Days whose inputs, outputs and code are unchanged since the last run are
+skipped, see utils/stage_cache.py. The next recomputed day then starts from
+the latest checkpoint before it (utils/state_checkpoints.py), replaying the
+states of the skipped days after it, or without a checkpoint from the end
+state in the skipped day's state file. A checkpoint is saved after every
+CHECKPOINT_INTERVAL_DAYS days, like in `daily_states_v2`.
+
+The separate `daily_states_v2` and `daily_points_v2` stages are kept for
+audit runs: they replay every day twice, validate the second replay against
+the written state files, and always recompute every day.
+"""
+import copy
+import sys
+from collections import defaultdict
+from typing import Dict
+from . import daily_points_v2
+from .daily_points_v2 import (
+    Points,
+    give_points_for_user_state,
+    get_user_state_at_day,
+    validate_user_states,
+    write_points_to_file,
+)
+from .daily_states_v2 import (
+    DailyState,
+    build_state_file_data,
+    calculate_daily_state_after_end_block,
+    clear_cached_values_for_zero_balances,
+    get_state_file,
+    write_state_data_to_file,
+)
+from .utils import stage_cache
+from .utils.config import get_checkpoint_interval_days
+from .utils.state_checkpoints import find_checkpoint, save_checkpoint
+from .utils.process_event_above_user_state import (
+    UserState,
+    ZERO_ADDRESS,
+    process_event_above_user_state,
+)
+from .utils.read_combined_sorted_events import read_combined_sorted_events
+from .utils.event_repository import (
+    event_repository,
+    get_nft_events_file,
+    get_transfer_events_file,
+)
+from .utils.get_days_amount import get_days_amount
+from .utils.instrumentation import span
+from .utils.progress import progress
+from .utils.get_additional_data import (
+    get_days_blocks_filename,
+    get_start_block_for_day,
+    get_end_block_for_day,
+    get_day_date,
+)
+
+
+def order_points_like_state_file(points, state_data, touched_addresses) -> Dict[str, Points]:
+    """
+    Order points the way the separate points stage does.
+
+    `daily_points_v2` starts from the state file, so its points keep the order
+    of the start state (NFT holders, then pilot vault holders) followed by
+    addresses in the order the day's events first touched them. Matching it
+    keeps points files byte-identical between fused and audit runs.
+    """
+    ordered_points = {}
+    for address in (
+        *state_data["nft"]["start_state"],
+        *state_data["pilot_vault"]["start_state"],
+        *touched_addresses,
+    ):
+        if address not in ordered_points and address in points:
+            ordered_points[address] = points[address]
+    for address, address_points in points.items():
+        if address not in ordered_points:
+            ordered_points[address] = address_points
+    return ordered_points
+
+
+def is_holder(state: UserState):
+    return state.balance > 0 or len(state.nft_ids) > 0
+
+
+def process_day(day_index: int, user_state_before_start_block: dict[str, UserState]):
+    """Replay one day, write its state and points files and return its end state"""
+    start_block = get_start_block_for_day(day_index)
+    end_block = get_end_block_for_day(day_index)
+    block_number_to_events = read_combined_sorted_events(day_index)
+    user_state = copy.deepcopy(user_state_before_start_block)
+
+    points: Dict[str, Points] = defaultdict(int)
+    touched_addresses = {}
+    holders = {address: state for address, state in user_state.items() if is_holder(state)}
+
+    for block_number in range(start_block, end_block + 1):
+        events = block_number_to_events.get(block_number, ())
+        for event in events:
+            user_state = process_event_above_user_state(event, user_state)
+            for address in (event["args"]["from"].lower(), event["args"]["to"].lower()):
+                if address != ZERO_ADDRESS:
+                    touched_addresses.setdefault(address)
+                    if is_holder(user_state[address]):
+                        holders[address] = user_state[address]
+                    else:
+                        holders.pop(address, None)
+        if block_number > daily_points_v2.lp_balances_snapshot_start_block:
+            points = give_points_for_user_state(holders, points)
+
+    # The holders points were given to are the users the end state has
+    validate_user_states(day_index, user_state, holders)
+
+    daily_state = DailyState(
+        day_index=day_index,
+        date=get_day_date(day_index),
+        start_block=start_block,
+        end_block=end_block,
+        user_state=user_state,
+    )
+    state_data = build_state_file_data(daily_state, user_state_before_start_block)
+
+    write_state_data_to_file(state_data)
+    write_points_to_file(
+        day_index,
+        order_points_like_state_file(points, state_data, touched_addresses),
+        daily_state.date,
+        start_block,
+        end_block,
+    )
+    return daily_state
+
+
+STAGE = "states_and_points"
+PROGRESS_TASK = "states and points"
+
+
+def get_stage_version():
+    return stage_cache.get_code_version(sys.modules[__name__])
+
+
+def get_day_inputs(day_index):
+    """Files a day's state and points are computed from"""
+    inputs = [
+        get_days_blocks_filename(day_index),
+        get_transfer_events_file(day_index),
+        get_nft_events_file(day_index),
+        "data/lp_balances_snapshot.json",
+    ]
+    if day_index == 0:
+        inputs.append("data/deployment_blocks.json")
+    else:
+        inputs += [get_days_blocks_filename(day_index - 1), f"data/states/{day_index - 1}.json"]
+    return inputs
+
+
+def get_day_outputs(day_index):
+    return [f"data/states/{day_index}.json", f"data/points/{day_index}.json"]
+
+
+def load_end_state(day_index):
+    """
+    The end state a day's replay finished with, from its state file.
+
+    State files only have users with a balance or NFTs, while the replayed
+    state also keeps users who had them before, in the order the events first
+    touched them. That order decides the order of the next days' files, so it
+    is restored from the day's manifest. A holder's NFT ids are a set, their
+    order can still differ from a full replay's; the values are the same, and
+    the next day's changed state file makes it recompute too.
+    """
+    user_state = get_user_state_at_day(day_index, "end_state")
+    manifest = stage_cache.load_manifest(STAGE, day_index)
+    ordered_user_state = defaultdict(UserState)
+    for address in manifest.get("end_state_addresses", []):
+        ordered_user_state[address] = user_state[address]
+    for address, state in user_state.items():
+        ordered_user_state[address] = state
+    return ordered_user_state
+
+
+def get_start_state(day_index):
+    """
+    The state a recomputed day after skipped ones starts from: the latest
+    checkpoint before it with the states of the days in between replayed,
+    or without one the previous day's end state from its state file.
+    """
+    checkpoint_day, user_state = find_checkpoint(day_index, get_state_file)
+    if checkpoint_day is None:
+        return load_end_state(day_index - 1)
+    for replayed_day in range(checkpoint_day + 1, day_index):
+        daily_state = calculate_daily_state_after_end_block(replayed_day, user_state)
+        user_state = clear_cached_values_for_zero_balances(daily_state.user_state)
+    return user_state
+
+
+def process_day_if_changed(day_index, user_state_before_start_block, version, checkpoint_interval=0):
+    """
+    `process_day` unless the day is up to date, see utils/stage_cache.py.
+    Returns the state to start the next day from, or None when the day was
+    skipped; pass that None on and the next recomputed day gets its start
+    state with `get_start_state`. Saves a checkpoint after every
+    `checkpoint_interval` days.
+    """
+    with span("day", day_index=day_index) as day_span:
+        if stage_cache.is_up_to_date(STAGE, day_index, version, get_day_inputs(day_index), get_day_outputs(day_index)):
+            day_span["attributes"]["skipped"] = True
+            return None
+        if user_state_before_start_block is None:
+            user_state_before_start_block = get_start_state(day_index)
+        event_repository.prefetch_window(day_index)
+        daily_state = process_day(day_index, user_state_before_start_block)
+        stage_cache.save_manifest(
+            STAGE,
+            day_index,
+            version,
+            get_day_inputs(day_index),
+            get_day_outputs(day_index),
+            end_state_addresses=list(daily_state.user_state),
+        )
+    # See daily_states_v2.process_daily_states for why cached values are cleared
+    user_state = clear_cached_values_for_zero_balances(daily_state.user_state)
+    if checkpoint_interval and (day_index + 1) % checkpoint_interval == 0:
+        save_checkpoint(day_index, user_state, get_state_file(day_index))
+    return user_state
+
+
+def process_daily_states_and_points():
+    daily_points_v2.initialize_global_variables()
+    days_amount = get_days_amount()
+    version = get_stage_version()
+    checkpoint_interval = get_checkpoint_interval_days()
+    user_state_before_start_block = defaultdict(UserState)
+    skipped_days = 0
+    progress.start_task(PROGRESS_TASK, total_days=days_amount)
+    for day_index in range(days_amount):
+        user_state_before_start_block = process_day_if_changed(
+            day_index, user_state_before_start_block, version, checkpoint_interval
+        )
+        if user_state_before_start_block is None:
+            skipped_days += 1
+        progress.advance(PROGRESS_TASK, days=1)
+    progress.finish_task(PROGRESS_TASK)
+    if skipped_days:
+        print(f"Skipped {skipped_days} of {days_amount} days with unchanged inputs")
+
+
+if __name__ == "__main__":
+    process_daily_states_and_points()
@@ -1,15 +1,23 @@
+import argparse
 from datetime import datetime
 from .utils.process_event_above_user_state import (
     UserState,
     process_event_above_user_state,
 )
-from .utils.read_combined_sorted_events import read_combined_sorted_events
-import json
+from .utils.read_combined_sorted_events import (
+    read_combined_sorted_events,
+    iter_events_in_block_range,
+)
+from .utils.event_repository import event_repository
 import glob
 from collections import defaultdict
 import os
 import copy
+from .utils.config import get_checkpoint_interval_days
 from .utils.get_days_amount import get_days_amount
+from .utils.instrumentation import span
+from .utils.json_backend import load_json, dump_json
+from .utils.state_checkpoints import find_checkpoint, save_checkpoint
 from .utils.get_additional_data import (
     get_start_block_for_day,
     get_end_block_for_day,
@@ -42,8 +50,9 @@ def calculate_daily_state_after_end_block(
     start_block = get_start_block_for_day(day_index)
     end_block = get_end_block_for_day(day_index)
 
-    for block_number in range(start_block, end_block + 1):
-        events = block_number_to_events[block_number]
+    for _, events in iter_events_in_block_range(
+        block_number_to_events, start_block, end_block
+    ):
         for event in events:
             user_state = process_event_above_user_state(event, user_state)
 
@@ -65,7 +74,7 @@ def clear_cached_values_for_zero_balances(user_state: dict[str, UserState]):
     return user_state
 
 
-def write_user_state_to_file(
+def build_state_file_data(
     daily_state_after_end_block: DailyState,
     user_state_before_start_block: dict[str, UserState],
 ):
@@ -98,35 +107,90 @@ def write_user_state_to_file(
         if len(state.nft_ids) > 0
     }
 
+    return {
+        "start_block": daily_state_after_end_block.start_block,
+        "end_block": daily_state_after_end_block.end_block,
+        "date": daily_state_after_end_block.date,
+        "day_index": daily_state_after_end_block.day_index,
+        "nft": {
+            "start_state": daily_nft_ids_before_start_block,
+            "end_state": daily_nft_ids_after_end_block,
+        },
+        "pilot_vault": {
+            "start_state": daily_balances_before_start_block,
+            "end_state": daily_balances_after_end_block,
+        },
+    }
+
+
+def get_state_file(day_index):
+    return f"data/states/{day_index}.json"
+
+
+def write_state_data_to_file(state_data):
     os.makedirs(os.path.dirname(f"data/states/"), exist_ok=True)
-    with open(f"data/states/{daily_state_after_end_block.day_index}.json", "w") as f:
-        json.dump(
-            {
-                "start_block": daily_state_after_end_block.start_block,
-                "end_block": daily_state_after_end_block.end_block,
-                "date": daily_state_after_end_block.date,
-                "day_index": daily_state_after_end_block.day_index,
-                "nft": {
-                    "start_state": daily_nft_ids_before_start_block,
-                    "end_state": daily_nft_ids_after_end_block,
-                },
-                "pilot_vault": {
-                    "start_state": daily_balances_before_start_block,
-                    "end_state": daily_balances_after_end_block,
-                },
-            },
-            f,
-            indent=2,
-        )
-
-def process_daily_states():
+    dump_json(state_data, get_state_file(state_data["day_index"]))
+
+
+def write_user_state_to_file(
+    daily_state_after_end_block: DailyState,
+    user_state_before_start_block: dict[str, UserState],
+):
+    write_state_data_to_file(
+        build_state_file_data(daily_state_after_end_block, user_state_before_start_block)
+    )
+
+
+def get_first_day_without_state_file(days_amount):
+    return next(
+        (day_index for day_index in range(days_amount) if not os.path.exists(get_state_file(day_index))),
+        days_amount,
+    )
+
+
+def write_resumed_state_file(daily_state: DailyState):
+    """
+    Write the state file of the day after a checkpoint. Its start state is
+    the checkpointed day's end state, with NFT ids in the order of the sets
+    the replay had; the sets rebuilt from the checkpoint have the order of
+    their copies.
+    """
+    state_data = build_state_file_data(daily_state, {})
+    previous_state_data = load_json(get_state_file(daily_state.day_index - 1))
+    for key in ("nft", "pilot_vault"):
+        state_data[key]["start_state"] = previous_state_data[key]["end_state"]
+    write_state_data_to_file(state_data)
+
+
+def process_daily_states(from_day=0):
+    """
+    Write the state files of `from_day` and the days after it. The replay
+    starts from the latest checkpoint before `from_day`, see
+    utils/state_checkpoints.py, and the days between it and `from_day` are
+    replayed without being written.
+    """
     days_amount = get_days_amount()
-    user_state_before_start_block = defaultdict(UserState)
-    for day_index in range(days_amount):
-        daily_state = calculate_daily_state_after_end_block(
-            day_index, copy.deepcopy(user_state_before_start_block)
-        )
-        write_user_state_to_file(daily_state, user_state_before_start_block)
+    checkpoint_interval = get_checkpoint_interval_days()
+    checkpoint_day, user_state_before_start_block = find_checkpoint(from_day, get_state_file)
+    if checkpoint_day is None:
+        first_day = 0
+        user_state_before_start_block = defaultdict(UserState)
+    else:
+        first_day = checkpoint_day + 1
+        print(f"Resuming from the checkpoint after day {checkpoint_day}")
+    for day_index in range(first_day, days_amount):
+        with span("day", day_index=day_index):
+            event_repository.prefetch_window(day_index)
+            # The checkpoint's sets are rebuilt like `deepcopy` does, so it is replayed as is
+            resumed = day_index == first_day and checkpoint_day is not None
+            daily_state = calculate_daily_state_after_end_block(
+                day_index,
+                user_state_before_start_block if resumed else copy.deepcopy(user_state_before_start_block),
+            )
+            if day_index >= from_day and resumed:
+                write_resumed_state_file(daily_state)
+            elif day_index >= from_day:
+                write_user_state_to_file(daily_state, user_state_before_start_block)
         # Since we write to state file only users with non-zero balances, there's a probability
         # that will be user who withdrawed all his balance and next day deposited it back.
         # In this case restoring his balance from state file we'll see that his last positive and negative
@@ -134,7 +198,23 @@ def process_daily_states():
         # So it was decided to count these types of users as new users and assume that their last positive and negative
         # balance update block is 0. It was made to make state files only contain users with non-zero balances.
         user_state_before_start_block = clear_cached_values_for_zero_balances(daily_state.user_state)
+        if checkpoint_interval and (day_index + 1) % checkpoint_interval == 0:
+            save_checkpoint(day_index, user_state_before_start_block, get_state_file(day_index))
 
 
 if __name__ == "__main__":
-    process_daily_states()
+    parser = argparse.ArgumentParser(description="Replay the events into daily state files")
+    parser.add_argument(
+        "--from-day",
+        type=int,
+        default=0,
+        help="Write the state files from this day on, e.g. after its events were corrected",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Start from the first day without a state file, e.g. after a crash",
+    )
+    args = parser.parse_args()
+    from_day = get_first_day_without_state_file(get_days_amount()) if args.resume else args.from_day
+    process_daily_states(from_day)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Differential check of data/states and data/points against an independent
+reference implementation.
+
+`validate_end_state` only compares the points stage's replay with the states
+stage's, and both run `process_event_above_user_state`, so a bug in it passes.
+This recomputes every day from its events with its own minimal code and
+shares nothing with the pipeline but the file formats:
+
+- a day starts from the previous day's stored end state (nothing for day 0),
+  so days are independent and are sharded over a process pool,
+- the day's NFT and pilot vault events are applied in (block, transaction,
+  log) order,
+- points are summed per stretch of blocks between events instead of per
+  block: balance above the LP snapshot times POINTS_PER_TOKEN, or
+  POINTS_PER_TOKEN_WITH_NFT for NFT holders, for every block after the
+  snapshot's start block.
+
+The stored start state, end state and points are compared field by field with
+the reference, and the first divergent (day, address, field) is reported.
+
+    python3 -m src.differential_check
+    python3 -m src.differential_check --workers 8
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from .utils.json_backend import load_json
+from .utils.schemas import DailyStateFile, DayBlocks, DeploymentBlocks, EventsFile, PointsFile
+
+# Restated from the points program rules, not imported from daily_points_v2
+POINTS_PER_TOKEN = 1000
+POINTS_PER_TOKEN_WITH_NFT = 1420
+ZERO_ADDRESS = "0x" + "0" * 40
+PILOT_VAULT_FIELDS = ("balance", "last_positive_balance_update_block", "last_negative_balance_update_block")
+
+Divergence = namedtuple("Divergence", ["day_index", "address", "field", "stored", "reference"])
+
+
+class Holder:
+    def __init__(self):
+        self.balance = 0
+        self.last_positive_balance_update_block = 0
+        self.last_negative_balance_update_block = 0
+        self.nft_ids = set()
+
+
+def get_days_amount():
+    return len(glob.glob("data/days_blocks/*.json"))
+
+
+def load_day_blocks(day_index):
+    return load_json(glob.glob(f"data/days_blocks/{day_index}_*.json")[0], DayBlocks)
+
+
+def get_day_range(day_index):
+    """(date, start block, end block) of a day from the day boundary files"""
+    day_blocks = load_day_blocks(day_index)
+    if day_index == 0:
+        deployments = load_json("data/deployment_blocks.json", DeploymentBlocks)["deployments"]
+        start_block = min(deployments["nft"]["block_number"], deployments["pilot_vault"]["block_number"])
+    else:
+        start_block = load_day_blocks(day_index - 1)["first_block_of_next_day"]["number"]
+    return day_blocks["day"], start_block, day_blocks["last_block_of_day"]["number"]
+
+
+def load_holders(state_part):
+    """Holders from the `start_state`/`end_state` parts of a state file"""
+    holders = defaultdict(Holder)
+    for address, token_ids in state_part["nft"].items():
+        holders[address.lower()].nft_ids = set(token_ids)
+    for address, stored in state_part["pilot_vault"].items():
+        holder = holders[address.lower()]
+        for field in PILOT_VAULT_FIELDS:
+            setattr(holder, field, stored[field])
+    return holders
+
+
+def load_state_part(state, key):
+    return {"nft": state["nft"][key], "pilot_vault": state["pilot_vault"][key]}
+
+
+def load_events(day_index):
+    events = []
+    for path, kind in ((f"data/events/pilot_vault/{day_index}.json", "transfer"), (f"data/events/nft/{day_index}.json", "nft")):
+        events += [(kind, event) for event in load_json(path, EventsFile).get("events", [])]
+    events.sort(key=lambda item: (item[1]["blockNumber"], item[1]["transactionIndex"], item[1]["logIndex"]))
+    return events
+
+
+def apply_event(holders, kind, event):
+    from_addr, to_addr = event["args"]["from"].lower(), event["args"]["to"].lower()
+    block_number = event["blockNumber"]
+    if kind == "transfer":
+        value = event["args"]["value"]
+        if from_addr != ZERO_ADDRESS:
+            holders[from_addr].balance -= value
+            if holders[from_addr].balance < 0:
+                raise ValueError(f"{from_addr} sends more than its balance at block {block_number}")
+            holders[from_addr].last_negative_balance_update_block = block_number
+        if to_addr != ZERO_ADDRESS:
+            holders[to_addr].balance += value
+            holders[to_addr].last_positive_balance_update_block = block_number
+    else:
+        token_id = event["args"]["tokenId"]
+        if from_addr != ZERO_ADDRESS:
+            if token_id not in holders[from_addr].nft_ids:
+                raise ValueError(f"{from_addr} sends NFT {token_id} it doesn't hold at block {block_number}")
+            holders[from_addr].nft_ids.remove(token_id)
+        if to_addr != ZERO_ADDRESS:
+            holders[to_addr].nft_ids.add(token_id)
+
+
+def add_points(points, holders, snapshot_balances, blocks):
+    if blocks <= 0:
+        return
+    for address, holder in holders.items():
+        balance = holder.balance - snapshot_balances.get(address, 0)
+        if balance > 0:
+            rate = POINTS_PER_TOKEN_WITH_NFT if holder.nft_ids else POINTS_PER_TOKEN
+            points[address] += balance * rate * blocks
+
+
+def replay_day(day_index, start_holders, snapshot_balances, snapshot_start_block):
+    """Reference end state and points of a day"""
+    _, start_block, end_block = get_day_range(day_index)
+    holders = start_holders
+    points = defaultdict(int)
+    # Blocks up to the snapshot's start block earn nothing
+    first_points_block = max(start_block, snapshot_start_block + 1)
+    counted_up_to = first_points_block - 1
+    events_by_block = defaultdict(list)
+    for kind, event in load_events(day_index):
+        events_by_block[event["blockNumber"]].append((kind, event))
+
+    for block_number in sorted(events_by_block):
+        if not start_block <= block_number <= end_block:
+            continue
+        # The state before this block's events held for every block since the last counted one
+        add_points(points, holders, snapshot_balances, block_number - 1 - counted_up_to)
+        counted_up_to = max(counted_up_to, block_number - 1)
+        for kind, event in events_by_block[block_number]:
+            apply_event(holders, kind, event)
+    add_points(points, holders, snapshot_balances, end_block - counted_up_to)
+    return holders, {address: value for address, value in points.items() if value > 0}
+
+
+def get_stored_fields(holders):
+    """{address: {field: value}} of the holders a state file keeps"""
+    fields = defaultdict(dict)
+    for address, holder in holders.items():
+        if holder.balance > 0:
+            fields[address].update({field: getattr(holder, field) for field in PILOT_VAULT_FIELDS})
+        if holder.nft_ids:
+            fields[address]["nft_ids"] = sorted(holder.nft_ids)
+    return fields
+
+
+def diff_fields(day_index, part, stored, reference):
+    divergences = []
+    for address in sorted(set(stored) | set(reference)):
+        fields = sorted(set(stored.get(address, {})) | set(reference.get(address, {})))
+        for field in fields:
+            stored_value = stored.get(address, {}).get(field)
+            reference_value = reference.get(address, {}).get(field)
+            if stored_value != reference_value:
+                divergences.append(Divergence(day_index, address, f"{part}.{field}", stored_value, reference_value))
+    return divergences
+
+
+def check_day(day_index):
+    """Divergences of a day's stored state and points from the reference"""
+    snapshot = load_json("data/lp_balances_snapshot.json", DailyStateFile)
+    snapshot_balances = {
+        address.lower(): stored["balance"] for address, stored in snapshot["pilot_vault"]["start_state"].items()
+    }
+    state = load_json(f"data/states/{day_index}.json", DailyStateFile)
+    points = load_json(f"data/points/{day_index}.json", PointsFile)
+
+    divergences = []
+    date, start_block, end_block = get_day_range(day_index)
+    for field, reference_value in (("date", date), ("start_block", start_block), ("end_block", end_block)):
+        for name, stored in (("state", state), ("points", points)):
+            if stored[field] != reference_value:
+                divergences.append(Divergence(day_index, None, f"{name}.{field}", stored[field], reference_value))
+
+    if day_index == 0:
+        start_holders = defaultdict(Holder)
+    else:
+        previous_state = load_json(f"data/states/{day_index - 1}.json", DailyStateFile)
+        start_holders = load_holders(load_state_part(previous_state, "end_state"))
+    stored_start = get_stored_fields(load_holders(load_state_part(state, "start_state")))
+    divergences += diff_fields(day_index, "start_state", stored_start, get_stored_fields(start_holders))
+
+    try:
+        end_holders, reference_points = replay_day(day_index, start_holders, snapshot_balances, snapshot["start_block"])
+    except ValueError as e:
+        return divergences + [Divergence(day_index, None, "events", None, str(e))]
+    stored_end = get_stored_fields(load_holders(load_state_part(state, "end_state")))
+    divergences += diff_fields(day_index, "end_state", stored_end, get_stored_fields(end_holders))
+    divergences += diff_fields(
+        day_index,
+        "points",
+        {address.lower(): {"points": value} for address, value in points["points"].items()},
+        {address: {"points": value} for address, value in reference_points.items()},
+    )
+    return divergences
+
+
+def run_differential_check(workers=None, days=None):
+    """Divergences of every day, in day order"""
+    days = list(range(get_days_amount())) if days is None else days
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = map(check_day, days)
+    else:
+        # Spawned, since the pipeline's threads (event prefetching, RPC) make forking unsafe
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        results = executor.map(check_day, days, chunksize=max(1, len(days) // (workers * 4)))
+    divergences = []
+    try:
+        for day_index, day_divergences in zip(days, results):
+            if day_divergences:
+                print(f"Day {day_index}: {len(day_divergences)} DIFFERENCES from the reference")
+            divergences += day_divergences
+    finally:
+        if workers != 1:
+            executor.shutdown()
+    return divergences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare data/states and data/points with a reference recompute")
+    parser.add_argument("--workers", type=int, default=None, help="Processes to shard days over, all CPUs by default")
+    args = parser.parse_args()
+
+    days_amount = get_days_amount()
+    divergences = run_differential_check(args.workers)
+    if divergences:
+        first = divergences[0]
+        raise ValueError(
+            f"{len(divergences)} differences from the reference, first on day {first.day_index}, "
+            f"address {first.address}, field {first.field}: stored {first.stored}, reference {first.reference}"
+        )
+    print(f"All {days_amount} days match the reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
-import json
 from datetime import datetime, timezone
 import os
-from .utils.aggregated_w3_request import w3_instances, make_aggregated_call
+from .utils.aggregated_w3_request import (
+    get_w3_instances,
+    make_aggregated_call,
+)
+from .utils.block_verification import (
+    get_block_verified,
+    get_finalized_block_number,
+    load_trusted_block_hashes,
+)
+from .utils.json_backend import load_json, dump_json
+from .utils.schemas import DeploymentBlocks
+
+# Boundary block hashes from previous runs, see utils/block_verification.py
+trusted_block_hashes = {}
 
 
 def get_min_deployment_block():
     """Get the minimum block_number from deployment_blocks.json"""
-    with open("data/deployment_blocks.json", "r") as f:
-        deployment_data = json.load(f)
+    deployment_data = load_json("data/deployment_blocks.json", DeploymentBlocks)
     
     deployments = deployment_data.get("deployments", {})
     if not deployments:
@@ -31,7 +42,7 @@ def get_block(num, cache):
     """Fetch block with simple cache."""
     if num in cache:
         return cache[num]
-    blk = make_aggregated_call(w3_instances, lambda w3: w3.eth.get_block(num))
+    blk = get_block_verified(get_w3_instances(), num, trusted_block_hashes)
     cache[num] = blk
     return blk
 
@@ -41,6 +52,18 @@ def get_block_date(block):
     return datetime.fromtimestamp(block["timestamp"], tz=timezone.utc).date()
 
 
+def get_block_ref(block):
+    """Block fields stored for day boundaries in days_blocks files"""
+    return {
+        "number": block["number"],
+        "timestamp": block["timestamp"],
+        "utc_datetime": datetime.fromtimestamp(
+            block["timestamp"], tz=timezone.utc
+        ).isoformat(),
+        "hash": block["hash"].hex(),
+    }
+
+
 def find_first_block_strictly_after_day(start_block, latest_block, target_day):
     """
     Binary search for the smallest block number in [start_block, latest_block]
@@ -74,26 +97,34 @@ def find_first_block_strictly_after_day(start_block, latest_block, target_day):
     return None
 
 
-def main():
-    latest_block = make_aggregated_call(w3_instances, lambda w3: w3.eth.block_number)
+def iter_day_boundaries():
+    """
+    Yield the boundaries of every day from the first deployment to the
+    latest finalized block, as soon as each is found. The last one is the
+    unfinished final day, so every saved day ends on a finalized block.
+    """
+    global trusted_block_hashes
+    if os.path.exists("data/days_blocks"):
+        trusted_block_hashes = load_trusted_block_hashes()
+
+    latest_block = get_finalized_block_number(get_w3_instances())
     start_block = get_min_deployment_block()
 
     if start_block > latest_block:
         raise ValueError(f"start-block {start_block} is greater than latest block {latest_block}")
 
     # Get starting block and its day
-    start_blk = make_aggregated_call(w3_instances, lambda w3: w3.eth.get_block(start_block))
+    start_blk = make_aggregated_call(get_w3_instances(), lambda w3: w3.eth.get_block(start_block))
     start_day = get_block_date(start_blk)
     
     # Get latest block and its day
-    latest_blk = make_aggregated_call(w3_instances, lambda w3: w3.eth.get_block(latest_block))
+    latest_blk = make_aggregated_call(get_w3_instances(), lambda w3: w3.eth.get_block(latest_block))
     latest_day = get_block_date(latest_blk)
 
     print(f"Starting from block {start_block}, day = {start_day}")
-    print(f"Latest block on chain: {latest_block}, day = {latest_day}")
+    print(f"Latest finalized block: {latest_block}, day = {latest_day}")
 
     # Find boundaries for every day in the range
-    all_boundaries = []
     current_day = start_day
     current_search_start = start_block
     cache = {}  # Reuse cache across iterations
@@ -112,20 +143,13 @@ def main():
             last_block_same_day = latest_block
             last_blk = get_block(last_block_same_day, cache)
             
-            all_boundaries.append({
+            print(f"  Last block of {current_day}: {last_block_same_day} (final day)")
+            yield {
                 "day": str(current_day),
-                "last_block_of_day": {
-                    "number": last_blk["number"],
-                    "timestamp": last_blk["timestamp"],
-                    "utc_datetime": datetime.fromtimestamp(
-                        last_blk["timestamp"], tz=timezone.utc
-                    ).isoformat(),
-                    "hash": last_blk["hash"].hex(),
-                },
+                "last_block_of_day": get_block_ref(last_blk),
                 "first_block_of_next_day": None,  # No next day yet
                 "is_final_day": True,
-            })
-            print(f"  Last block of {current_day}: {last_block_same_day} (final day)")
+            }
             break
 
         last_block_same_day = first_after - 1
@@ -133,52 +157,37 @@ def main():
         first_next_blk = get_block(first_after, cache)
         next_day = get_block_date(first_next_blk)
 
-        all_boundaries.append({
-            "day": str(current_day),
-            "last_block_of_day": {
-                "number": last_blk["number"],
-                "timestamp": last_blk["timestamp"],
-                "utc_datetime": datetime.fromtimestamp(
-                    last_blk["timestamp"], tz=timezone.utc
-                ).isoformat(),
-                "hash": last_blk["hash"].hex(),
-            },
-            "first_block_of_next_day": {
-                "number": first_next_blk["number"],
-                "timestamp": first_next_blk["timestamp"],
-                "utc_datetime": datetime.fromtimestamp(
-                    first_next_blk["timestamp"], tz=timezone.utc
-                ).isoformat(),
-                "hash": first_next_blk["hash"].hex(),
-            },
-            "is_final_day": False,
-        })
-
         print(f"  Last block of {current_day}: {last_block_same_day}")
         print(f"  First block of {next_day}: {first_after}")
 
+        yield {
+            "day": str(current_day),
+            "last_block_of_day": get_block_ref(last_blk),
+            "first_block_of_next_day": get_block_ref(first_next_blk),
+            "is_final_day": False,
+        }
+
         # Move to next day
         current_day = next_day
         current_search_start = first_after
 
 
-    if not os.path.exists('data'):
-        os.makedirs('data')
+def save_day_boundary(index, boundary):
+    os.makedirs("data/days_blocks", exist_ok=True)
+    filename = f"data/days_blocks/{index}_{boundary['day']}.json"
+    dump_json(boundary, filename)
+    return filename
+
+
+def main():
+    all_boundaries = list(iter_day_boundaries())
 
-    if not os.path.exists('data/days_blocks'):
-        os.makedirs('data/days_blocks')
-    
     saved_count = 0
     for index, boundary in enumerate(all_boundaries):
         if not boundary.get("is_final_day", False):
-            date_str = boundary["day"]
-            filename = f"data/days_blocks/{index}_{date_str}.json"
-            
-            with open(filename, "w") as f:
-                json.dump(boundary, f, indent=2)
-            
+            filename = save_day_boundary(index, boundary)
             saved_count += 1
-            print(f"Saved day {index} ({date_str}) to {filename}")
+            print(f"Saved day {index} ({boundary['day']}) to {filename}")
     
     print(f"\nSaved {saved_count} individual day files (excluding final day)")
 
@@ -2,7 +2,12 @@ import json
 import sys
 import os
 from datetime import datetime, timezone
-from .utils.aggregated_w3_request import w3_instances, make_aggregated_call
+from .utils.aggregated_w3_request import (
+    get_w3_instances,
+    make_aggregated_call,
+)
+from .utils.block_verification import get_finalized_block_number
+from .utils.json_backend import dump_json
 from web3 import Web3
 
 def load_contract_addresses():
@@ -38,7 +43,7 @@ def load_contract_addresses():
 def has_contract_code(address, block_number):
     """Check if contract has code at a specific block"""
     try:
-        code = make_aggregated_call(w3_instances, lambda w3: w3.eth.get_code(address, block_number))
+        code = make_aggregated_call(get_w3_instances(), lambda w3: w3.eth.get_code(address, block_number))
         return len(code) > 0
     except Exception as e:
         print(f"Warning: Error checking code at block {block_number}: {e}")
@@ -52,13 +57,13 @@ def find_deployment_block(address, start_block=0, end_block=None):
     Args:
         address: Contract address
         start_block: Starting block for search (default: 0)
-        end_block: Ending block for search (default: latest block)
+        end_block: Ending block for search (default: latest finalized block)
     
     Returns:
         Block number where contract was deployed, or None if not found
     """
     if end_block is None:
-        end_block = make_aggregated_call(w3_instances, lambda w3: w3.eth.block_number)
+        end_block = get_finalized_block_number(get_w3_instances())
     
     print(f"  Searching for deployment block between {start_block} and {end_block}...")
     
@@ -86,16 +91,20 @@ def find_deployment_block(address, start_block=0, end_block=None):
     return result
 
 
+def build_block_info(block_number, block):
+    return {
+        'block_number': block_number,
+        'timestamp': block.timestamp,
+        'datetime': datetime.fromtimestamp(block.timestamp, tz=timezone.utc).isoformat(),
+        'hash': block.hash.hex()
+    }
+
+
 def get_block_info(block_number):
     """Get block information including timestamp"""
     try:
-        block = make_aggregated_call(w3_instances, lambda w3: w3.eth.get_block(block_number))
-        return {
-            'block_number': block_number,
-            'timestamp': block.timestamp,
-            'datetime': datetime.fromtimestamp(block.timestamp, tz=timezone.utc).isoformat(),
-            'hash': block.hash.hex()
-        }
+        block = make_aggregated_call(get_w3_instances(), lambda w3: w3.eth.get_block(block_number))
+        return build_block_info(block_number, block)
     except Exception as e:
         print(f"Error getting block info for block {block_number}: {e}")
         return None
@@ -112,9 +121,9 @@ def main():
     
     # Initialize Web3 connection
     print("\n2. Connecting to blockchain...")
-    # Get latest block
-    latest_block = make_aggregated_call(w3_instances, lambda w3: w3.eth.block_number)
-    print(f"   Latest block: {latest_block}")
+    # Get latest finalized block, a deployment in a block that can still be reorged out isn't saved
+    latest_block = get_finalized_block_number(get_w3_instances())
+    print(f"   Latest finalized block: {latest_block}")
     
     # Find deployment blocks
     results = {}
@@ -182,8 +191,7 @@ def main():
         os.makedirs('data')
 
     output_file = 'data/deployment_blocks.json'
-    with open(output_file, 'w') as f:
-        json.dump(output_data, f, indent=2)
+    dump_json(output_data, output_file)
     
     print(f"\nResults saved to {output_file}")
 
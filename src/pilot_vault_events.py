@@ -1,5 +1,4 @@
 #!/usr/bin/env python3
-import json
 import os
 import glob
 import re
@@ -7,7 +6,19 @@ from web3 import Web3
 from datetime import datetime
 import time
 import sys
-from .utils.aggregated_w3_request import create_contract_instances, w3_instances, make_aggregated_call
+from .utils.json_backend import load_json, dump_json
+from .utils.schemas import DayBlocks, DeploymentBlocks
+from .utils.block_verification import get_logs_verified, load_trusted_block_hashes, normalize_hash
+from .utils.config import get_logs_bloom_prefilter, get_max_logs_block_range
+from .utils.header_cache import header_cache
+from .utils.log_ranges import get_matching_block_ranges, split_block_range
+from .utils.event_order import sort_and_deduplicate_events
+from .utils.instrumentation import span
+from .utils.progress import progress
+from .utils.stage_cache import events_file_matches
+from .utils.aggregated_w3_request import create_contract_instances, get_w3_instances
+
+PROGRESS_TASK = "pilot vault events"
 
 # ABI for Transfer event
 TRANSFER_EVENT_ABI = [
@@ -26,8 +37,7 @@ TRANSFER_EVENT_ABI = [
 
 def get_pilot_vault_deployment_block():
     """Get pilot_vault block_number from deployment_blocks.json"""
-    with open("data/deployment_blocks.json", "r") as f:
-        deployment_data = json.load(f)
+    deployment_data = load_json("data/deployment_blocks.json", DeploymentBlocks)
     
     pilot_vault_data = deployment_data.get("deployments", {}).get("pilot_vault")
     if not pilot_vault_data:
@@ -66,21 +76,37 @@ def get_day_block_files():
     return file_data
 
 
-def read_events_chunked(contracts, start_block, end_block, chunk_size=10000):
-    """Read events in chunks to avoid RPC limits"""
+def read_events_chunked(contracts, start_block, end_block, chunk_size=None, trusted_hashes=None):
+    """Read events in chunks to avoid RPC limits, checking the logs against the known boundary block hashes"""
+    chunk_size = chunk_size or get_max_logs_block_range()
+    trusted_hashes = trusted_hashes or {}
     print(f"  Fetching events from block {start_block} to {end_block}...")
     
+    block_ranges = split_block_range(start_block, end_block, chunk_size)
+    if get_logs_bloom_prefilter():
+        matching_ranges, header_hashes = get_matching_block_ranges(
+            [contract.w3 for contract in contracts], contracts[0].address, start_block, end_block, chunk_size, trusted_hashes
+        )
+        print(f"    Logs bloom prefilter: fetching {len(matching_ranges)} ranges instead of {len(block_ranges)} chunks")
+        block_ranges = matching_ranges
+        # The boundary hashes are trusted, a header cached from a fork can't override them
+        trusted_hashes = {**header_hashes, **trusted_hashes}
+    
     all_logs = []
-    current_block = start_block
     
-    while current_block < end_block:
-        chunk_end = min(current_block + chunk_size - 1, end_block)
-        
+    for current_block, chunk_end in block_ranges:
         try:
-            print(f"    Fetching logs from block {current_block} to {chunk_end}...")
-            logs = make_aggregated_call(contracts, lambda contract: contract.events.Transfer().get_logs(from_block=current_block, to_block=chunk_end))
+            logs = get_logs_verified(
+                contracts,
+                lambda contract, from_block, to_block: contract.events.Transfer().get_logs(
+                    from_block=from_block, to_block=to_block
+                ),
+                current_block,
+                chunk_end,
+                trusted_hashes,
+                header_cache.get_cached_headers(current_block, chunk_end, trusted_hashes),
+            )
             all_logs.extend(logs)
-            print(f"    Found {len(logs)} events in this chunk")
             
             # Small delay to avoid rate limiting
             time.sleep(0.1)
@@ -90,76 +116,88 @@ def read_events_chunked(contracts, start_block, end_block, chunk_size=10000):
             # Try smaller chunk size if we get an error
             if chunk_size > 1000:
                 print(f"    Retrying with smaller chunk size: {chunk_size // 2}")
-                return read_events_chunked(contracts, start_block, end_block, chunk_size // 2)
+                return read_events_chunked(contracts, start_block, end_block, chunk_size // 2, trusted_hashes)
             else:
                 print("Could not fetch events from block {current_block} to {chunk_end}")
                 sys.exit(1)
-        
-        current_block = chunk_end + 1
     
     return all_logs
 
 
-def fetch_and_save_events(contracts, contract_address, start_block, end_block, output_file):
+def get_event_data(log):
+    return {
+        "blockNumber": log.blockNumber,
+        "blockHash": normalize_hash(log.blockHash),
+        "transactionHash": log.transactionHash.hex(),
+        "logIndex": log.logIndex,
+        "args": dict(log.args),
+        "transactionIndex": log.transactionIndex
+    }
+
+
+def build_events_file_data(contract_address, start_block, end_block, logs, end_block_hash=None):
+    """Events file contents for decoded Transfer logs, `end_block_hash` is the hash they were read up to"""
+    # Overlapping chunks or retried ranges can return a log twice
+    events_data = sort_and_deduplicate_events([get_event_data(log) for log in logs])
+    return {
+        "error": False,
+        "metadata": {
+            "contractAddress": contract_address,
+            "eventName": "Transfer",
+            "startBlock": start_block,
+            "endBlock": end_block,
+            "totalEvents": len(events_data),
+            "endBlockHash": end_block_hash,
+            "isSorted": True,
+            "exportedAt": datetime.now().isoformat()
+        },
+        "events": events_data
+    }
+
+
+def build_missing_contract_file_data(contract_address, start_block, end_block):
+    """Events file contents for a day before the contract was deployed"""
+    return {
+        "error": True,
+        "error_message": f"Contract does not exist at this time: start_block ({start_block}) is greater than end_block ({end_block})",
+        "metadata": {
+            "contractAddress": contract_address,
+            "eventName": "Transfer",
+            "startBlock": start_block,
+            "endBlock": end_block,
+            "totalEvents": 0,
+            "isSorted": True,
+            "exportedAt": datetime.now().isoformat()
+        },
+        "events": []
+    }
+
+
+def fetch_and_save_events(contracts, contract_address, start_block, end_block, output_file, trusted_hashes=None):
     """Fetch transfer events and save to JSON file"""
     # Validate block range
     if start_block > end_block:
         print(f"  INFO: Contract does not exist at this time - start_block ({start_block}) > end_block ({end_block})")
-        output_data = {
-            "error": True,
-            "error_message": f"Contract does not exist at this time: start_block ({start_block}) is greater than end_block ({end_block})",
-            "metadata": {
-                "contractAddress": contract_address,
-                "eventName": "Transfer",
-                "startBlock": start_block,
-                "endBlock": end_block,
-                "totalEvents": 0,
-                "exportedAt": datetime.now().isoformat()
-            },
-            "events": []
-        }
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f, indent=2)
+        output_data = build_missing_contract_file_data(contract_address, start_block, end_block)
+        dump_json(output_data, output_file)
         print(f"  Information saved to {output_file}")
+        progress.advance(PROGRESS_TASK, days=1)
         return
     
     try:
-        logs = read_events_chunked(contracts, start_block, end_block)
+        logs = read_events_chunked(contracts, start_block, end_block, trusted_hashes=trusted_hashes)
         if logs is None:
             logs = []
         
         print(f"  Total Transfer events: {len(logs)}")
         
-        # Prepare data for JSON output
-        events_data = []
-        for log in logs:
-            event_data = {
-                "blockNumber": log.blockNumber,
-                "transactionHash": log.transactionHash.hex(),
-                "logIndex": log.logIndex,
-                "args": dict(log.args),
-                "transactionIndex": log.transactionIndex
-            }
-            events_data.append(event_data)
-        
-        # Save to JSON file
-        output_data = {
-            "error": False,
-            "metadata": {
-                "contractAddress": contract_address,
-                "eventName": "Transfer",
-                "startBlock": start_block,
-                "endBlock": end_block,
-                "totalEvents": len(events_data),
-                "exportedAt": datetime.now().isoformat()
-            },
-            "events": events_data
-        }
-        
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f, indent=2)
+        output_data = build_events_file_data(
+            contract_address, start_block, end_block, logs, (trusted_hashes or {}).get(end_block)
+        )
+        dump_json(output_data, output_file)
         
         print(f"  Events saved to {output_file}")
+        progress.advance(PROGRESS_TASK, blocks=end_block - start_block + 1, events=len(logs), days=1)
         
     except Exception as e:
         print(f"  Error reading events: {e}")
@@ -185,7 +223,7 @@ def main():
     # Setup contract
     print("Setting up contract...")
     contract_address = Web3.to_checksum_address(pilot_vault_address)
-    contracts = create_contract_instances(w3_instances, contract_address, TRANSFER_EVENT_ABI)
+    contracts = create_contract_instances(get_w3_instances(), contract_address, TRANSFER_EVENT_ABI)
     
     # Create output directory
     output_dir = "data/events/pilot_vault"
@@ -197,8 +235,7 @@ def main():
     
     # First range: (deployment_block, last_block_of_day from file 0)
     if day_files:
-        with open(day_files[0][1], 'r') as f:
-            day_data_0 = json.load(f)
+        day_data_0 = load_json(day_files[0][1], DayBlocks)
         last_block_0 = day_data_0["last_block_of_day"]["number"]
         ranges.append((0, deployment_block, last_block_0))
         print(f"Range 0: blocks {deployment_block} to {last_block_0} (inclusive)")
@@ -206,31 +243,42 @@ def main():
     # Subsequent ranges: (first_block_of_next_day from previous file, last_block_of_day from current file)
     for i in range(len(day_files) - 1):
         # Read previous file
-        with open(day_files[i][1], 'r') as f:
-            prev_day_data = json.load(f)
+        prev_day_data = load_json(day_files[i][1], DayBlocks)
         first_block_next = prev_day_data["first_block_of_next_day"]["number"]
         
         # Read current file
-        with open(day_files[i + 1][1], 'r') as f:
-            curr_day_data = json.load(f)
+        curr_day_data = load_json(day_files[i + 1][1], DayBlocks)
         last_block_curr = curr_day_data["last_block_of_day"]["number"]
         
         ranges.append((i + 1, first_block_next, last_block_curr))
         print(f"Range {i + 1}: blocks {first_block_next} to {last_block_curr} (inclusive)")
 
+    # Day boundary hashes let chunks ending on a boundary be read from one provider
+    trusted_hashes = load_trusted_block_hashes()
+
     # Fetch events for each range
     print(f"\nFetching transfer events for {len(ranges)} ranges...")
+    pending_ranges = []
     for range_index, start_block, end_block in ranges:
         output_file = os.path.join(output_dir, f"{range_index}.json")
-        
-        # Skip if file already exists
-        if os.path.exists(output_file):
+
+        # Skip if the file was already fetched for this range
+        if events_file_matches(output_file, contract_address, start_block, end_block, trusted_hashes.get(end_block)):
             print(f"\nSkipping range {range_index}: file {output_file} already exists")
             continue
-        
+        pending_ranges.append((range_index, start_block, end_block, output_file))
+
+    progress.start_task(
+        PROGRESS_TASK,
+        total_blocks=sum(max(0, end_block - start_block + 1) for _, start_block, end_block, _ in pending_ranges),
+        total_days=len(pending_ranges),
+    )
+    for range_index, start_block, end_block, output_file in pending_ranges:
         print(f"\nProcessing range {range_index}: blocks {start_block} to {end_block}")
-        fetch_and_save_events(contracts, contract_address, start_block, end_block, output_file)
-    
+        with span("day", day_index=range_index):
+            fetch_and_save_events(contracts, contract_address, start_block, end_block, output_file, trusted_hashes)
+
+    progress.finish_task(PROGRESS_TASK)
     print(f"\nCompleted! Processed {len(ranges)} ranges.")
 
 
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+On-chain reconciliation of every data/states file.
+
+test_user_balance.py and test_nft_balance.py make one eth_call per holder or
+token, so they only check two state files. This checks each day's end state
+at its `end_block` with a few calls per day:
+
+- the pilot vault `balanceOf` of every address in the end state, its
+  `baseTotalSupply` and the NFT `totalSupply` go in one Multicall3
+  `aggregate3` call, the stored balances have to add up to the base total
+  supply so a holder missing from the state file is found too,
+- then `ownerOf` of every token id up to the highest one minted by the
+  day's end block, and of every token id in the end state, in another one.
+  Burned tokens lower the NFT total supply below the highest id, so the ids
+  come from the mints (transfers from the zero address) in the NFT events
+  files, and also go up to the total supply in case a mint is missing from
+  them.
+
+Calls are split in batches of MULTICALL_BATCH_SIZE and read from a quorum of
+providers like other state reads. On a block before Multicall3 was deployed
+the calls are sent as JSON-RPC batches instead. A reverted balance or total
+supply call is reported as a difference. Days are checked in parallel
+by WORKERS threads.
+
+    python3 -m src.reconcile_states                     # every data/states file
+    python3 -m src.reconcile_states data/states/84.json
+"""
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from eth_abi import decode, encode
+from eth_utils import keccak
+from web3 import Web3
+from .find_deployment_blocks import load_contract_addresses
+from .utils.aggregated_w3_request import get_w3_instances, make_aggregated_call, STATE_READ_POLICY
+from .utils.event_repository import get_nft_events_file
+from .utils.json_backend import load_json
+from .utils.process_event_above_user_state import ZERO_ADDRESS
+from .utils.schemas import DailyStateFile, EventsFile
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL_BATCH_SIZE = 500
+WORKERS = 4
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    }
+]
+
+
+def encode_call(signature, types=(), args=()):
+    return keccak(text=signature)[:4] + encode(list(types), list(args))
+
+
+def get_day_index(path):
+    match = re.match(r"(\d+)\.json$", os.path.basename(path))
+    return int(match.group(1)) if match else -1
+
+
+def get_state_files():
+    return sorted((path for path in glob.glob("data/states/*.json") if get_day_index(path) >= 0), key=get_day_index)
+
+
+def get_highest_minted_token_ids():
+    """{day_index: highest NFT token id minted up to the day's end block} of every NFT events file"""
+    day_indexes = sorted(get_day_index(path) for path in glob.glob(get_nft_events_file("*")) if get_day_index(path) >= 0)
+    highest_minted_token_ids = {}
+    highest_minted_token_id = 0
+    for day_index in day_indexes:
+        for event in load_json(get_nft_events_file(day_index), EventsFile).get("events", []):
+            if event["args"]["from"].lower() == ZERO_ADDRESS:
+                highest_minted_token_id = max(highest_minted_token_id, int(event["args"]["tokenId"]))
+        highest_minted_token_ids[day_index] = highest_minted_token_id
+    return highest_minted_token_ids
+
+
+def has_multicall(block_number):
+    code = make_aggregated_call(
+        get_w3_instances(), lambda w3: w3.eth.get_code(MULTICALL3_ADDRESS, block_number), STATE_READ_POLICY
+    )
+    return len(code) > 0
+
+
+def call_multicall(w3, calls, block_number):
+    multicall = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    results = multicall.functions.aggregate3([(target, True, data) for target, data in calls]).call(
+        block_identifier=block_number
+    )
+    return [(success, bytes(return_data)) for success, return_data in results]
+
+
+def call_batch(w3, calls, block_number):
+    # Straight to the provider, so a reverted call fails alone like in aggregate3
+    responses = w3.provider.make_batch_request(
+        [("eth_call", [{"to": target, "data": "0x" + data.hex()}, hex(block_number)]) for target, data in calls]
+    )
+    # A batch the node rejects as a whole is a single error response
+    if not isinstance(responses, list):
+        raise ValueError(f"Batch of {len(calls)} eth_calls failed: {responses}")
+    return [
+        (False, b"") if "error" in response else (True, bytes.fromhex(response["result"][2:]))
+        for response in responses
+    ]
+
+
+def aggregate_calls(calls, block_number, use_multicall):
+    """(success, return data) of each (target, call data) at `block_number`"""
+    call_many = call_multicall if use_multicall else call_batch
+    results = []
+    for i in range(0, len(calls), MULTICALL_BATCH_SIZE):
+        batch = calls[i:i + MULTICALL_BATCH_SIZE]
+        results.extend(
+            make_aggregated_call(get_w3_instances(), lambda w3: call_many(w3, batch, block_number), STATE_READ_POLICY)
+        )
+    return results
+
+
+def decode_result(abi_type, result):
+    """Decoded return value of a call, None if it reverted or returned nothing"""
+    success, data = result
+    return decode([abi_type], data)[0] if success and data else None
+
+
+def get_onchain_state(addresses, holders, token_ids, highest_minted_token_id, block_number):
+    """
+    Pilot vault balances of `holders`, its base total supply and NFT token ids by owner at `block_number`,
+    None in place of a balance or total supply whose call reverted. Owners are read for `token_ids` and
+    every token id up to `highest_minted_token_id` or the NFT total supply, whichever is higher.
+    """
+    use_multicall = has_multicall(block_number)
+    pilot_vault = Web3.to_checksum_address(addresses["pilot_vault"])
+    nft = Web3.to_checksum_address(addresses["nft"])
+
+    calls = [(nft, encode_call("totalSupply()")), (pilot_vault, encode_call("baseTotalSupply()"))]
+    calls += [
+        (pilot_vault, encode_call("balanceOf(address)", ["address"], [Web3.to_checksum_address(holder)]))
+        for holder in holders
+    ]
+    results = aggregate_calls(calls, block_number, use_multicall)
+    nft_total_supply = decode_result("uint256", results[0])
+    if nft_total_supply is None:
+        # Without it the token ids to check aren't known
+        raise ValueError(f"NFT totalSupply() call failed at block {block_number}")
+    pilot_vault_total_supply = decode_result("uint256", results[1])
+    balances = {holder: decode_result("uint256", result) for holder, result in zip(holders, results[2:])}
+
+    token_ids = sorted(set(range(1, max(highest_minted_token_id, nft_total_supply) + 1)) | set(token_ids))
+    calls = [(nft, encode_call("ownerOf(uint256)", ["uint256"], [token_id])) for token_id in token_ids]
+    nft_owners = defaultdict(set)
+    for token_id, (success, data) in zip(token_ids, aggregate_calls(calls, block_number, use_multicall)):
+        # Burned and not yet minted tokens revert
+        if success:
+            nft_owners[decode(["address"], data)[0].lower()].add(token_id)
+    return balances, pilot_vault_total_supply, dict(nft_owners)
+
+
+def reconcile_state_file(state_file, addresses, highest_minted_token_ids):
+    """Differences between a state file's end state and the chain at its end block"""
+    state = load_json(state_file, DailyStateFile)
+    block_number = state["end_block"]
+    pilot_vault_state = state["pilot_vault"]["end_state"]
+    nft_state = {owner.lower(): set(token_ids) for owner, token_ids in state["nft"]["end_state"].items() if token_ids}
+    stored_token_ids = set().union(*nft_state.values())
+    balances, total_supply, nft_owners = get_onchain_state(
+        addresses,
+        list(pilot_vault_state),
+        stored_token_ids,
+        highest_minted_token_ids.get(state["day_index"], 0),
+        block_number,
+    )
+
+    mismatches = []
+    for holder, holder_state in pilot_vault_state.items():
+        if balances[holder] is None:
+            mismatches.append(f"pilot vault balance of {holder}: balanceOf call failed on-chain")
+        elif holder_state["balance"] != balances[holder]:
+            mismatches.append(
+                f"pilot vault balance of {holder}: stored {holder_state['balance']}, on-chain {balances[holder]}"
+            )
+    stored_supply = sum(holder_state["balance"] for holder_state in pilot_vault_state.values())
+    if total_supply is None:
+        mismatches.append("pilot vault total supply: baseTotalSupply call failed on-chain")
+    elif stored_supply != total_supply:
+        mismatches.append(
+            f"pilot vault total supply: stored balances add up to {stored_supply}, on-chain {total_supply}"
+        )
+    for owner in sorted(set(nft_state) | set(nft_owners)):
+        stored, onchain = nft_state.get(owner, set()), nft_owners.get(owner, set())
+        if stored != onchain:
+            mismatches.append(f"NFTs of {owner}: stored {sorted(stored)}, on-chain {sorted(onchain)}")
+    return state["day_index"], block_number, mismatches
+
+
+def reconcile_states(state_files=None, workers=WORKERS):
+    """Check state files against the chain, returns {day_index: mismatches} of days that differ"""
+    state_files = get_state_files() if state_files is None else state_files
+    addresses = load_contract_addresses()
+    highest_minted_token_ids = get_highest_minted_token_ids()
+    mismatched_days = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for day_index, block_number, mismatches in executor.map(
+            lambda state_file: reconcile_state_file(state_file, addresses, highest_minted_token_ids), state_files
+        ):
+            if mismatches:
+                mismatched_days[day_index] = mismatches
+                print(f"Day {day_index}: {len(mismatches)} DIFFERENCES at block {block_number}")
+                for mismatch in mismatches:
+                    print(f"  {mismatch}")
+            else:
+                print(f"Day {day_index}: matches the chain at block {block_number}")
+    return mismatched_days
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check data/states files against on-chain balances and NFT owners")
+    parser.add_argument("state_files", nargs="*", help="State files to check, every data/states file by default")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Days checked in parallel")
+    args = parser.parse_args()
+
+    state_files = args.state_files or get_state_files()
+    mismatched_days = reconcile_states(state_files, args.workers)
+    if mismatched_days:
+        raise ValueError(f"States differ from the chain for days {sorted(mismatched_days)}")
+    print(f"All {len(state_files)} state files match the chain")
+
+
+if __name__ == "__main__":
+    main()
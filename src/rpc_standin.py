@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Local JSON-RPC stand-in node.
+
+Replays responses recorded in a fixtures file (see `utils/rpc_fixtures.py`).
+In record mode it forwards requests it hasn't seen to a real node and records
+the responses, so a run against the network can be captured once and then
+replayed offline:
+
+    python3 -m src.rpc_standin --record --upstream https://eth.drpc.org
+    POINTS_RPC_ENDPOINTS=http://127.0.0.1:8545 python3 main.py
+
+Requests without a recorded response get a JSON-RPC error in replay mode.
+"""
+import argparse
+import json
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .utils.rpc_fixtures import RpcFixtures
+
+DEFAULT_FIXTURES_FILE = "data/rpc_fixtures.json"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8545
+SAVE_EVERY_RECORDED_RESPONSES = 100
+MISSING_FIXTURE_ERROR_CODE = -32001
+
+
+def forward_to_upstream(upstream, method, params):
+    request = urllib.request.Request(
+        upstream,
+        data=json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    def respond(self, request):
+        method = request.get("method")
+        params = request.get("params", [])
+        response = self.server.fixtures.get(method, params)
+        if response is None and self.server.upstream is not None:
+            response = forward_to_upstream(self.server.upstream, method, params)
+            self.server.fixtures.record(method, params, response)
+            if self.server.fixtures.unsaved >= SAVE_EVERY_RECORDED_RESPONSES:
+                self.server.fixtures.save()
+        if response is None:
+            response = {
+                "error": {
+                    "code": MISSING_FIXTURE_ERROR_CODE,
+                    "message": f"No recorded response for {method} {json.dumps(params)}",
+                }
+            }
+        return {"jsonrpc": "2.0", "id": request.get("id"), **response}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        try:
+            if isinstance(body, list):
+                result = [self.respond(request) for request in body]
+            else:
+                result = self.respond(body)
+        except OSError as e:
+            self.send_error(502, f"Upstream request failed: {e}")
+            return
+        data = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(fixtures: RpcFixtures, host=DEFAULT_HOST, port=DEFAULT_PORT, upstream=None):
+    """Create a stand-in server; port 0 picks a free port (see `server.server_address`)"""
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.fixtures = fixtures
+    server.upstream = upstream
+    return server
+
+
+def serve_in_background(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def get_server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded JSON-RPC responses")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_FILE, help="Fixtures file to replay from and record to")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--record", action="store_true", help="Forward unknown requests upstream and record them")
+    parser.add_argument("--upstream", help="Node to record from, defaults to the first configured endpoint")
+    args = parser.parse_args()
+
+    upstream = None
+    if args.record:
+        from .utils.get_rpc import get_rpc
+
+        upstream = args.upstream or get_rpc()
+
+    fixtures = RpcFixtures(args.fixtures)
+    server = create_server(fixtures, args.host, args.port, upstream)
+    mode = f"recording from {upstream}" if upstream else "replaying"
+    print(f"Serving {len(fixtures)} recorded responses on {get_server_url(server)}, {mode}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if upstream is not None:
+            fixtures.save()
+            print(f"Saved {len(fixtures)} responses to {args.fixtures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Streaming pipeline.
+
+Runs find_daily_blocks, nft_events, pilot_vault_events, the fused states and
+points stage and aggregate_daily_points day by day instead of stage by stage.
+Each stage is a thread that takes day indexes from the previous stage's queue,
+so day N's states are computed while day N+1's events are being downloaded:
+
+    day boundaries -> events -> states and points -> aggregated points
+
+Days whose outputs are up to date are skipped the same way as in the stage by
+stage run, see utils/stage_cache.py. A day only moves on when the previous
+stage is done with it, and every stage handles days in order, so states still
+start from the previous day's end state and aggregation from the previous
+day's totals. Queues are bounded by QUEUE_SIZE, a fast stage waits for a slow
+one instead of running ahead. If a stage fails the others stop and the error
+is raised from `run_pipeline`.
+
+Writes the same files as the stage by stage run:
+
+    python3 -m src.streaming_pipeline
+"""
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from web3 import Web3
+from . import (
+    aggregate_daily_points,
+    daily_points_v2,
+    daily_states_and_points,
+    find_daily_blocks,
+    find_deployment_blocks,
+    nft_events,
+    pilot_vault_events,
+)
+from .utils.aggregated_w3_request import create_contract_instances, get_w3_instances
+from .utils.block_verification import normalize_hash
+from .utils.config import get_checkpoint_interval_days
+from .utils.get_additional_data import get_start_block_for_day, get_end_block_for_day
+from .utils.instrumentation import span
+from .utils.progress import progress
+from .utils.json_backend import load_json
+from .utils.process_event_above_user_state import UserState
+from .utils.schemas import DeploymentBlocks
+from .utils.stage_cache import events_file_matches
+
+QUEUE_SIZE = 2
+POLL_INTERVAL = 0.1
+
+
+class PipelineStopped(Exception):
+    """Raised in a stage waiting on a queue after another stage failed"""
+
+
+def put(day_queue, item, stop):
+    while True:
+        try:
+            day_queue.put(item, timeout=POLL_INTERVAL)
+            return
+        except queue.Full:
+            if stop.is_set():
+                raise PipelineStopped()
+
+
+def iter_queue(day_queue, stop):
+    """Items of `day_queue` up to the None that ends the stream"""
+    while True:
+        try:
+            item = day_queue.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            if stop.is_set():
+                raise PipelineStopped()
+            continue
+        if item is None:
+            return
+        yield item
+
+
+class Stage(threading.Thread):
+    """Calls `function(item)` for each of `items` and passes the results on to `out_queue`"""
+
+    def __init__(self, name, function, items, out_queue, stop):
+        super().__init__(name=name, daemon=True)
+        self.function = function
+        self.items = items
+        self.out_queue = out_queue
+        self.stop = stop
+        self.error = None
+        self.busy_time = 0.0
+        self.processed = 0
+
+    def run(self):
+        try:
+            for item in self.items:
+                started = time.perf_counter()
+                with span(self.name, day_index=item):
+                    result = self.function(item)
+                self.busy_time += time.perf_counter() - started
+                self.processed += 1
+                progress.advance(self.name, days=1)
+                if self.out_queue is not None:
+                    put(self.out_queue, result, self.stop)
+                    progress.set_queue_depth(self.name, self.out_queue.qsize())
+            if self.out_queue is not None:
+                put(self.out_queue, None, self.stop)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            # BaseException too: read_events_chunked exits when a range can't be fetched
+            self.error = e
+            self.stop.set()
+
+
+def has_deployment_blocks():
+    if not os.path.exists("data/deployment_blocks.json"):
+        return False
+    deployments = load_json("data/deployment_blocks.json", DeploymentBlocks)["deployments"]
+    return all(deployments.get(name, {}).get("block_number") is not None for name in ("nft", "pilot_vault"))
+
+
+def iter_new_days():
+    """Save each finished day's boundaries as soon as they are found and yield its index"""
+    for day_index, boundary in enumerate(find_daily_blocks.iter_day_boundaries()):
+        if boundary["is_final_day"]:
+            return
+        filename = find_daily_blocks.save_day_boundary(day_index, boundary)
+        print(f"Saved day {day_index} ({boundary['day']}) to {filename}")
+        # Chunks ending on this day's boundary can be read from one provider
+        for block in (boundary["last_block_of_day"], boundary["first_block_of_next_day"]):
+            find_daily_blocks.trusted_block_hashes[block["number"]] = normalize_hash(block["hash"])
+        yield day_index
+
+
+def make_fetch_events():
+    """Fetch one day's NFT and pilot vault events, skipping files already fetched for its range"""
+    deployments = load_json("data/deployment_blocks.json", DeploymentBlocks)["deployments"]
+    contracts = {}
+    for module, name, output_dir in (
+        (nft_events, "nft", "data/events/nft"),
+        (pilot_vault_events, "pilot_vault", "data/events/pilot_vault"),
+    ):
+        address = Web3.to_checksum_address(deployments[name]["address"])
+        contracts[name] = (
+            module,
+            address,
+            create_contract_instances(get_w3_instances(), address, module.TRANSFER_EVENT_ABI),
+            deployments[name]["block_number"],
+            output_dir,
+        )
+        os.makedirs(output_dir, exist_ok=True)
+
+    def fetch_events(day_index):
+        end_block = get_end_block_for_day(day_index)
+        for module, address, contract_instances, deployment_block, output_dir in contracts.values():
+            output_file = os.path.join(output_dir, f"{day_index}.json")
+            start_block = deployment_block if day_index == 0 else get_start_block_for_day(day_index)
+            end_block_hash = find_daily_blocks.trusted_block_hashes.get(end_block)
+            if events_file_matches(output_file, address, start_block, end_block, end_block_hash):
+                continue
+            print(f"\nDay {day_index}: {address} blocks {start_block} to {end_block}")
+            module.fetch_and_save_events(
+                contract_instances,
+                address,
+                start_block,
+                end_block,
+                output_file,
+                find_daily_blocks.trusted_block_hashes,
+            )
+            # nft_events only prints fetch errors, a day without its file must not reach the states
+            if not os.path.exists(output_file):
+                raise RuntimeError(f"Events for day {day_index} were not saved to {output_file}")
+        return day_index
+
+    return fetch_events
+
+
+def make_process_states_and_points():
+    user_state_before_start_block = defaultdict(UserState)
+    version = daily_states_and_points.get_stage_version()
+    checkpoint_interval = get_checkpoint_interval_days()
+
+    def process_states_and_points(day_index):
+        nonlocal user_state_before_start_block
+        user_state_before_start_block = daily_states_and_points.process_day_if_changed(
+            day_index, user_state_before_start_block, version, checkpoint_interval
+        )
+        return day_index
+
+    return process_states_and_points
+
+
+def make_aggregate():
+    cumulative_points = defaultdict(int)
+    version = aggregate_daily_points.get_stage_version()
+
+    def aggregate(day_index):
+        aggregate_daily_points.aggregate_day_if_changed(
+            day_index, f"data/points/{day_index}.json", cumulative_points, version
+        )
+        return day_index
+
+    return aggregate
+
+
+def run_pipeline(queue_size=QUEUE_SIZE):
+    """Run all stages for every finished day, returns the number of days processed"""
+    started = time.perf_counter()
+    if not has_deployment_blocks():
+        find_deployment_blocks.main()
+    daily_points_v2.initialize_global_variables()
+
+    stop = threading.Event()
+    events_queue = queue.Queue(maxsize=queue_size)
+    states_queue = queue.Queue(maxsize=queue_size)
+    aggregate_queue = queue.Queue(maxsize=queue_size)
+    stages = [
+        Stage("day boundaries", lambda day_index: day_index, iter_new_days(), events_queue, stop),
+        Stage("events", make_fetch_events(), iter_queue(events_queue, stop), states_queue, stop),
+        Stage(
+            "states and points",
+            make_process_states_and_points(),
+            iter_queue(states_queue, stop),
+            aggregate_queue,
+            stop,
+        ),
+        Stage("aggregated points", make_aggregate(), iter_queue(aggregate_queue, stop), None, stop),
+    ]
+    for stage in stages:
+        progress.start_task(stage.name)
+        stage.start()
+    for stage in stages:
+        stage.join()
+        progress.finish_task(stage.name)
+    for stage in stages:
+        if stage.error is not None:
+            raise RuntimeError(f"Stage '{stage.name}' failed: {stage.error}") from stage.error
+
+    days_amount = stages[-1].processed
+    print(f"\nCompleted! Streamed {days_amount} days in {time.perf_counter() - started:.1f}s")
+    for stage in stages[1:]:
+        print(f"  {stage.name}: {stage.busy_time:.1f}s busy")
+    return days_amount
+
+
+def main():
+    run_pipeline()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,97 @@
 from web3 import Web3
-from collections import defaultdict
+from web3.middleware import Web3Middleware
+from collections import defaultdict, deque
 from typing import Optional
+import atexit
+import random
 import threading
+import time
+from .config import EndpointConfig, get_rpc_endpoints
+from .instrumentation import count
+from .progress import progress
+from .rpc_cassette import RECORD, get_cassette_from_environment, install_cassette
 
-w3_instances = [
-    Web3(Web3.HTTPProvider("https://mainnet.gateway.tenderly.co")),
-    Web3(Web3.HTTPProvider("https://ethereum-rpc.publicnode.com")),
-    Web3(Web3.HTTPProvider("https://eth.drpc.org")),
-]
+
+class RateLimiter:
+    """Spaces requests at least 1 / requests_per_second apart"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self.next_allowed = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if self.interval == 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_until = max(now, self.next_allowed)
+            self.next_allowed = wait_until + self.interval
+        if wait_until > now:
+            time.sleep(wait_until - now)
+
+
+class LimitedHTTPProvider(Web3.HTTPProvider):
+    """HTTPProvider that respects an endpoint's concurrency and requests/sec limits"""
+
+    def __init__(self, endpoint: EndpointConfig, **kwargs):
+        super().__init__(endpoint.url, **kwargs)
+        self.endpoint_config = endpoint
+        self.concurrency = threading.BoundedSemaphore(max(1, endpoint.max_concurrency))
+        self.rate_limiter = RateLimiter(endpoint.requests_per_second)
+
+    def make_request(self, method, params):
+        with self.concurrency:
+            self.rate_limiter.wait()
+            return super().make_request(method, params)
+
+    def make_batch_request(self, batch_requests):
+        with self.concurrency:
+            self.rate_limiter.wait()
+            return super().make_batch_request(batch_requests)
+
+
+class RequestCounter(Web3Middleware):
+    """Counts the JSON-RPC requests of an instance by provider and method, batch items included"""
+
+    def request_processor(self, method, params):
+        count("rpc_requests", provider=get_endpoint(self._w3), method=method)
+        return method, params
+
+    async def async_request_processor(self, method, params):
+        return self.request_processor(method, params)
+
+
+def create_w3_instances(endpoints=None):
+    endpoints = endpoints if endpoints is not None else get_rpc_endpoints()
+    instances = [Web3(LimitedHTTPProvider(endpoint)) for endpoint in endpoints]
+    for instance in instances:
+        instance.middleware_onion.add(RequestCounter, name="request_counter")
+    cassette = get_cassette_from_environment()
+    if cassette is not None:
+        install_cassette(instances, cassette)
+        if cassette.mode == RECORD:
+            atexit.register(cassette.save)
+    return instances
+
+
+_w3_instances_lock = threading.Lock()
+
+
+def get_w3_instances():
+    """The shared instances of the configured endpoints, created on first use"""
+    global w3_instances
+    with _w3_instances_lock:
+        if "w3_instances" not in globals():
+            w3_instances = create_w3_instances()
+    return w3_instances
+
+
+def __getattr__(name):
+    # `w3_instances` is created on first access, so importing this module sets up no providers
+    if name == "w3_instances":
+        return get_w3_instances()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class RequestResult:
     def __init__(self, result, error):
@@ -77,32 +161,279 @@ def create_contract_instances(w3_instances, address, abi):
         contract_instances.append(w3_instance.eth.contract(address=address, abi=abi))
     return contract_instances
 
-def return_result_or_raise(result_to_amount: dict[RequestResult, int]):
-    results_length = len(result_to_amount)
-    acceptable_amount = results_length // 2 + results_length % 2
-    for result, amount in result_to_amount.items():
-        if amount >= acceptable_amount:
-            if result.error is not None:
-                raise result.error
-            return result.result
-    
-    raise ValueError(f"No result found, results: {result_to_amount}")
+LATENCY_WINDOW = 50
+EJECT_AFTER_CONSECUTIVE_FAILURES = 3
+BASE_EJECTION_SECONDS = 5.0
+MAX_EJECTION_SECONDS = 300.0
+DEFAULT_LATENCY_SECONDS = 0.5
+
+
+def get_endpoint(instance):
+    """Endpoint URI of a Web3 or contract instance, used to key provider health"""
+    provider = getattr(instance, "provider", None)
+    if provider is None and getattr(instance, "w3", None) is not None:
+        provider = instance.w3.provider
+    endpoint = getattr(provider, "endpoint_uri", None)
+    return str(endpoint) if endpoint is not None else repr(instance)
+
+
+def is_rate_limited(error):
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "too many requests" in message or "rate limit" in message
+
+
+def is_provider_failure(error):
+    """
+    Whether an error says something about the provider rather than the request.
+
+    Transport errors (requests' exceptions are OSErrors), timeouts and rate
+    limits count against a provider. JSON-RPC errors such as "block range too
+    large" are returned by every provider alike and don't.
+    """
+    return isinstance(error, (OSError, TimeoutError)) or is_rate_limited(error)
+
+
+class ProviderHealth:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = deque(maxlen=LATENCY_WINDOW)  # True for calls that failed
+        self.rate_limited = deque(maxlen=LATENCY_WINDOW)  # True for 429 responses
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def record(self, latency, error=None, now=None):
+        now = time.monotonic() if now is None else now
+        failed = error is not None and is_provider_failure(error)
+        rate_limited = error is not None and is_rate_limited(error)
+        self.calls += 1
+        self.latencies.append(latency)
+        self.failures.append(failed)
+        self.rate_limited.append(rate_limited)
+        if not failed:
+            self.consecutive_failures = 0
+            self.ejections = 0
+            return
+        self.consecutive_failures += 1
+        if rate_limited or self.consecutive_failures >= EJECT_AFTER_CONSECUTIVE_FAILURES:
+            self.ejections += 1
+            backoff = min(MAX_EJECTION_SECONDS, BASE_EJECTION_SECONDS * 2 ** (self.ejections - 1))
+            self.ejected_until = now + backoff
+            self.consecutive_failures = 0
+
+    def is_available(self, now=None):
+        now = time.monotonic() if now is None else now
+        return now >= self.ejected_until
+
+    @property
+    def average_latency(self):
+        if not self.latencies:
+            return DEFAULT_LATENCY_SECONDS
+        return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def error_rate(self):
+        return sum(self.failures) / len(self.failures) if self.failures else 0.0
+
+    @property
+    def rate_limited_count(self):
+        return sum(self.rate_limited)
+
+    def score(self):
+        """Lower is better"""
+        return self.average_latency * (1 + 10 * self.error_rate) * (1 + self.rate_limited_count)
+
+
+class ProviderManager:
+    """Tracks provider health and orders providers for each call"""
+
+    def __init__(self, seed=None):
+        self.health = {}
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+
+    def get_health(self, endpoint) -> ProviderHealth:
+        with self.lock:
+            if endpoint not in self.health:
+                self.health[endpoint] = ProviderHealth(endpoint)
+            return self.health[endpoint]
+
+    def record(self, instance, latency, error=None):
+        endpoint = get_endpoint(instance)
+        count("provider_calls", provider=endpoint)
+        count("provider_seconds", latency, provider=endpoint)
+        if error is not None:
+            count("provider_errors", provider=endpoint)
+        progress.observe_rpc_latency(endpoint, latency)
+        health = self.get_health(endpoint)
+        with self.lock:
+            health.record(latency, error)
+
+    def rank(self, instances):
+        """
+        Order instances for a call: available providers first, in a random
+        order weighted by 1 / score, then ejected providers by the time they
+        come back. Ejected providers are still used when nothing else is left.
+        """
+        now = time.monotonic()
+        with self.lock:
+            healths = [self.health.get(get_endpoint(instance)) or ProviderHealth(None) for instance in instances]
+            available = [i for i, health in enumerate(healths) if health.is_available(now)]
+            ejected = sorted(
+                (i for i, health in enumerate(healths) if not health.is_available(now)),
+                key=lambda i: healths[i].ejected_until,
+            )
+            ordered = []
+            weights = [1 / healths[i].score() for i in available]
+            while available:
+                chosen = self.random.choices(range(len(available)), weights=weights)[0]
+                ordered.append(available.pop(chosen))
+                weights.pop(chosen)
+        return [instances[i] for i in ordered + ejected]
+
+    def report(self):
+        with self.lock:
+            return {
+                endpoint: {
+                    "calls": health.calls,
+                    "average_latency": health.average_latency,
+                    "error_rate": health.error_rate,
+                    "rate_limited": health.rate_limited_count,
+                    "ejected": not health.is_available(),
+                }
+                for endpoint, health in self.health.items()
+            }
+
+
+provider_manager = ProviderManager()
+
+
+class QuorumPolicy:
+    """
+    How many providers have to return the same result.
+
+    `required=None` means a majority of all given providers, which is how
+    every call behaved before health tracking. With `verify`, a single
+    result that passes `verify(result)` is accepted; otherwise the call
+    escalates to a majority quorum of the other providers: the result that
+    failed `verify` doesn't count towards it.
+    """
+
+    def __init__(self, required=None, verify=None):
+        self.required = required
+        self.verify = verify
+
+    def get_required(self, providers_amount):
+        if self.required is None:
+            return providers_amount // 2 + providers_amount % 2
+        return min(self.required, providers_amount)
+
+
+MAJORITY = QuorumPolicy()
+# State-affecting reads, e.g. the chain head: two providers have to agree
+STATE_READ_POLICY = QuorumPolicy(required=2)
+
+
+def verified_single_provider_policy(verify):
+    """Immutable historical reads: one provider, escalating to a majority when `verify` fails"""
+    return QuorumPolicy(required=1, verify=verify)
+
 
 def make_call(i, results, instance, function):
+    started = time.perf_counter()
     try:
         result = function(instance)
         results[i] = RequestResult(result, None)
+        provider_manager.record(instance, time.perf_counter() - started)
     except Exception as e:
         results[i] = RequestResult(None, e)
+        provider_manager.record(instance, time.perf_counter() - started, e)
+
 
-def make_aggregated_call(instances, function):
+def make_parallel_calls(instances, function):
     results = [None] * len(instances)
-    results_amount = defaultdict(lambda: 0)
-    
     threads = [threading.Thread(target=make_call, args=(i, results, instance, function)) for i, instance in enumerate(instances)]
     for thread in threads:
         thread.start()
-    for i, thread in enumerate(threads):
+    for thread in threads:
         thread.join()
-        results_amount[results[i]] += 1
-    return return_result_or_raise(results_amount)
+    return results
+
+
+class QuorumCall:
+    """
+    Bookkeeping of one aggregated call, shared by the sync and async callers.
+
+    Providers are taken in health order, only as many at a time as are still
+    missing from the quorum, so a healthy majority answers without waiting
+    on the rest.
+    """
+
+    def __init__(self, instances, policy: Optional[QuorumPolicy] = None):
+        policy = policy or MAJORITY
+        self.providers_amount = len(instances)
+        self.ordered_instances = provider_manager.rank(instances)
+        self.required = policy.get_required(self.providers_amount)
+        self.verify = policy.verify
+        self.results_amount = defaultdict(lambda: 0)
+        self.rejected_amount = 0
+        self.next_index = 0
+
+    def has_providers_left(self):
+        return self.next_index < len(self.ordered_instances)
+
+    def next_batch(self):
+        best_amount = max(self.results_amount.values(), default=0)
+        batch = self.ordered_instances[self.next_index : self.next_index + max(1, self.required - best_amount)]
+        self.next_index += len(batch)
+        return batch
+
+    def add_results(self, results) -> Optional[RequestResult]:
+        """Count a batch of results; returns the accepted result, or None if more providers are needed"""
+        for result in results:
+            if self.verify is not None and result.error is None:
+                if self.verify(result.result):
+                    return result
+                # A result that failed verification is not a vote for the majority
+                self.rejected_amount += 1
+                continue
+            self.results_amount[result] += 1
+
+        if self.verify is not None:
+            # Verification failed: fall back to a majority of all providers
+            self.verify = None
+            self.required = MAJORITY.get_required(self.providers_amount)
+
+        for result, amount in self.results_amount.items():
+            if amount >= self.required:
+                return result
+        return None
+
+    def no_result_error(self):
+        return ValueError(
+            f"No result found, results: {dict(self.results_amount)}, failed verification: {self.rejected_amount}"
+        )
+
+
+def get_result_or_raise(result: RequestResult):
+    if result.error is not None:
+        raise result.error
+    return result.result
+
+
+def make_aggregated_call(instances, function, policy: Optional[QuorumPolicy] = None):
+    """
+    Call the healthiest providers until `policy.required` of them return
+    the same result.
+    """
+    call = QuorumCall(instances, policy)
+    while call.has_providers_left():
+        accepted = call.add_results(make_parallel_calls(call.next_batch(), function))
+        if accepted is not None:
+            return get_result_or_raise(accepted)
+    raise call.no_result_error()
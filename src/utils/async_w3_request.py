@@ -0,0 +1,80 @@
+"""
+Asyncio counterpart of `aggregated_w3_request` for the async ingestion pipeline.
+
+Every configured endpoint gets an `AsyncWeb3` instance, an `asyncio.Semaphore`
+bounding its in-flight requests to `max_concurrency`, and requests spaced by
+its `requests_per_second`. Aggregated calls use the same quorum policies,
+provider health tracking and routing as the sync calls.
+"""
+import asyncio
+import time
+from typing import Optional
+from web3 import AsyncWeb3
+from .aggregated_w3_request import (
+    QuorumCall,
+    QuorumPolicy,
+    RequestCounter,
+    RequestResult,
+    get_result_or_raise,
+)
+from . import aggregated_w3_request
+from .config import EndpointConfig, get_rpc_endpoints
+
+
+class AsyncEndpoint:
+    def __init__(self, endpoint: EndpointConfig, w3: Optional[AsyncWeb3] = None):
+        self.config = endpoint
+        if w3 is None:
+            w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(endpoint.url))
+            w3.middleware_onion.add(RequestCounter, name="request_counter")
+        self.w3 = w3
+        self.semaphore = asyncio.Semaphore(max(1, endpoint.max_concurrency))
+        self.interval = 1 / endpoint.requests_per_second if endpoint.requests_per_second > 0 else 0
+        self.next_allowed = 0.0
+
+    @property
+    def provider(self):
+        # Lets provider health key async endpoints the same way as sync instances
+        return self.w3.provider
+
+    async def wait_for_rate_limit(self):
+        if self.interval == 0:
+            return
+        now = time.monotonic()
+        wait_until = max(now, self.next_allowed)
+        self.next_allowed = wait_until + self.interval
+        if wait_until > now:
+            await asyncio.sleep(wait_until - now)
+
+
+def create_async_endpoints(endpoints=None):
+    endpoints = endpoints if endpoints is not None else get_rpc_endpoints()
+    return [AsyncEndpoint(endpoint) for endpoint in endpoints]
+
+
+async def make_call_async(endpoint: AsyncEndpoint, function):
+    async with endpoint.semaphore:
+        await endpoint.wait_for_rate_limit()
+        started = time.perf_counter()
+        try:
+            result = await function(endpoint.w3)
+        except Exception as e:
+            aggregated_w3_request.provider_manager.record(endpoint, time.perf_counter() - started, e)
+            return RequestResult(None, e)
+        aggregated_w3_request.provider_manager.record(endpoint, time.perf_counter() - started)
+        return RequestResult(result, None)
+
+
+async def make_aggregated_call_async(endpoints, function, policy: Optional[QuorumPolicy] = None):
+    """
+    Async `make_aggregated_call`: `function(w3)` returns an awaitable, and
+    each batch of providers is awaited concurrently.
+    """
+    call = QuorumCall(endpoints, policy)
+    while call.has_providers_left():
+        batch = call.next_batch()
+        results = await asyncio.gather(*(make_call_async(endpoint, function) for endpoint in batch))
+        accepted = call.add_results(results)
+        if accepted is not None:
+            return get_result_or_raise(accepted)
+    raise call.no_result_error()
@@ -0,0 +1,170 @@
+"""
+Hash-verified reads of immutable historical data.
+
+The day boundary blocks in data/days_blocks were agreed on by a provider
+quorum when they were written. A block hash commits to the whole chain before
+it, so a block or header with the agreed hash is the canonical one: historical
+`get_block` calls for such a block are sent to a single provider and accepted
+when the hash matches. On mismatch, or when no agreed hash is known for the
+block, the call escalates to the other providers.
+
+Logs are different: the end block hash proves a provider follows the canonical
+chain, not that it returned every log of the range. The headers of the range
+do: a header's `logsBloom` has the bits of the address and topics of every log
+in the block set. When the header cache (utils/header_cache.py) holds the
+headers of every block of a logs range, the logs are read from a single
+provider and accepted when each log is in a block with its header's hash and a
+bloom matching the contract's Transfer logs, and no block whose bloom matches
+is left without logs. Blooms can match blocks without such logs, so a range
+with such a block, like one without cached headers, is read from a provider
+majority. Either way the accepted logs are checked against the range and the
+agreed hashes.
+"""
+import glob
+import os
+from eth_utils import keccak
+from .aggregated_w3_request import STATE_READ_POLICY, make_aggregated_call, verified_single_provider_policy
+from .json_backend import load_json
+from .schemas import DayBlocks
+
+TRANSFER_TOPIC = keccak(text="Transfer(address,address,uint256)")
+
+
+def normalize_hash(block_hash) -> str:
+    """Lowercase 0x-prefixed hex, for HexBytes and for hashes stored with or without 0x"""
+    if isinstance(block_hash, (bytes, bytearray)):
+        return "0x" + bytes(block_hash).hex()
+    block_hash = str(block_hash).lower()
+    return block_hash if block_hash.startswith("0x") else "0x" + block_hash
+
+
+def load_trusted_block_hashes(days_blocks_dir="data/days_blocks"):
+    """Block number -> hash of every day boundary block stored in days_blocks"""
+    trusted_hashes = {}
+    for path in glob.glob(os.path.join(days_blocks_dir, "*_*.json")):
+        day_blocks = load_json(path, DayBlocks)
+        for block in (day_blocks["last_block_of_day"], day_blocks["first_block_of_next_day"]):
+            if block is not None and block.get("hash"):
+                trusted_hashes[block["number"]] = normalize_hash(block["hash"])
+    return trusted_hashes
+
+
+def get_finalized_block_number(w3_instances):
+    """
+    Number of the latest finalized block. The pipeline reads up to it instead
+    of the head, so it never saves a day that a reorg could still change.
+    """
+    return make_aggregated_call(
+        w3_instances, lambda w3: w3.eth.get_block("finalized")["number"], STATE_READ_POLICY
+    )
+
+
+def get_block_policy(block_number, trusted_hashes):
+    """Single-provider policy for a block with an agreed hash, None (majority) otherwise"""
+    trusted_hash = trusted_hashes.get(block_number)
+    if trusted_hash is None:
+        return None
+
+    def verify(block):
+        return block["number"] == block_number and normalize_hash(block["hash"]) == trusted_hash
+
+    return verified_single_provider_policy(verify)
+
+
+def get_block_verified(w3_instances, block_number, trusted_hashes):
+    """Fetch a block from one provider if its hash is known, from a quorum otherwise"""
+    return make_aggregated_call(
+        w3_instances,
+        lambda w3: w3.eth.get_block(block_number),
+        get_block_policy(block_number, trusted_hashes),
+    )
+
+
+def get_bloom_bits(value: bytes):
+    digest = keccak(value)
+    return [((digest[i] << 8) | digest[i + 1]) & 2047 for i in (0, 2, 4)]
+
+
+def get_bloom_mask(address, topic=TRANSFER_TOPIC):
+    """Bloom bits every block with a `topic` log of `address` has set"""
+    mask = 0
+    for value in (bytes.fromhex(address[2:]), topic):
+        for bit in get_bloom_bits(value):
+            mask |= 1 << bit
+    return mask
+
+
+def bloom_matches(logs_bloom, mask):
+    return int(logs_bloom, 16) & mask == mask
+
+
+def logs_are_consistent(logs, address, from_block, to_block, trusted_hashes):
+    """Sanity checks on the logs of a block range"""
+    seen = set()
+    for log in logs:
+        block_number = log["blockNumber"]
+        if not from_block <= block_number <= to_block:
+            return False
+        if log["address"].lower() != address.lower():
+            return False
+        trusted_hash = trusted_hashes.get(block_number)
+        if trusted_hash is not None and normalize_hash(log["blockHash"]) != trusted_hash:
+            return False
+        key = (block_number, log["logIndex"])
+        if key in seen:
+            return False
+        seen.add(key)
+    return True
+
+
+def check_logs(logs, address, from_block, to_block, trusted_hashes):
+    """The logs, if they pass `logs_are_consistent`, raises otherwise"""
+    if not logs_are_consistent(logs, address, from_block, to_block, trusted_hashes):
+        raise ValueError(
+            f"Logs of blocks {from_block}-{to_block} are outside the range, from another contract, "
+            f"duplicated or from blocks that don't match the agreed hashes"
+        )
+    return logs
+
+
+def logs_match_headers(logs, mask, from_block, to_block, headers):
+    """The logs are in blocks with their headers' hash and a matching bloom, and every matching block has logs"""
+    blocks_with_logs = set()
+    for log in logs:
+        header = headers[log["blockNumber"]]
+        if normalize_hash(log["blockHash"]) != header["hash"] or not bloom_matches(header["logsBloom"], mask):
+            return False
+        blocks_with_logs.add(log["blockNumber"])
+    return all(
+        block_number in blocks_with_logs
+        for block_number in range(from_block, to_block + 1)
+        if bloom_matches(headers[block_number]["logsBloom"], mask)
+    )
+
+
+def get_logs_policy(address, from_block, to_block, trusted_hashes, headers):
+    """Single-provider policy for logs of a range whose headers are known, None (majority) otherwise"""
+    if headers is None:
+        return None
+    mask = get_bloom_mask(address)
+
+    def verify(logs):
+        return logs_are_consistent(logs, address, from_block, to_block, trusted_hashes) and logs_match_headers(
+            logs, mask, from_block, to_block, headers
+        )
+
+    return verified_single_provider_policy(verify)
+
+
+def get_logs_verified(contracts, get_logs, from_block, to_block, trusted_hashes, headers=None):
+    """
+    Fetch logs for [from_block, to_block] with `get_logs(contract, from_block, to_block)`,
+    from one provider when `headers` of every block of the range vouch for them, from a majority otherwise
+    """
+    address = contracts[0].address
+    logs = make_aggregated_call(
+        contracts,
+        lambda contract: get_logs(contract, from_block, to_block),
+        get_logs_policy(address, from_block, to_block, trusted_hashes, headers),
+    )
+    return check_logs(logs, address, from_block, to_block, trusted_hashes)
@@ -0,0 +1,127 @@
+"""
+Settings from config.json.
+
+Besides the contract addresses, config.json lists the RPC endpoints and
+per-endpoint limits:
+
+    "RPC_ENDPOINTS": [
+        {
+            "url": "https://eth.drpc.org",
+            "max_concurrency": 4,
+            "requests_per_second": 10,
+            "max_logs_block_range": 10000
+        }
+    ]
+
+An endpoint can also be a plain URL string, which gets the default limits.
+"LOGS_BLOOM_PREFILTER" turns on the logs bloom prefilter of the event
+fetchers, see utils/log_ranges.py. "REORG_CHECK_DAYS" is how many of the
+most recent saved days are checked against the chain for reorgs on every
+run, see verify_recent_days.py.
+"PROGRESS_INTERVAL_SECONDS", "PROGRESS_FORMAT" ("text" or "json") and
+"METRICS_TEXTFILE" set how progress is reported, see utils/progress.py.
+`POINTS_RPC_ENDPOINTS` (comma separated URLs) overrides the configured
+endpoints, e.g. to point the whole pipeline at a local stand-in node.
+"""
+import json
+import os
+from typing import List, NamedTuple
+
+CONFIG_FILE = os.environ.get("POINTS_CONFIG", "config.json")
+
+DEFAULT_RPC_ENDPOINTS = [
+    "https://mainnet.gateway.tenderly.co",
+    "https://ethereum-rpc.publicnode.com",
+    "https://eth.drpc.org",
+]
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_MAX_LOGS_BLOCK_RANGE = 10000
+DEFAULT_REORG_CHECK_DAYS = 2
+DEFAULT_PROGRESS_INTERVAL_SECONDS = 10.0
+DEFAULT_CHECKPOINT_INTERVAL_DAYS = 7
+
+
+class EndpointConfig(NamedTuple):
+    url: str
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND
+    max_logs_block_range: int = DEFAULT_MAX_LOGS_BLOCK_RANGE
+
+
+def load_config(path=None):
+    path = path or CONFIG_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def parse_endpoint(endpoint) -> EndpointConfig:
+    if isinstance(endpoint, str):
+        return EndpointConfig(endpoint)
+    if "url" not in endpoint:
+        raise ValueError(f"RPC endpoint without url in config: {endpoint}")
+    return EndpointConfig(
+        url=endpoint["url"],
+        max_concurrency=int(endpoint.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)),
+        requests_per_second=float(endpoint.get("requests_per_second", DEFAULT_REQUESTS_PER_SECOND)),
+        max_logs_block_range=int(endpoint.get("max_logs_block_range", DEFAULT_MAX_LOGS_BLOCK_RANGE)),
+    )
+
+
+def get_rpc_endpoints(config=None) -> List[EndpointConfig]:
+    override = os.environ.get("POINTS_RPC_ENDPOINTS")
+    if override:
+        return [EndpointConfig(url.strip()) for url in override.split(",") if url.strip()]
+    if config is None:
+        config = load_config()
+    endpoints = config.get("RPC_ENDPOINTS") or DEFAULT_RPC_ENDPOINTS
+    return [parse_endpoint(endpoint) for endpoint in endpoints]
+
+
+def get_max_logs_block_range(endpoints=None) -> int:
+    """Largest logs block range every endpoint accepts"""
+    endpoints = endpoints if endpoints is not None else get_rpc_endpoints()
+    return min(endpoint.max_logs_block_range for endpoint in endpoints)
+
+
+def get_reorg_check_days(config=None) -> int:
+    if config is None:
+        config = load_config()
+    return int(config.get("REORG_CHECK_DAYS", DEFAULT_REORG_CHECK_DAYS))
+
+
+def get_logs_bloom_prefilter(config=None) -> bool:
+    if config is None:
+        config = load_config()
+    return bool(config.get("LOGS_BLOOM_PREFILTER", False))
+
+
+def get_progress_interval(config=None) -> float:
+    if config is None:
+        config = load_config()
+    return float(config.get("PROGRESS_INTERVAL_SECONDS", DEFAULT_PROGRESS_INTERVAL_SECONDS))
+
+
+def get_progress_format(config=None) -> str:
+    if config is None:
+        config = load_config()
+    output_format = config.get("PROGRESS_FORMAT", "text")
+    if output_format not in ("text", "json"):
+        raise ValueError(f"Unknown PROGRESS_FORMAT in config: {output_format}")
+    return output_format
+
+
+def get_metrics_textfile(config=None):
+    """Path of the Prometheus textfile, None to not write one"""
+    if config is None:
+        config = load_config()
+    return config.get("METRICS_TEXTFILE") or None
+
+
+def get_checkpoint_interval_days(config=None) -> int:
+    """Days between state checkpoints, 0 to not save any"""
+    if config is None:
+        config = load_config()
+    return int(config.get("CHECKPOINT_INTERVAL_DAYS", DEFAULT_CHECKPOINT_INTERVAL_DAYS))
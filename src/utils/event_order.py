@@ -0,0 +1,25 @@
+"""
+Canonical order of the events in data/events files.
+
+A block's logIndex is unique and increases with transactionIndex, so
+(blockNumber, logIndex) both identifies a log and orders it the same way as
+(blockNumber, transactionIndex, logIndex). The fetchers save events in this
+order without duplicates and set `isSorted` in the file metadata; readers only
+sort files without the flag, which were saved in the providers' order.
+"""
+
+
+def get_event_key(event):
+    return (event["blockNumber"], event["logIndex"])
+
+
+def sort_and_deduplicate_events(events):
+    """Events in (blockNumber, logIndex) order, keeping the first of logs returned twice"""
+    unique_events = {}
+    for event in events:
+        unique_events.setdefault(get_event_key(event), event)
+    return [unique_events[key] for key in sorted(unique_events)]
+
+
+def is_sorted_events_file(events_file):
+    return events_file.get("metadata", {}).get("isSorted", False)
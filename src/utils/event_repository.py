@@ -0,0 +1,158 @@
+"""
+Shared, bounded cache of decoded per-day events.
+
+Both the states and the points stages (and the tests) read the same
+data/events/{nft,pilot_vault}/{day_index}.json files. The repository decodes
+each day once, keeps the most recently used days in an LRU cache and can
+prefetch the next days on a background thread while the current day is being
+processed. Cached days are revalidated against the files' mtime and size, so a
+refetched event file is decoded again instead of being served stale, and a
+deleted one is evicted and loaded like an uncached day.
+"""
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .read_transfer_events_as_block_number_to_array import read_transfer_events_as_block_number_to_array
+from .read_nft_events_as_block_number_to_array import read_nft_events_as_block_number_to_array
+
+DEFAULT_MAX_CACHED_DAYS = int(os.environ.get("POINTS_EVENT_CACHE_DAYS", "256"))
+DEFAULT_PRELOAD_WINDOW = 1
+
+DayEvents = namedtuple("DayEvents", ["transfer", "nft", "combined"])
+
+
+def get_transfer_events_file(day_index):
+    return f"data/events/pilot_vault/{day_index}.json"
+
+
+def get_nft_events_file(day_index):
+    return f"data/events/nft/{day_index}.json"
+
+
+def get_files_signature(paths):
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class EventRepository:
+    def __init__(self, max_cached_days=DEFAULT_MAX_CACHED_DAYS, preload_window=DEFAULT_PRELOAD_WINDOW):
+        self.max_cached_days = max_cached_days
+        self.preload_window = preload_window
+        self._cache = OrderedDict()  # {day_index: (signature, DayEvents)}
+        self._loading = {}  # {day_index: Future}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.loads = 0
+        self.hits = 0
+
+    def _load_day(self, day_index):
+        # Imported here to avoid a circular import with read_combined_sorted_events
+        from .read_combined_sorted_events import combine_and_sort_events
+
+        paths = (get_transfer_events_file(day_index), get_nft_events_file(day_index))
+        signature = get_files_signature(paths)
+        block_number_to_transfer_events, transfer_is_sorted = read_transfer_events_as_block_number_to_array(
+            paths[0], return_is_sorted=True
+        )
+        block_number_to_nft_events, nft_is_sorted = read_nft_events_as_block_number_to_array(
+            paths[1], return_is_sorted=True
+        )
+        day_events = DayEvents(
+            transfer=block_number_to_transfer_events,
+            nft=block_number_to_nft_events,
+            combined=combine_and_sort_events(
+                block_number_to_transfer_events,
+                block_number_to_nft_events,
+                is_sorted=transfer_is_sorted and nft_is_sorted,
+            ),
+        )
+        with self._lock:
+            self.loads += 1
+            self._cache[day_index] = (signature, day_events)
+            self._cache.move_to_end(day_index)
+            while len(self._cache) > self.max_cached_days:
+                self._cache.popitem(last=False)
+        return day_events
+
+    def _get_cached(self, day_index):
+        with self._lock:
+            cached = self._cache.get(day_index)
+        if cached is None:
+            return None
+        signature, day_events = cached
+        paths = (get_transfer_events_file(day_index), get_nft_events_file(day_index))
+        try:
+            current_signature = get_files_signature(paths)
+        except FileNotFoundError:
+            # Deleted since it was cached, e.g. by verify_recent_days after a reorg
+            with self._lock:
+                self._cache.pop(day_index, None)
+            return None
+        if current_signature != signature:
+            return None
+        with self._lock:
+            if day_index in self._cache:
+                self._cache.move_to_end(day_index)
+            self.hits += 1
+        return day_events
+
+    def get_day(self, day_index) -> DayEvents:
+        """Return the decoded events of a day, decoding the files only if needed"""
+        day_events = self._get_cached(day_index)
+        if day_events is not None:
+            return day_events
+        with self._lock:
+            future = self._loading.get(day_index)
+        if future is not None:
+            future.result()
+            day_events = self._get_cached(day_index)
+            if day_events is not None:
+                return day_events
+        return self._load_day(day_index)
+
+    def get_combined_sorted_events(self, day_index):
+        return self.get_day(day_index).combined
+
+    def _prefetch_day(self, day_index):
+        try:
+            if self._get_cached(day_index) is None:
+                self._load_day(day_index)
+        finally:
+            with self._lock:
+                self._loading.pop(day_index, None)
+
+    def prefetch(self, day_index):
+        """Start decoding a day on the background thread, if its files exist"""
+        paths = (get_transfer_events_file(day_index), get_nft_events_file(day_index))
+        if not all(os.path.exists(path) for path in paths):
+            return
+        with self._lock:
+            if day_index in self._cache or day_index in self._loading:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-preload")
+            self._loading[day_index] = self._executor.submit(self._prefetch_day, day_index)
+
+    def prefetch_window(self, day_index):
+        """Prefetch the days following `day_index` within the preload window"""
+        for next_day_index in range(day_index + 1, day_index + 1 + self.preload_window):
+            self.prefetch(next_day_index)
+
+    def iter_days(self, day_indexes):
+        """Lazily yield (day_index, DayEvents), prefetching the following days"""
+        day_indexes = list(day_indexes)
+        for position, day_index in enumerate(day_indexes):
+            for next_day_index in day_indexes[position + 1 : position + 1 + self.preload_window]:
+                self.prefetch(next_day_index)
+            yield day_index, self.get_day(day_index)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+event_repository = EventRepository()
@@ -1,2 +1,5 @@
+from .config import get_rpc_endpoints
+
+
 def get_rpc():
-    return "https://mainnet.gateway.tenderly.co"
+    return get_rpc_endpoints()[0].url
@@ -0,0 +1,201 @@
+"""
+On-disk cache of block headers.
+
+Keeps the header fields the pipeline reads (number, hash, parentHash,
+timestamp, logsBloom) in files of BUCKET_SIZE blocks under
+data/cache/headers/{first_block}.json. Only finalized blocks, the ranges of
+saved days, should be requested: cached headers are only fetched again when
+they don't match a known hash.
+
+A cached header whose hash differs from the known hash of its block, a
+trusted boundary hash or the `parentHash` of the header after it, was
+cached from a fork and is fetched again, like a missing one.
+
+Missing headers are fetched in JSON-RPC batches of BATCH_SIZE blocks,
+newest first. A batch that ends on a block with a known hash is taken from a
+single provider when its headers link up to that hash by `parentHash`, and
+its first header's `parentHash` is then the known hash the next, older batch
+has to end on. A batch that doesn't link up, or has no known hash to end on,
+escalates to a provider majority. See utils/block_verification.py.
+
+`get_cached_headers` returns a range's headers only if all of them are
+cached and link up, without fetching any; the log fetchers use it to read
+logs from a single provider (utils/block_verification.py).
+
+`get_headers_of_blocks` looks up scattered blocks, e.g. the day boundaries
+the tests check; the missing ones are fetched together in batches and, not
+being linked by `parentHash`, read from a provider majority.
+"""
+import os
+import threading
+from .aggregated_w3_request import make_aggregated_call, verified_single_provider_policy
+from .block_verification import normalize_hash
+from .json_backend import load_json, dump_json
+from .schemas import HeaderCacheFile
+
+HEADERS_DIR = "data/cache/headers"
+BUCKET_SIZE = 1000
+BATCH_SIZE = 100
+
+
+def get_header_data(block):
+    return {
+        "number": block["number"],
+        "hash": normalize_hash(block["hash"]),
+        "parentHash": normalize_hash(block["parentHash"]),
+        "timestamp": block["timestamp"],
+        "logsBloom": normalize_hash(block["logsBloom"]),
+    }
+
+
+def fetch_headers(w3, block_numbers):
+    with w3.batch_requests() as batch:
+        for block_number in block_numbers:
+            batch.add(w3.eth.get_block(block_number))
+        blocks = batch.execute()
+    return [get_header_data(block) for block in blocks]
+
+
+def fetch_headers_batch(w3, first_block, last_block):
+    return fetch_headers(w3, range(first_block, last_block + 1))
+
+
+def get_headers_batch_policy(first_block, last_block, last_block_hash):
+    """Single-provider policy for a batch ending on a block with a known hash, None (majority) otherwise"""
+    if last_block_hash is None:
+        return None
+
+    def verify(headers):
+        if [header["number"] for header in headers] != list(range(first_block, last_block + 1)):
+            return False
+        if headers[-1]["hash"] != last_block_hash:
+            return False
+        return all(child["parentHash"] == parent["hash"] for parent, child in zip(headers, headers[1:]))
+
+    return verified_single_provider_policy(verify)
+
+
+class HeaderCache:
+    def __init__(self, directory=HEADERS_DIR):
+        self.directory = directory
+        self.buckets = {}  # {first_block: {block_number: header}}
+        self.lock = threading.Lock()
+
+    def get_bucket(self, block_number):
+        first_block = block_number - block_number % BUCKET_SIZE
+        bucket = self.buckets.get(first_block)
+        if bucket is None:
+            path = os.path.join(self.directory, f"{first_block}.json")
+            bucket = {}
+            if os.path.exists(path):
+                data = load_json(path, HeaderCacheFile)
+                bucket = {int(number): header for number, header in data["headers"].items()}
+            self.buckets[first_block] = bucket
+        return bucket
+
+    def save_buckets(self, first_blocks):
+        os.makedirs(self.directory, exist_ok=True)
+        for first_block in sorted(first_blocks):
+            bucket = self.buckets[first_block]
+            dump_json(
+                {"first_block": first_block, "headers": {str(number): bucket[number] for number in sorted(bucket)}},
+                os.path.join(self.directory, f"{first_block}.json"),
+            )
+
+    def get_cached(self, block_number):
+        return self.get_bucket(block_number).get(block_number)
+
+    def add_headers(self, headers):
+        """Cache fetched headers, returns the buckets to save"""
+        changed_buckets = set()
+        for header in headers:
+            self.get_bucket(header["number"])[header["number"]] = header
+            changed_buckets.add(header["number"] - header["number"] % BUCKET_SIZE)
+        return changed_buckets
+
+    def get_headers(self, w3_instances, from_block, to_block, trusted_hashes=None):
+        """Headers of blocks [from_block, to_block] by number, fetching the ones not cached"""
+        with self.lock:
+            known_hashes = dict(trusted_hashes or {})
+            headers = {}
+            changed_buckets = set()
+            block_number = to_block
+            while block_number >= from_block:
+                header = self.get_cached(block_number)
+                if header is not None and known_hashes.get(block_number, header["hash"]) != header["hash"]:
+                    # Cached from a fork: fetched again, with the older headers of its batch
+                    header = None
+                if header is not None:
+                    headers[block_number] = header
+                    known_hashes[block_number - 1] = header["parentHash"]
+                    block_number -= 1
+                    continue
+
+                first_block = max(from_block, block_number - BATCH_SIZE + 1)
+                last_block = block_number
+                batch = make_aggregated_call(
+                    w3_instances,
+                    lambda w3: fetch_headers_batch(w3, first_block, last_block),
+                    get_headers_batch_policy(first_block, last_block, known_hashes.get(last_block)),
+                )
+                headers.update((header["number"], header) for header in batch)
+                changed_buckets |= self.add_headers(batch)
+                known_hashes[first_block - 1] = batch[0]["parentHash"]
+                block_number = first_block - 1
+
+            if changed_buckets:
+                self.save_buckets(changed_buckets)
+            return headers
+
+    def get_cached_headers(self, from_block, to_block, trusted_hashes=None):
+        """Cached headers of blocks [from_block, to_block] by number, None unless all are cached and link up"""
+        with self.lock:
+            known_hashes = dict(trusted_hashes or {})
+            headers = {}
+            for block_number in range(to_block, from_block - 1, -1):
+                header = self.get_cached(block_number)
+                if header is None or known_hashes.get(block_number, header["hash"]) != header["hash"]:
+                    return None
+                headers[block_number] = header
+                known_hashes[block_number - 1] = header["parentHash"]
+            return headers
+
+    def get_headers_of_blocks(self, w3_instances, block_numbers):
+        """Headers of any blocks by number, fetching the ones not cached in batches of BATCH_SIZE"""
+        with self.lock:
+            headers = {}
+            missing = []
+            for block_number in sorted(set(block_numbers)):
+                header = self.get_cached(block_number)
+                if header is None:
+                    missing.append(block_number)
+                else:
+                    headers[block_number] = header
+
+            changed_buckets = set()
+            for i in range(0, len(missing), BATCH_SIZE):
+                batch_numbers = missing[i:i + BATCH_SIZE]
+                batch = make_aggregated_call(w3_instances, lambda w3: fetch_headers(w3, batch_numbers))
+                headers.update((header["number"], header) for header in batch)
+                changed_buckets |= self.add_headers(batch)
+
+            if changed_buckets:
+                self.save_buckets(changed_buckets)
+            return headers
+
+    def remove_blocks(self, from_block, to_block):
+        """Drop the buckets of blocks [from_block, to_block], on disk and in memory"""
+        with self.lock:
+            first_block = from_block - from_block % BUCKET_SIZE
+            for bucket_start in range(first_block, to_block + 1, BUCKET_SIZE):
+                self.buckets.pop(bucket_start, None)
+                path = os.path.join(self.directory, f"{bucket_start}.json")
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def clear(self):
+        with self.lock:
+            self.buckets = {}
+
+
+header_cache = HeaderCache()
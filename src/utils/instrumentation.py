@@ -0,0 +1,152 @@
+"""
+Timing, counters and memory of a pipeline run.
+
+- `span(name, **attributes)` times a block of work, e.g. a stage or a day, and
+  records the bytes read and written and the RPC requests made meanwhile.
+  Spans opened inside a span are its children.
+- `count(name, amount, **labels)` adds to a counter. Provider calls are counted
+  by `make_aggregated_call`, RPC requests by provider and method by
+  the instances' middleware, and the bytes of JSON files by `json_backend`.
+- `start(trace_memory=True)` turns on `tracemalloc`, and each top-level span
+  records its peak traced memory. `start(profile=True)` runs `cProfile` until
+  `write_report`, which dumps the profile next to the report.
+
+`write_report()` writes the spans, their totals by path, the counters and
+the peak RSS as JSON to
+data/run_reports/{started_at}.json and data/latest/run_report.json, so runs
+can be compared with each other. Counters are process-wide: the bytes and
+requests of spans that run at the same time, in the streaming pipeline's
+threads, overlap.
+"""
+import cProfile
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+REPORTS_DIR = "data/run_reports"
+LATEST_REPORT_FILE = "data/latest/run_report.json"
+SPAN_COUNTERS = ("bytes_read", "bytes_written", "rpc_requests")
+
+
+def get_summary(spans):
+    """Count and total duration of the spans of each path, e.g. `states and points/day`"""
+    summary = {}
+    for span in spans:
+        path_summary = summary.setdefault(span["path"], {"count": 0, "duration_seconds": 0.0})
+        path_summary["count"] += 1
+        path_summary["duration_seconds"] = round(path_summary["duration_seconds"] + span["duration_seconds"], 6)
+    return summary
+
+
+class Instrumentation:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = datetime.now(timezone.utc)
+            self.started = time.perf_counter()
+            self.counters = defaultdict(int)  # {(name, ((label, value), ...)): amount}
+            self.totals = defaultdict(int)  # {name: amount over all labels}
+            self.spans = []
+            self.profiler = None
+
+    def start(self, trace_memory=False, profile=False):
+        """Reset the run and turn on the optional memory tracing and profiling"""
+        self.reset()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += amount
+            self.totals[name] += amount
+
+    def get_stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **attributes):
+        stack = self.get_stack()
+        is_top_level = not stack
+        if is_top_level and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        with self.lock:
+            totals_before = {counter: self.totals[counter] for counter in SPAN_COUNTERS}
+        record = {
+            "name": name,
+            "path": "/".join([*stack, name]),
+            "attributes": attributes,
+            "thread": threading.current_thread().name,
+            "start_seconds": round(time.perf_counter() - self.started, 6),
+        }
+        started = time.perf_counter()
+        stack.append(name)
+        try:
+            yield record
+        finally:
+            stack.pop()
+            record["duration_seconds"] = round(time.perf_counter() - started, 6)
+            with self.lock:
+                for counter in SPAN_COUNTERS:
+                    record[counter] = self.totals[counter] - totals_before[counter]
+                if is_top_level and tracemalloc.is_tracing():
+                    record["peak_traced_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+                self.spans.append(record)
+
+    def get_report(self):
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items(), key=lambda item: str(item[0]))
+            ]
+            spans = sorted(self.spans, key=lambda span: span["start_seconds"])
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(time.perf_counter() - self.started, 6),
+            "argv": sys.argv,
+            "peak_rss_bytes": peak_rss if sys.platform == "darwin" else peak_rss * 1024,
+            "summary": get_summary(spans),
+            "spans": spans,
+            "counters": counters,
+        }
+
+    def write_report(self, status="ok"):
+        """Write the run report, returns its path"""
+        # Imported here, json_backend counts its bytes through this module
+        from .json_backend import dump_json
+
+        report = {"status": status, **self.get_report()}
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        report_name = self.started_at.strftime("%Y-%m-%dT%H-%M-%S")
+        if self.profiler is not None:
+            self.profiler.disable()
+            report["profile_file"] = os.path.join(REPORTS_DIR, f"{report_name}.prof")
+            self.profiler.dump_stats(report["profile_file"])
+        report_file = os.path.join(REPORTS_DIR, f"{report_name}.json")
+        dump_json(report, report_file)
+        os.makedirs(os.path.dirname(LATEST_REPORT_FILE), exist_ok=True)
+        dump_json(report, LATEST_REPORT_FILE)
+        return report_file
+
+
+instrumentation = Instrumentation()
+span = instrumentation.span
+count = instrumentation.count
@@ -0,0 +1,108 @@
+"""
+Pluggable JSON serialization for pipeline artifacts.
+
+The backend is picked once at import time and can be forced with the
+POINTS_JSON_BACKEND environment variable ("auto", "msgspec", "orjson", "json").
+
+- msgspec is used for both decoding and encoding when installed. It keeps
+  arbitrary precision integers exact and can validate against the typed
+  schemas in `schemas.py`. Keys the schemas don't declare are kept, like with
+  the other backends.
+- orjson is only used for encoding. Its decoder silently turns integers above
+  64 bits into floats, which would corrupt token balances and points, so
+  decoding stays on the stdlib. Encoding falls back to the stdlib for payloads
+  with integers above 64 bits (points files always have them).
+- The stdlib `json` module is the fallback for everything.
+
+All backends write the same bytes as `json.dump(obj, f, indent=2)` for the
+ASCII-only data produced by this pipeline.
+"""
+import json
+import os
+from .instrumentation import count
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _select_backend():
+    requested = os.environ.get("POINTS_JSON_BACKEND", "auto").lower()
+    if requested == "auto":
+        if msgspec is not None:
+            return "msgspec"
+        if orjson is not None:
+            return "orjson"
+        return "json"
+    if requested == "msgspec" and msgspec is None:
+        raise ValueError("POINTS_JSON_BACKEND=msgspec but msgspec is not installed")
+    if requested == "orjson" and orjson is None:
+        raise ValueError("POINTS_JSON_BACKEND=orjson but orjson is not installed")
+    if requested not in ("msgspec", "orjson", "json"):
+        raise ValueError(f"Unknown POINTS_JSON_BACKEND: {requested}")
+    return requested
+
+
+BACKEND = _select_backend()
+
+_msgspec_decoder = msgspec.json.Decoder() if msgspec is not None else None
+
+
+def loads(data, schema=None, backend=None):
+    """
+    Decode JSON from str or bytes.
+
+    When msgspec is the active backend and a schema is given, the document is
+    validated against it after decoding. The document itself is returned, a
+    schema typed decode would drop the keys the schema doesn't declare. Other
+    backends return plain dicts without validating.
+    """
+    backend = backend or BACKEND
+    if backend == "msgspec":
+        document = _msgspec_decoder.decode(data)
+        if schema is not None:
+            msgspec.convert(document, schema)
+        return document
+    return json.loads(data)
+
+
+def dumps(obj, indent=2, backend=None) -> bytes:
+    """Encode an object to JSON bytes, pretty-printed with `indent` spaces"""
+    backend = backend or BACKEND
+    if backend == "msgspec":
+        encoded = msgspec.json.encode(obj)
+        if indent:
+            encoded = msgspec.json.format(encoded, indent=indent)
+        return encoded
+    if backend == "orjson" and indent in (None, 0, 2):
+        option = orjson.OPT_INDENT_2 if indent else 0
+        try:
+            return orjson.dumps(obj, option=option)
+        except orjson.JSONEncodeError:
+            # Integers above 64 bits are not supported by orjson
+            pass
+    if indent:
+        return json.dumps(obj, indent=indent).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def load_json(path, schema=None, backend=None):
+    """Read and decode a JSON file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    count("bytes_read", len(data))
+    return loads(data, schema=schema, backend=backend)
+
+
+def dump_json(obj, path, indent=2, backend=None):
+    """Encode an object and write it to a JSON file"""
+    data = dumps(obj, indent=indent, backend=backend)
+    with open(path, "wb") as f:
+        f.write(data)
+    count("bytes_written", len(data))
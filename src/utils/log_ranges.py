@@ -0,0 +1,54 @@
+"""
+Block ranges for log fetches.
+
+Ranges are split into chunks of at most the endpoints' `max_logs_block_range`.
+With the logs bloom prefilter, only blocks that can have logs are fetched. A
+block header's `logsBloom` has 3 of its 2048 bits set for the address and for
+every topic of every log in the block. A block whose bloom lacks a bit of the
+contract address or of the Transfer topic has no Transfer logs of the
+contract, so `get_logs` only needs to cover the blocks whose blooms match.
+Blooms can match blocks without such logs, but never miss one.
+
+Enabled with "LOGS_BLOOM_PREFILTER": true in config.json. It trades one
+eth_getLogs call per chunk for header reads, which are batched and kept in
+the header cache (utils/header_cache.py), so it pays off for sparse
+contracts, for providers that cap or heavily bill eth_getLogs, and on runs
+where the headers are already cached. With the headers cached, the logs are
+also read from a single provider; see utils/block_verification.py.
+"""
+from .block_verification import bloom_matches, get_bloom_mask
+from .header_cache import header_cache
+
+
+def split_block_range(start_block, end_block, chunk_size):
+    """Chunks the log fetchers read [start_block, end_block] in"""
+    chunks = []
+    current_block = start_block
+    while current_block <= end_block:
+        chunk_end = min(current_block + chunk_size - 1, end_block)
+        chunks.append((current_block, chunk_end))
+        current_block = chunk_end + 1
+    return chunks
+
+
+def group_block_ranges(block_numbers, max_range):
+    """Fewest ranges of at most `max_range` blocks covering the sorted `block_numbers`"""
+    ranges = []
+    for block_number in block_numbers:
+        if ranges and block_number - ranges[-1][0] < max_range:
+            ranges[-1][1] = block_number
+        else:
+            ranges.append([block_number, block_number])
+    return [tuple(block_range) for block_range in ranges]
+
+
+def get_matching_block_ranges(w3_instances, address, start_block, end_block, max_range, trusted_hashes=None):
+    """
+    Block ranges to fetch `address` Transfer logs for, and the hashes of every
+    header read, which are as trustworthy as the boundary hashes they link to.
+    """
+    headers = header_cache.get_headers(w3_instances, start_block, end_block, trusted_hashes)
+    mask = get_bloom_mask(address)
+    matching_blocks = [number for number in sorted(headers) if bloom_matches(headers[number]["logsBloom"], mask)]
+    header_hashes = {number: header["hash"] for number, header in headers.items()}
+    return group_block_ranges(matching_blocks, max_range), header_hashes
@@ -0,0 +1,274 @@
+"""
+Per-address history of daily points, under data/points_history.
+
+`write_points_to_file` appends every day it writes, so the history is kept
+as a byproduct of the points stages, and `get_history(address)` returns an
+address's (day_index, points) for every day without opening the day files.
+
+- addresses.txt: one address per line, an address's id is its line number.
+- log.txt: the append-only log, a `address_id day_index write_id points`
+  line per address of every written day.
+- runs/{n}.txt: sorted runs, the same lines sorted by address id and day,
+  and runs/{n}.index: a fixed-size (offset, length) record per address id,
+  so an address's lines in a run are read with a single seek.
+- manifest.json: the runs, how much of the log and of addresses.txt is
+  committed, and the write id of every day's latest write.
+
+Every append of a day gets a new write id and only lines with the day's
+latest write id count, so a recomputed day replaces the day, including the
+addresses that don't have points on it anymore. The stale lines are dropped
+when the log is compacted: at COMPACT_AFTER_RECORDS lines or COMPACT_AFTER_DAYS
+day writes, and at the end of a run by `sync`, the log is sorted into a new
+run, and once there are more than MAX_RUNS runs they are merged into one.
+
+The (offset, length) of every log line is kept in memory by address id,
+read once on load and extended by appends, so a query reads an address's
+log lines by seeking to them: at most MAX_RUNS seeks into the runs and
+fewer than COMPACT_AFTER_DAYS into the log.
+
+Appends are committed by the manifest, written last; lines after the
+committed length, from a run that stopped mid-append, are truncated on load.
+"""
+import glob
+import heapq
+import os
+import struct
+import threading
+from collections import defaultdict
+from .json_backend import load_json, dump_json
+
+HISTORY_DIR = "data/points_history"
+POINTS_DIR = "data/points"
+COMPACT_AFTER_RECORDS = 200_000
+COMPACT_AFTER_DAYS = 8
+MAX_RUNS = 4
+INDEX_RECORD = struct.Struct("<QI")  # offset and length of an address's lines in a run
+
+
+def parse_line(line):
+    address_id, day_index, write_id, points = line.split()
+    return int(address_id), int(day_index), int(write_id), int(points)
+
+
+def format_line(address_id, day_index, write_id, points):
+    return f"{address_id} {day_index} {write_id} {points}\n"
+
+
+def iter_lines(path):
+    with open(path) as f:
+        for line in f:
+            yield parse_line(line)
+
+
+def truncate_file(path, size):
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+class PointsHistory:
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = directory
+        self.lock = threading.RLock()
+        self.loaded_path = None
+
+    def get_path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def load(self):
+        # Loaded again when the working directory changes, the tests run stages in temporary ones
+        path = os.path.abspath(self.directory)
+        if self.loaded_path == path:
+            return
+        manifest_path = self.get_path("manifest.json")
+        if os.path.exists(manifest_path):
+            self.manifest = load_json(manifest_path)
+        else:
+            self.manifest = {
+                "next_write_id": 0,
+                "day_writes": {},
+                "runs": [],
+                "next_run": 0,
+                "log_bytes": 0,
+                "log_records": 0,
+                "addresses_bytes": 0,
+            }
+        truncate_file(self.get_path("log.txt"), self.manifest["log_bytes"])
+        truncate_file(self.get_path("addresses.txt"), self.manifest["addresses_bytes"])
+        self.address_ids = {}
+        if os.path.exists(self.get_path("addresses.txt")):
+            with open(self.get_path("addresses.txt")) as f:
+                for address_id, line in enumerate(f):
+                    self.address_ids[line.strip()] = address_id
+        self.load_log_index()
+        self.loaded_path = path
+
+    def load_log_index(self):
+        """Where each address's lines are in the log, read once instead of scanning the log on every query"""
+        self.log_index = defaultdict(list)  # {address_id: [(offset, length)]}
+        self.log_write_ids = set()
+        if not os.path.exists(self.get_path("log.txt")):
+            return
+        with open(self.get_path("log.txt"), "rb") as f:
+            offset = 0
+            for line in f:
+                address_id, _, write_id, _ = parse_line(line)
+                self.log_index[address_id].append((offset, len(line)))
+                self.log_write_ids.add(write_id)
+                offset += len(line)
+
+    def save_manifest(self):
+        manifest_path = self.get_path("manifest.json")
+        temporary_path = f"{manifest_path}.tmp"
+        dump_json(self.manifest, temporary_path)
+        os.replace(temporary_path, manifest_path)
+
+    def is_current(self, day_index, write_id):
+        return self.manifest["day_writes"].get(str(day_index)) == write_id
+
+    def get_days(self):
+        with self.lock:
+            self.load()
+            return sorted(int(day_index) for day_index in self.manifest["day_writes"])
+
+    def append_day(self, day_index, points):
+        """Record a day's {address: points}, replacing an earlier write of the day"""
+        with self.lock:
+            self.load()
+            os.makedirs(self.directory, exist_ok=True)
+            new_addresses = [address for address in points if address not in self.address_ids]
+            with open(self.get_path("addresses.txt"), "a") as f:
+                for address in new_addresses:
+                    self.address_ids[address] = len(self.address_ids)
+                    f.write(f"{address}\n")
+                addresses_bytes = f.tell()
+
+            write_id = self.manifest["next_write_id"]
+            with open(self.get_path("log.txt"), "ab") as f:
+                offset = f.tell()
+                for address, value in points.items():
+                    line = format_line(self.address_ids[address], day_index, write_id, value).encode()
+                    f.write(line)
+                    self.log_index[self.address_ids[address]].append((offset, len(line)))
+                    offset += len(line)
+                log_bytes = f.tell()
+            self.log_write_ids.add(write_id)
+
+            self.manifest["next_write_id"] = write_id + 1
+            self.manifest["day_writes"][str(day_index)] = write_id
+            self.manifest["log_bytes"] = log_bytes
+            self.manifest["log_records"] += len(points)
+            self.manifest["addresses_bytes"] = addresses_bytes
+            self.save_manifest()
+            if (
+                self.manifest["log_records"] >= COMPACT_AFTER_RECORDS
+                or len(self.log_write_ids) >= COMPACT_AFTER_DAYS
+            ):
+                self.compact()
+
+    def get_history(self, address):
+        """[(day_index, points)] of an address, by day"""
+        with self.lock:
+            self.load()
+            address_id = self.address_ids.get(address.lower())
+            if address_id is None:
+                return []
+            history = {}
+            for run in self.manifest["runs"]:
+                for _, day_index, write_id, points in self.read_run_lines(run, address_id):
+                    if self.is_current(day_index, write_id):
+                        history[day_index] = points
+            if self.log_index.get(address_id):
+                with open(self.get_path("log.txt"), "rb") as f:
+                    for offset, length in self.log_index[address_id]:
+                        f.seek(offset)
+                        _, day_index, write_id, points = parse_line(f.read(length))
+                        if self.is_current(day_index, write_id):
+                            history[day_index] = points
+            return sorted(history.items())
+
+    def read_run_lines(self, run, address_id):
+        with open(self.get_path("runs", f"{run}.index"), "rb") as f:
+            f.seek(address_id * INDEX_RECORD.size)
+            record = f.read(INDEX_RECORD.size)
+        if len(record) < INDEX_RECORD.size:
+            return []
+        offset, length = INDEX_RECORD.unpack(record)
+        if length == 0:
+            return []
+        with open(self.get_path("runs", f"{run}.txt"), "rb") as f:
+            f.seek(offset)
+            return [parse_line(line) for line in f.read(length).decode().splitlines()]
+
+    def compact(self, full=False):
+        """Sort the log into a new run, merging all runs into one when there are too many or `full`"""
+        with self.lock:
+            self.load()
+            runs = self.manifest["runs"]
+            merge_runs = full or len(runs) + 1 > MAX_RUNS
+            if not self.manifest["log_records"] and not (merge_runs and len(runs) > 1):
+                return
+            log_lines = []
+            if self.manifest["log_records"]:
+                log_lines = sorted(iter_lines(self.get_path("log.txt")))
+            sources = [log_lines]
+            if merge_runs:
+                sources += [iter_lines(self.get_path("runs", f"{run}.txt")) for run in runs]
+            lines = (
+                line for line in heapq.merge(*sources) if self.is_current(line[1], line[2])
+            )
+            run = self.manifest["next_run"]
+            self.write_run(run, lines)
+
+            self.manifest["runs"] = [run] if merge_runs else runs + [run]
+            self.manifest["next_run"] = run + 1
+            self.manifest["log_bytes"] = 0
+            self.manifest["log_records"] = 0
+            self.save_manifest()
+            truncate_file(self.get_path("log.txt"), 0)
+            self.log_index = defaultdict(list)
+            self.log_write_ids = set()
+            if merge_runs:
+                for old_run in runs:
+                    for extension in ("txt", "index"):
+                        os.remove(self.get_path("runs", f"{old_run}.{extension}"))
+
+    def write_run(self, run, lines):
+        """Write lines sorted by address id and day, and the (offset, length) of each address's lines"""
+        os.makedirs(self.get_path("runs"), exist_ok=True)
+        ranges = {}
+        with open(self.get_path("runs", f"{run}.txt"), "wb") as f:
+            for line in lines:
+                address_id = line[0]
+                offset = f.tell()
+                f.write(format_line(*line).encode())
+                start, _ = ranges.get(address_id, (offset, 0))
+                ranges[address_id] = (start, f.tell() - start)
+        with open(self.get_path("runs", f"{run}.index"), "wb") as f:
+            for address_id in range(max(ranges, default=-1) + 1):
+                f.write(INDEX_RECORD.pack(*ranges.get(address_id, (0, 0))))
+
+    def sync(self, points_dir=POINTS_DIR):
+        """Append the days of `points_dir` the history doesn't have, then compact the log"""
+        with self.lock:
+            self.load()
+            for path in glob.glob(os.path.join(points_dir, "*.json")):
+                day_index = os.path.splitext(os.path.basename(path))[0]
+                if day_index.isdigit() and day_index not in self.manifest["day_writes"]:
+                    self.append_day(int(day_index), load_json(path)["points"])
+            self.compact()
+
+    def rebuild(self, points_dir=POINTS_DIR):
+        """Build the history again from the day files"""
+        with self.lock:
+            for path in glob.glob(self.get_path("runs", "*")) + [
+                self.get_path(name) for name in ("log.txt", "addresses.txt", "manifest.json")
+            ]:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.loaded_path = None
+            self.sync(points_dir)
+            self.compact(full=True)
+
+
+points_history = PointsHistory()
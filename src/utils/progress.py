@@ -0,0 +1,245 @@
+"""
+Progress of long runs: console lines, JSON log events and a Prometheus
+textfile.
+
+Stages report what they finished with `progress.advance(task, blocks=,
+events=, days=)`; `progress.start_task(task, total_blocks=, total_days=)` sets
+the totals an ETA is computed from. The streaming pipeline reports its queue
+depths and `make_aggregated_call` every provider call's latency.
+
+At most every PROGRESS_INTERVAL_SECONDS (config.json, 10 by default) one line
+per running task is printed with its blocks/s, events/s and ETA, as text or,
+with "PROGRESS_FORMAT": "json", as a JSON object per line. When
+"METRICS_TEXTFILE" is set, the metrics are written to that file in the
+Prometheus text format at the same interval, replacing it atomically, for
+node-exporter's textfile collector:
+
+- points_blocks_total, points_events_total, points_days_completed_total,
+- points_blocks_per_second, points_events_per_second, points_eta_seconds,
+- points_queue_depth of each streaming stage's output queue,
+- points_rpc_latency_seconds, a histogram by provider.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from .config import get_metrics_textfile, get_progress_format, get_progress_interval
+
+RPC_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Task:
+    def __init__(self, name, total_blocks=None, total_days=None):
+        self.name = name
+        self.total_blocks = total_blocks
+        self.total_days = total_days
+        self.blocks = 0
+        self.events = 0
+        self.days = 0
+        self.started = time.monotonic()
+        self.finished = False
+
+    def get_rates(self, now):
+        elapsed = max(now - self.started, 1e-9)
+        return self.blocks / elapsed, self.events / elapsed
+
+    def get_eta(self, now):
+        """Seconds left from the blocks or, without a block total, the days done so far"""
+        elapsed = now - self.started
+        for done, total in ((self.blocks, self.total_blocks), (self.days, self.total_days)):
+            if total:
+                return None if done == 0 else max(0.0, elapsed * (total - done) / done)
+        return None
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def format_labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Progress:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.textfile_lock = threading.Lock()
+        self.configure()
+
+    def configure(self, interval=None, output_format=None, textfile=None):
+        """Reset, with settings from config.json for the ones not given"""
+        with self.lock:
+            self.interval = interval
+            self.output_format = output_format
+            self.textfile = textfile
+            self.configured = interval is not None and output_format is not None
+            self.tasks = {}
+            self.queue_depths = {}
+            self.rpc_latencies = {}
+            self.last_report = time.monotonic()
+
+    def load_settings(self):
+        # Read on first use, so the config.json of the working directory the run starts in is used
+        if not self.configured:
+            self.interval = self.interval if self.interval is not None else get_progress_interval()
+            self.output_format = self.output_format or get_progress_format()
+            self.textfile = self.textfile or get_metrics_textfile()
+            self.configured = True
+
+    def start_task(self, name, total_blocks=None, total_days=None):
+        with self.lock:
+            self.tasks[name] = Task(name, total_blocks, total_days)
+
+    def advance(self, name, blocks=0, events=0, days=0):
+        with self.lock:
+            task = self.tasks.get(name)
+            if task is None:
+                task = self.tasks[name] = Task(name)
+            task.blocks += blocks
+            task.events += events
+            task.days += days
+        self.report()
+
+    def finish_task(self, name):
+        """Print a task's last line and write the metrics, even within the interval"""
+        with self.lock:
+            task = self.tasks.get(name)
+            if task is None:
+                return
+            task.finished = True
+        self.report(force=True, tasks=[task])
+
+    def set_queue_depth(self, queue_name, depth):
+        with self.lock:
+            self.queue_depths[queue_name] = depth
+
+    def observe_rpc_latency(self, provider, seconds):
+        with self.lock:
+            histogram = self.rpc_latencies.get(provider)
+            if histogram is None:
+                histogram = self.rpc_latencies[provider] = Histogram(RPC_LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def report(self, force=False, tasks=None):
+        """Print the running tasks, or `tasks`, and write the metrics once per interval"""
+        now = time.monotonic()
+        with self.lock:
+            self.load_settings()
+            if not force and now - self.last_report < self.interval:
+                return
+            self.last_report = now
+            tasks = tasks if tasks is not None else [task for task in self.tasks.values() if not task.finished]
+            lines = [self.format_task(task, now) for task in tasks]
+            textfile = self.textfile
+        for line in lines:
+            print(line)
+        sys.stdout.flush()
+        if textfile:
+            self.write_metrics()
+
+    def write_metrics(self):
+        """Write the textfile, one report at a time so an older one never replaces a newer one"""
+        with self.textfile_lock:
+            with self.lock:
+                metrics = self.format_metrics(time.monotonic())
+                textfile = self.textfile
+            write_textfile(textfile, metrics)
+
+    def format_task(self, task, now):
+        blocks_per_second, events_per_second = task.get_rates(now)
+        eta = task.get_eta(now)
+        if self.output_format == "json":
+            return json.dumps({
+                "event": "progress",
+                "time": datetime.now(timezone.utc).isoformat(),
+                "task": task.name,
+                "blocks": task.blocks,
+                "total_blocks": task.total_blocks,
+                "events": task.events,
+                "days": task.days,
+                "total_days": task.total_days,
+                "blocks_per_second": round(blocks_per_second, 3),
+                "events_per_second": round(events_per_second, 3),
+                "eta_seconds": None if eta is None else round(eta, 1),
+                "finished": task.finished,
+            })
+        done = f"{task.days:,}" + (f"/{task.total_days:,}" if task.total_days else "") + " days"
+        if task.blocks or task.total_blocks:
+            done += f", {task.blocks:,}" + (f"/{task.total_blocks:,}" if task.total_blocks else "") + " blocks"
+        rates = f"{blocks_per_second:,.0f} blocks/s, {events_per_second:,.0f} events/s" if task.blocks else ""
+        status = "done" if task.finished else f"ETA {format_duration(eta)}"
+        return f"[{task.name}] {done}{', ' + rates if rates else ''}, {status}"
+
+    def format_metrics(self, now):
+        """Prometheus text format of the current metrics"""
+        lines = []
+
+        def add(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        tasks = list(self.tasks.values())
+        add("points_blocks_total", "counter", "Blocks processed by a task",
+            [(format_labels(task=task.name), task.blocks) for task in tasks])
+        add("points_events_total", "counter", "Events processed by a task",
+            [(format_labels(task=task.name), task.events) for task in tasks])
+        add("points_days_completed_total", "counter", "Days completed by a task",
+            [(format_labels(task=task.name), task.days) for task in tasks])
+        rates = {task.name: task.get_rates(now) for task in tasks}
+        add("points_blocks_per_second", "gauge", "Blocks per second since the task started",
+            [(format_labels(task=name), round(blocks, 3)) for name, (blocks, _) in rates.items()])
+        add("points_events_per_second", "gauge", "Events per second since the task started",
+            [(format_labels(task=name), round(events, 3)) for name, (_, events) in rates.items()])
+        add("points_eta_seconds", "gauge", "Estimated seconds until the task is done",
+            [(format_labels(task=task.name), round(task.get_eta(now), 1)) for task in tasks
+             if task.get_eta(now) is not None])
+        add("points_queue_depth", "gauge", "Days waiting in a streaming stage's output queue",
+            [(format_labels(stage=stage), depth) for stage, depth in self.queue_depths.items()])
+
+        add("points_rpc_latency_seconds", "histogram", "Latency of provider calls", [])
+        for provider, histogram in self.rpc_latencies.items():
+            for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                lines.append(f"points_rpc_latency_seconds_bucket{format_labels(provider=provider, le=bound)} {bucket_count}")
+            lines.append(f"points_rpc_latency_seconds_bucket{format_labels(provider=provider, le='+Inf')} {histogram.count}")
+            lines.append(f"points_rpc_latency_seconds_sum{format_labels(provider=provider)} {histogram.sum}")
+            lines.append(f"points_rpc_latency_seconds_count{format_labels(provider=provider)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, text):
+    """Write and rename, so the textfile collector never reads a partial file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as f:
+        f.write(text)
+    os.replace(temporary_path, path)
+
+
+progress = Progress()
@@ -1,29 +1,50 @@
-from .read_transfer_events_as_block_number_to_array import read_transfer_events_as_block_number_to_array
-from .read_nft_events_as_block_number_to_array import read_nft_events_as_block_number_to_array
+import heapq
+from itertools import groupby
+from .event_order import get_event_key
+from .event_repository import event_repository
 from collections import defaultdict
 
-def combine_and_sort_events(block_number_to_transfer_events, block_number_to_nft_events):
+def combine_and_sort_events(block_number_to_transfer_events, block_number_to_nft_events, is_sorted=False):
+    """
+    Both maps' events by block number, blocks in ascending order. With
+    `is_sorted`, both maps were read from files flagged as sorted, so their
+    blocks and each block's events are merged in (blockNumber, logIndex)
+    order instead of sorted again.
+    """
+    if is_sorted:
+        return {
+            block_number: list(heapq.merge(
+                block_number_to_transfer_events.get(block_number, ()),
+                block_number_to_nft_events.get(block_number, ()),
+                key=get_event_key,
+            ))
+            for block_number, _ in groupby(heapq.merge(block_number_to_transfer_events, block_number_to_nft_events))
+        }
+
     block_number_to_events = defaultdict(list)
     for block_number, transfer_events in block_number_to_transfer_events.items():
         block_number_to_events[block_number].extend(transfer_events)
     for block_number, nft_events in block_number_to_nft_events.items():
         block_number_to_events[block_number].extend(nft_events)
 
-    for block_number, events in block_number_to_events.items():
-        block_number_to_events[block_number] = sorted(
-            events,
+    # Plain dict with block numbers in ascending order, so lookups of blocks
+    # without events don't insert empty lists into the shared cached map
+    return {
+        block_number: sorted(
+            block_number_to_events[block_number],
             key=lambda x: (x["blockNumber"], x["transactionIndex"], x["logIndex"]),
         )
-    return block_number_to_events
+        for block_number in sorted(block_number_to_events)
+    }
+
+
+def iter_events_in_block_range(block_number_to_events, start_block, end_block):
+    """Yield (block_number, events) in ascending order, only for blocks that have events"""
+    for block_number in sorted(block_number_to_events):
+        if start_block <= block_number <= end_block:
+            yield block_number, block_number_to_events[block_number]
 
 
 def read_combined_sorted_events(day_index):
-    transfer_events_file = f"data/events/pilot_vault/{day_index}.json"
-    nft_events_file = f"data/events/nft/{day_index}.json"
-    block_number_to_transfer_events = read_transfer_events_as_block_number_to_array(
-        transfer_events_file
-    )
-    block_number_to_nft_events = read_nft_events_as_block_number_to_array(
-        nft_events_file
-    )
-    return combine_and_sort_events(block_number_to_transfer_events, block_number_to_nft_events)
+    """Return the day's events by block number, decoded once and shared via the event repository"""
+    return event_repository.get_combined_sorted_events(day_index)
@@ -1,21 +1,31 @@
 from collections import defaultdict
 from typing import Dict, List
-import json
 from .event_type import EventType
+from .event_order import is_sorted_events_file
+from .json_backend import load_json
+from .schemas import EventsFile
 
 
-def read_transfer_events_as_block_number_to_array(file_path) -> Dict[int, List[dict]]:
-    with open(file_path, "r") as f:
-        events = json.load(f)
+def read_transfer_events_as_block_number_to_array(file_path, return_is_sorted=False):
+    """
+    {block_number: events} of an events file. With `return_is_sorted` a
+    (events, is_sorted) tuple, is_sorted tells whether the file has the isSorted
+    flag, so its blocks are in ascending order too.
+    """
+    events = load_json(file_path, EventsFile)
     block_number_to_events: Dict[int, List[dict]] = defaultdict(list)
 
     for event in events["events"]:
         event["event_type"] = EventType.TRANSFER
         block_number_to_events[event["blockNumber"]].append(event)
 
-    for block_number, events in block_number_to_events.items():
-        block_number_to_events[block_number] = sorted(
-            events,
-            key=lambda x: (x["blockNumber"], x["transactionIndex"], x["logIndex"]),
-        )
-    return block_number_to_events
+    is_sorted = is_sorted_events_file(events)
+    if not is_sorted:
+        # Files saved before the fetchers sorted events
+        for block_number, events in block_number_to_events.items():
+            block_number_to_events[block_number] = sorted(
+                events,
+                key=lambda x: (x["blockNumber"], x["transactionIndex"], x["logIndex"]),
+            )
+    block_number_to_events = dict(block_number_to_events)
+    return (block_number_to_events, is_sorted) if return_is_sorted else block_number_to_events
@@ -0,0 +1,180 @@
+"""
+Record-and-replay cassettes for the providers under `make_aggregated_call`.
+
+A cassette is a directory with one fixtures file (see `rpc_fixtures.py`) per
+provider endpoint. In record mode every request goes to the real provider and
+its response is stored in that provider's file. In replay mode the responses
+are served from the files, after a synthetic latency with jitter, so the
+ingestion stages can be timed without network noise. Provider routing is
+randomized, so a request replayed on a provider that didn't see it while
+recording is answered with another provider's recording of the same request.
+Either way, RPC calls are counted per method.
+
+The cassette is switched on by `POINTS_RPC_CASSETTE=<dir>` with
+`POINTS_RPC_CASSETTE_MODE=record|replay` (replay by default), or in code with
+`use_cassette(w3_instances, Cassette(...))`.
+"""
+import glob
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from web3.providers.base import JSONBaseProvider
+from .rpc_fixtures import RpcFixtures
+
+RECORD = "record"
+REPLAY = "replay"
+MISSING_RESPONSE_ERROR_CODE = -32001
+
+
+def get_cassette_file(directory, endpoint):
+    return os.path.join(directory, re.sub(r"[^A-Za-z0-9]+", "_", str(endpoint)).strip("_") + ".json")
+
+
+class Cassette:
+    def __init__(self, directory, mode=REPLAY, latency=0.0, jitter=0.0, seed=0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Invalid cassette mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.fixtures = {}
+        self.calls = Counter()
+        self.misses = Counter()
+        self.lock = threading.Lock()
+
+    def get_fixtures(self, endpoint) -> RpcFixtures:
+        with self.lock:
+            if endpoint not in self.fixtures:
+                self.fixtures[endpoint] = RpcFixtures(get_cassette_file(self.directory, endpoint))
+            return self.fixtures[endpoint]
+
+    def find_response(self, endpoint, method, params):
+        """The endpoint's own recording of a request, else any other provider's"""
+        response = self.get_fixtures(endpoint).get(method, params)
+        if response is not None:
+            return response
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            fixtures = self.get_fixtures_by_file(path)
+            response = fixtures.get(method, params)
+            if response is not None:
+                return response
+        return None
+
+    def get_fixtures_by_file(self, path):
+        with self.lock:
+            for fixtures in self.fixtures.values():
+                if os.path.abspath(fixtures.path) == os.path.abspath(path):
+                    return fixtures
+            fixtures = RpcFixtures(path)
+            self.fixtures[path] = fixtures
+            return fixtures
+
+    def get_delay(self):
+        with self.lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def count(self, method, missed=False):
+        with self.lock:
+            self.calls[method] += 1
+            if missed:
+                self.misses[method] += 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.calls.clear()
+            self.misses.clear()
+
+    def save(self):
+        for fixtures in list(self.fixtures.values()):
+            if fixtures.unsaved:
+                fixtures.save()
+
+
+class CassetteProvider(JSONBaseProvider):
+    """
+    Provider that records the responses of `inner`, or replays them.
+
+    It keeps the endpoint URI of the provider it stands in for, so provider
+    health and the cassette files stay keyed by the real endpoint.
+    """
+
+    def __init__(self, cassette: Cassette, endpoint_uri, inner=None):
+        super().__init__()
+        if cassette.mode == RECORD and inner is None:
+            raise ValueError("A recording cassette needs a provider to record from")
+        self.cassette = cassette
+        self.endpoint_uri = endpoint_uri
+        self.inner = inner
+        self.request_id = 0
+
+    def make_request(self, method, params):
+        if self.cassette.mode == RECORD:
+            self.cassette.count(method)
+            response = self.inner.make_request(method, params)
+            self.cassette.get_fixtures(self.endpoint_uri).record(method, params, response)
+            return response
+
+        time.sleep(self.cassette.get_delay())
+        response = self.cassette.find_response(self.endpoint_uri, method, params)
+        self.cassette.count(method, missed=response is None)
+        if response is None:
+            response = {
+                "error": {
+                    "code": MISSING_RESPONSE_ERROR_CODE,
+                    "message": f"No recorded response for {method} on {self.endpoint_uri}",
+                }
+            }
+        self.request_id += 1
+        return {"jsonrpc": "2.0", "id": self.request_id, **response}
+
+    def make_batch_request(self, requests):
+        # Recorded per request, so a batch replays from the same recordings as single calls
+        return [self.make_request(method, params) for method, params in requests]
+
+    def is_connected(self, show_traceback=False):
+        return self.cassette.mode == REPLAY or self.inner.is_connected(show_traceback)
+
+
+def install_cassette(w3_instances, cassette):
+    """Put a cassette provider in front of every instance; returns the previous providers"""
+    previous_providers = []
+    for w3 in w3_instances:
+        provider = w3.provider
+        previous_providers.append(provider)
+        w3.provider = CassetteProvider(
+            cassette,
+            getattr(provider, "endpoint_uri", repr(provider)),
+            provider if cassette.mode == RECORD else None,
+        )
+    return previous_providers
+
+
+@contextmanager
+def use_cassette(w3_instances, cassette):
+    """Serve `w3_instances` through `cassette`, saving recordings and restoring providers on exit"""
+    previous_providers = install_cassette(w3_instances, cassette)
+    try:
+        yield cassette
+    finally:
+        for w3, provider in zip(w3_instances, previous_providers):
+            w3.provider = provider
+        if cassette.mode == RECORD:
+            cassette.save()
+
+
+def get_cassette_from_environment():
+    directory = os.environ.get("POINTS_RPC_CASSETTE")
+    if not directory:
+        return None
+    return Cassette(
+        directory,
+        mode=os.environ.get("POINTS_RPC_CASSETTE_MODE", REPLAY),
+        latency=float(os.environ.get("POINTS_RPC_CASSETTE_LATENCY_MS", "0")) / 1000,
+        jitter=float(os.environ.get("POINTS_RPC_CASSETTE_JITTER_MS", "0")) / 1000,
+    )
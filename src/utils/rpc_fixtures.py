@@ -0,0 +1,59 @@
+"""
+Recorded JSON-RPC responses, replayed by the local stand-in node
+(`src/rpc_standin.py`) so the pipeline can run offline and deterministically.
+
+Responses are keyed by method and params. A fixtures file looks like:
+
+    {
+      "version": 1,
+      "responses": {
+        "[\"eth_blockNumber\",[]]": {"result": "0x1"},
+        ...
+      }
+    }
+"""
+import json
+import os
+import threading
+from .json_backend import load_json, dump_json
+
+FIXTURES_VERSION = 1
+
+
+def get_request_key(method, params) -> str:
+    return json.dumps([method, params if params is not None else []], sort_keys=True, separators=(",", ":"))
+
+
+class RpcFixtures:
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            data = load_json(path)
+            if data.get("version") != FIXTURES_VERSION:
+                raise ValueError(f"Unsupported RPC fixtures version in {path}: {data.get('version')}")
+            self.responses = data["responses"]
+
+    def get(self, method, params):
+        """The recorded {"result": ...} or {"error": ...} for a request, or None"""
+        with self.lock:
+            return self.responses.get(get_request_key(method, params))
+
+    def record(self, method, params, response):
+        response = {key: response[key] for key in ("result", "error") if key in response}
+        with self.lock:
+            self.responses[get_request_key(method, params)] = response
+            self.unsaved += 1
+
+    def save(self):
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            dump_json({"version": FIXTURES_VERSION, "responses": self.responses}, self.path)
+            self.unsaved = 0
+
+    def __len__(self):
+        return len(self.responses)
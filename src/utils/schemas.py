@@ -0,0 +1,169 @@
+"""
+Typed schemas for the JSON artifacts written under data/.
+
+These are TypedDicts so the decoded documents stay plain dicts for every
+consumer. With the msgspec backend they are also used to validate documents
+after decoding (see `json_backend.loads`). Keys that aren't declared here are
+ignored by the validation and kept in the loaded document.
+"""
+from typing import Dict, List, NotRequired, Optional, TypedDict, Union
+
+
+class BlockRef(TypedDict):
+    number: int
+    timestamp: int
+    utc_datetime: str
+    hash: str
+
+
+class DayBlocks(TypedDict):
+    day: str
+    last_block_of_day: BlockRef
+    first_block_of_next_day: Optional[BlockRef]
+    is_final_day: bool
+
+
+class DeploymentInfo(TypedDict, total=False):
+    address: str
+    deployment_block: Optional[int]
+    block_number: int
+    timestamp: int
+    datetime: str
+    hash: str
+    error: str
+
+
+class DeploymentBlocks(TypedDict):
+    deployments: Dict[str, DeploymentInfo]
+
+
+class EventRecord(TypedDict):
+    blockNumber: int
+    # Not in files fetched before block hashes were recorded
+    blockHash: NotRequired[str]
+    transactionHash: str
+    logIndex: int
+    args: Dict[str, Union[str, int]]
+    transactionIndex: int
+
+
+class EventsMetadata(TypedDict):
+    contractAddress: str
+    eventName: str
+    startBlock: int
+    endBlock: int
+    totalEvents: int
+    endBlockHash: NotRequired[Optional[str]]
+    # Events sorted by (blockNumber, logIndex) without duplicates, see utils/event_order.py
+    isSorted: NotRequired[bool]
+    exportedAt: str
+
+
+class EventsFile(TypedDict, total=False):
+    error: bool
+    error_message: str
+    metadata: EventsMetadata
+    events: List[EventRecord]
+
+
+class PilotVaultBalance(TypedDict):
+    balance: int
+    last_positive_balance_update_block: int
+    last_negative_balance_update_block: int
+
+
+class NftStates(TypedDict):
+    start_state: Dict[str, List[int]]
+    end_state: Dict[str, List[int]]
+
+
+class PilotVaultStates(TypedDict):
+    start_state: Dict[str, PilotVaultBalance]
+    end_state: Dict[str, PilotVaultBalance]
+
+
+class DailyStateFile(TypedDict):
+    start_block: int
+    end_block: int
+    date: str
+    day_index: int
+    nft: NftStates
+    pilot_vault: PilotVaultStates
+
+
+class PointsFile(TypedDict):
+    day_index: int
+    date: str
+    start_block: int
+    end_block: int
+    points: Dict[str, int]
+
+
+class AggregatedUserPoints(TypedDict):
+    day_points: int
+    cumulative_points: int
+
+
+class AggregatedMetadata(TypedDict):
+    days_included: int
+    total_users: int
+    total_points_all_users: int
+    day_points: int
+    day_users_count: int
+
+
+class AggregatedPointsFile(TypedDict):
+    day_index: int
+    date: str
+    start_block: Optional[int]
+    end_block: Optional[int]
+    metadata: AggregatedMetadata
+    points: Dict[str, AggregatedUserPoints]
+
+
+class VerifiedDay(TypedDict):
+    state_hash: Optional[str]
+    holders: Optional[int]
+    verified: List[str]
+    failures: Dict[str, str]
+
+
+class VerificationLedger(TypedDict):
+    days: Dict[str, VerifiedDay]
+
+
+class StageManifest(TypedDict, total=False):
+    stage: str
+    day_index: int
+    version: str
+    inputs: Dict[str, Optional[str]]
+    outputs: Dict[str, Optional[str]]
+    # states_and_points: every address of the replayed end state, in replay order
+    end_state_addresses: List[str]
+
+
+class BlockHeader(TypedDict):
+    number: int
+    hash: str
+    parentHash: str
+    timestamp: int
+    logsBloom: str
+
+
+class HeaderCacheFile(TypedDict):
+    first_block: int
+    headers: Dict[str, BlockHeader]
+
+
+class CheckpointUserState(TypedDict):
+    address: str
+    balance: int
+    nft_ids: List[int]
+    last_positive_balance_update_block: int
+    last_negative_balance_update_block: int
+
+
+class StateCheckpoint(TypedDict):
+    day_index: int
+    state_file_hash: Optional[str]
+    user_state: List[CheckpointUserState]
@@ -0,0 +1,131 @@
+"""
+Skip-if-unchanged caching for the per-day stages.
+
+After a stage writes a day's outputs it saves a manifest to
+data/manifests/{stage}/{day_index}.json with the SHA-256 of every input file,
+of every output file and the stage's version, a hash of the source of the
+stage's module and of every module of the package it imports. On the next run
+the day is skipped when the manifest still matches: same version, same input
+hashes and outputs untouched. A changed input (a refetched events file, a
+changed LP snapshot) or changed code invalidates the day, and since a day's
+outputs are inputs of the next day and of the next stage, the recomputed day
+invalidates exactly the downstream days whose inputs actually changed.
+"""
+import hashlib
+import inspect
+import os
+import sys
+from .json_backend import load_json, dump_json
+from .schemas import StageManifest
+
+MANIFESTS_DIR = "data/manifests"
+
+
+def hash_file(path):
+    """SHA-256 of a file's contents, None if it doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_package_name(module):
+    # A module run with `python -m` is __main__, its spec still has the package
+    spec = getattr(module, "__spec__", None)
+    return (spec.name if spec is not None else module.__name__).split(".")[0]
+
+
+def get_imported_modules(module):
+    """
+    `module` and every module of its package it imports, directly or through
+    the modules it imports, including the modules of the functions and
+    objects imported from them. Sorted by source file.
+    """
+    package = get_package_name(module)
+    modules = {}
+    pending = [module]
+    while pending:
+        current = pending.pop()
+        source_file = inspect.getsourcefile(current)
+        if source_file in modules:
+            continue
+        modules[source_file] = current
+        for value in list(vars(current).values()):
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+            if isinstance(name, str) and name.split(".")[0] == package and name in sys.modules:
+                pending.append(sys.modules[name])
+    return [modules[source_file] for source_file in sorted(modules)]
+
+
+def get_code_version(module):
+    """Hash of the source files of the modules a stage's outputs depend on, see `get_imported_modules`"""
+    digest = hashlib.sha256()
+    for imported_module in get_imported_modules(module):
+        with open(inspect.getsourcefile(imported_module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_manifest_path(stage, day_index):
+    return os.path.join(MANIFESTS_DIR, stage, f"{day_index}.json")
+
+
+def load_manifest(stage, day_index):
+    manifest_path = get_manifest_path(stage, day_index)
+    if not os.path.exists(manifest_path):
+        return None
+    return load_json(manifest_path, StageManifest)
+
+
+def is_up_to_date(stage, day_index, version, inputs, outputs):
+    """Whether the day's outputs were computed by this version from the current inputs"""
+    manifest = load_manifest(stage, day_index)
+    if manifest is None:
+        return False
+    if manifest["version"] != version:
+        return False
+    if manifest["inputs"] != {path: hash_file(path) for path in inputs}:
+        return False
+    return all(
+        manifest["outputs"].get(path) is not None and manifest["outputs"][path] == hash_file(path)
+        for path in outputs
+    )
+
+
+def save_manifest(stage, day_index, version, inputs, outputs, **fields):
+    """Record the day's input and output hashes, `fields` are stage specific extras"""
+    os.makedirs(os.path.join(MANIFESTS_DIR, stage), exist_ok=True)
+    dump_json(
+        {
+            "stage": stage,
+            "day_index": day_index,
+            "version": version,
+            "inputs": {path: hash_file(path) for path in inputs},
+            "outputs": {path: hash_file(path) for path in outputs},
+            **fields,
+        },
+        get_manifest_path(stage, day_index),
+    )
+
+
+def events_file_matches(path, contract_address, start_block, end_block, end_block_hash=None):
+    """
+    Whether an events file exists and was fetched for this contract and range.
+    Events files record their own inputs in their metadata, so a day whose
+    boundaries moved, or whose last block was replaced by a reorg, is fetched
+    again while other days are kept. Files without a recorded end block hash
+    are only checked by range.
+    """
+    if not os.path.exists(path):
+        return False
+    metadata = load_json(path).get("metadata", {})
+    recorded_hash = metadata.get("endBlockHash")
+    return (
+        str(metadata.get("contractAddress", "")).lower() == contract_address.lower()
+        and metadata.get("startBlock") == start_block
+        and metadata.get("endBlock") == end_block
+        and (recorded_hash is None or end_block_hash is None or recorded_hash == end_block_hash)
+    )
@@ -0,0 +1,89 @@
+"""
+Checkpoints of the states replay's in-memory state.
+
+State files only keep users with a balance or NFTs, and the replay clears
+`last_*_balance_update_block` of users whose balance went to zero, so a
+state file can't restart the replay exactly where it was. A checkpoint has
+the exact `UserState` map the next day starts from, zero-balance users and
+address order included, saved as JSON to
+data/checkpoints/states/{day_index}.json after every CHECKPOINT_INTERVAL_DAYS
+days (config.json, 7 by default). Both the states stage and the fused states
+and points stage save and resume from them.
+
+A checkpoint also has the SHA-256 of its day's state file, and is only used
+while that file is unchanged: a day recomputed from corrected inputs, by
+any stage, invalidates its checkpoint.
+"""
+import os
+from collections import defaultdict
+from .json_backend import load_json, dump_json
+from .process_event_above_user_state import UserState
+from .schemas import StateCheckpoint
+from .stage_cache import hash_file
+
+CHECKPOINTS_DIR = "data/checkpoints/states"
+
+
+def get_checkpoint_path(day_index):
+    return os.path.join(CHECKPOINTS_DIR, f"{day_index}.json")
+
+
+def save_checkpoint(day_index, user_state, state_file):
+    """Save the state the day after `day_index` starts from"""
+    os.makedirs(CHECKPOINTS_DIR, exist_ok=True)
+    path = get_checkpoint_path(day_index)
+    temporary_path = f"{path}.tmp"
+    dump_json(
+        {
+            "day_index": day_index,
+            "state_file_hash": hash_file(state_file),
+            "user_state": [
+                {
+                    "address": address,
+                    "balance": state.balance,
+                    # In the sets' order, so the rebuilt sets are the ones `deepcopy` would make
+                    "nft_ids": list(state.nft_ids),
+                    "last_positive_balance_update_block": state.last_positive_balance_update_block,
+                    "last_negative_balance_update_block": state.last_negative_balance_update_block,
+                }
+                for address, state in user_state.items()
+            ],
+        },
+        temporary_path,
+    )
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(day_index, state_file):
+    """The checkpointed state after `day_index`, None if there's none or its state file changed"""
+    path = get_checkpoint_path(day_index)
+    if not os.path.exists(path):
+        return None
+    checkpoint = load_json(path, StateCheckpoint)
+    if checkpoint["day_index"] != day_index or checkpoint["state_file_hash"] != hash_file(state_file):
+        return None
+    user_state = defaultdict(UserState)
+    for entry in checkpoint["user_state"]:
+        state = UserState(entry["balance"], set(entry["nft_ids"]))
+        state.last_positive_balance_update_block = entry["last_positive_balance_update_block"]
+        state.last_negative_balance_update_block = entry["last_negative_balance_update_block"]
+        user_state[entry["address"]] = state
+    return user_state
+
+
+def get_checkpoint_days():
+    if not os.path.isdir(CHECKPOINTS_DIR):
+        return []
+    names = (os.path.splitext(name) for name in os.listdir(CHECKPOINTS_DIR))
+    return sorted(int(stem) for stem, extension in names if extension == ".json" and stem.isdigit())
+
+
+def find_checkpoint(before_day, get_state_file):
+    """(day_index, user_state) of the latest valid checkpoint before `before_day`, (None, None) without one"""
+    for day_index in reversed(get_checkpoint_days()):
+        if day_index >= before_day:
+            continue
+        user_state = load_checkpoint(day_index, get_state_file(day_index))
+        if user_state is not None:
+            return day_index, user_state
+    return None, None
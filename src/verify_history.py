@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Sampled, budgeted verification of the whole history.
+
+The tests check a few hard-coded days, and reconcile_states.py checks every
+holder of every day. This checks a sample of (day, address) pairs per run
+under a fixed budget, and remembers what it verified, so repeated runs cover
+the whole history at a fixed cost per run.
+
+- Days are visited least covered first, one state and points file at a time.
+- A day's holders are split into STRATA_AMOUNT strata by balance, and
+  addresses are drawn from each stratum in turn, so small and large holders
+  are both checked.
+- Each sampled address has its pilot vault balance, NFT balance and the
+  owner of each of its NFTs checked on-chain at the day's end block, packed
+  in Multicall3 calls like in reconcile_states.py. An address with no events
+  that day must also have the points of holding its end state for every
+  block of the day.
+- Every check costs RPC sub-calls; a run stops at `max_calls` of them or
+  after `max_seconds`.
+
+Verified pairs are recorded in data/verification/ledger.json with the hash
+of the state file they were checked against. A recomputed day starts over,
+and once every pair is verified a new pass starts. Failed pairs aren't
+recorded as verified, so they are checked again on the next run.
+
+    python3 -m src.verify_history --max-calls 2000 --max-seconds 600
+"""
+import argparse
+import os
+import random
+import time
+from collections import defaultdict
+from web3 import Web3
+from . import daily_points_v2
+from .find_deployment_blocks import load_contract_addresses
+from .reconcile_states import aggregate_calls, decode_result, encode_call, get_state_files, has_multicall
+from .utils.json_backend import load_json, dump_json
+from .utils.read_combined_sorted_events import read_combined_sorted_events
+from .utils.schemas import DailyStateFile, PointsFile, VerificationLedger
+from .utils.stage_cache import hash_file
+
+LEDGER_FILE = "data/verification/ledger.json"
+MAX_CALLS = 2000
+MAX_SECONDS = 600
+STRATA_AMOUNT = 4
+
+
+def load_ledger():
+    if not os.path.exists(LEDGER_FILE):
+        return {"days": {}}
+    return load_json(LEDGER_FILE, VerificationLedger)
+
+
+def save_ledger(ledger):
+    os.makedirs(os.path.dirname(LEDGER_FILE), exist_ok=True)
+    dump_json(ledger, LEDGER_FILE)
+
+
+def get_day_index(state_file):
+    return int(os.path.splitext(os.path.basename(state_file))[0])
+
+
+def get_day_entry(ledger, day_index, state_hash):
+    """The ledger entry of a day, reset if the day's state file changed since it was verified"""
+    entry = ledger["days"].get(str(day_index))
+    if entry is None or entry["state_hash"] != state_hash:
+        entry = {"state_hash": state_hash, "holders": None, "verified": [], "failures": {}}
+        ledger["days"][str(day_index)] = entry
+    return entry
+
+
+def get_coverage(entry):
+    if not entry["holders"]:
+        return 0.0 if entry["holders"] is None else 1.0
+    return len(entry["verified"]) / entry["holders"]
+
+
+def get_holders(state):
+    """End state holders with their pilot vault balance and NFT ids"""
+    holders = defaultdict(lambda: (0, []))
+    for address, holder_state in state["pilot_vault"]["end_state"].items():
+        holders[address.lower()] = (holder_state["balance"], holders[address.lower()][1])
+    for address, token_ids in state["nft"]["end_state"].items():
+        if token_ids:
+            holders[address.lower()] = (holders[address.lower()][0], token_ids)
+    return dict(holders)
+
+
+def get_check_cost(holder):
+    """Sub-calls of an address: pilot vault and NFT balanceOf and one ownerOf per NFT"""
+    return 2 + len(holder[1])
+
+
+def get_strata(holders):
+    """Addresses split in up to STRATA_AMOUNT groups of similar balance"""
+    addresses = sorted(holders, key=lambda address: (holders[address][0], address))
+    size = -(-len(addresses) // STRATA_AMOUNT)
+    return [addresses[i:i + size] for i in range(0, len(addresses), size)] if addresses else []
+
+
+def sample_addresses(holders, verified, budget, rng):
+    """Unverified addresses drawn from each stratum in turn until `budget` sub-calls are used"""
+    strata = [[address for address in stratum if address not in verified] for stratum in get_strata(holders)]
+    for stratum in strata:
+        rng.shuffle(stratum)
+    sample = []
+    while budget > 0 and any(strata):
+        for stratum in strata:
+            if not stratum:
+                continue
+            address = stratum.pop()
+            cost = get_check_cost(holders[address])
+            if cost > budget:
+                continue
+            sample.append(address)
+            budget -= cost
+    return sample
+
+
+def get_onchain_holdings(addresses, sample, holders, block_number):
+    """
+    Pilot vault balances, NFT balances and owners of the sample's NFTs at `block_number`,
+    None in place of a value whose call failed
+    """
+    pilot_vault = Web3.to_checksum_address(addresses["pilot_vault"])
+    nft = Web3.to_checksum_address(addresses["nft"])
+    calls = []
+    for address in sample:
+        owner = Web3.to_checksum_address(address)
+        calls.append((pilot_vault, encode_call("balanceOf(address)", ["address"], [owner])))
+        calls.append((nft, encode_call("balanceOf(address)", ["address"], [owner])))
+        calls += [(nft, encode_call("ownerOf(uint256)", ["uint256"], [token_id])) for token_id in holders[address][1]]
+    results = iter(aggregate_calls(calls, block_number, has_multicall(block_number)))
+
+    holdings = {}
+    for address in sample:
+        balance = decode_result("uint256", next(results))
+        nft_balance = decode_result("uint256", next(results))
+        owners = {}
+        for token_id in holders[address][1]:
+            owner = decode_result("address", next(results))
+            owners[token_id] = owner.lower() if owner is not None else None
+        holdings[address] = (balance, nft_balance, owners)
+    return holdings
+
+
+def get_addresses_with_events(day_index):
+    addresses = set()
+    for events in read_combined_sorted_events(day_index).values():
+        for event in events:
+            addresses.add(event["args"]["from"].lower())
+            addresses.add(event["args"]["to"].lower())
+    return addresses
+
+
+def get_quiet_points(state, user_state, address):
+    """Points of holding the end state for every block of the day after the LP snapshot's start block"""
+    points = daily_points_v2.give_points_for_user_state({address: user_state[address]}, defaultdict(int))
+    first_block_with_points = max(state["start_block"], daily_points_v2.lp_balances_snapshot_start_block + 1)
+    return points[address] * max(0, state["end_block"] - first_block_with_points + 1)
+
+
+def check_address(address, holder, holding, state, user_state, points, addresses_with_events):
+    """Reason the address doesn't check out, None if it does"""
+    balance, token_ids = holder
+    onchain_balance, onchain_nft_balance, owners = holding
+    if onchain_balance is None:
+        return "pilot vault balance: balanceOf call failed on-chain"
+    if balance != onchain_balance:
+        return f"pilot vault balance: stored {balance}, on-chain {onchain_balance}"
+    if onchain_nft_balance is None:
+        return "NFT balance: balanceOf call failed on-chain"
+    if len(token_ids) != onchain_nft_balance:
+        return f"NFT balance: stored {len(token_ids)}, on-chain {onchain_nft_balance}"
+    for token_id, owner in owners.items():
+        if owner != address:
+            return f"NFT {token_id} is owned by {owner} on-chain"
+    if address not in addresses_with_events:
+        expected_points = get_quiet_points(state, user_state, address)
+        if points.get(address, 0) != expected_points:
+            return f"points of a day without events: stored {points.get(address, 0)}, expected {expected_points}"
+    return None
+
+
+def verify_day(state_file, entry, budget, addresses, rng):
+    """Verify a sample of the day's addresses, returns the sub-calls used"""
+    day_index = get_day_index(state_file)
+    state = load_json(state_file, DailyStateFile)
+    holders = get_holders(state)
+    entry["holders"] = len(holders)
+    verified = set(entry["verified"])
+    sample = sample_addresses(holders, verified, budget, rng)
+    if not sample:
+        return 0
+
+    points = load_json(f"data/points/{day_index}.json", PointsFile)["points"]
+    holdings = get_onchain_holdings(addresses, sample, holders, state["end_block"])
+    addresses_with_events = get_addresses_with_events(day_index)
+    user_state = daily_points_v2.get_user_state_from_state_data(state, "end_state")
+    failures = 0
+    for address in sample:
+        failure = check_address(
+            address, holders[address], holdings[address], state, user_state, points, addresses_with_events
+        )
+        if failure is None:
+            verified.add(address)
+            entry["failures"].pop(address, None)
+        else:
+            entry["failures"][address] = failure
+            failures += 1
+            print(f"  Day {day_index} {address}: {failure}")
+    entry["verified"] = sorted(verified)
+    print(
+        f"Day {day_index}: verified {len(sample) - failures} of {len(sample)} sampled addresses, "
+        f"{len(verified)}/{len(holders)} covered"
+    )
+    return sum(get_check_cost(holders[address]) for address in sample)
+
+
+def verify_history(max_calls=MAX_CALLS, max_seconds=MAX_SECONDS, seed=None):
+    """Verify sampled (day, address) pairs within the budget, returns the failures by day"""
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    daily_points_v2.initialize_global_variables()
+    addresses = load_contract_addresses()
+    ledger = load_ledger()
+
+    days = []
+    for state_file in get_state_files():
+        entry = get_day_entry(ledger, get_day_index(state_file), hash_file(state_file))
+        days.append((state_file, entry))
+    if days and all(get_coverage(entry) >= 1.0 for _, entry in days):
+        print("Every day is fully verified, starting a new pass")
+        for _, entry in days:
+            entry["verified"] = []
+    # Least covered days first, ties in random order
+    days = [(state_file, entry) for state_file, entry in days if get_coverage(entry) < 1.0]
+    rng.shuffle(days)
+    days.sort(key=lambda day: get_coverage(day[1]))
+
+    calls_left = max_calls
+    for i, (state_file, entry) in enumerate(days):
+        if calls_left <= 0 or time.perf_counter() - started > max_seconds:
+            break
+        day_budget = max(1, calls_left // (len(days) - i))
+        calls_left -= verify_day(state_file, entry, day_budget, addresses, rng)
+        save_ledger(ledger)
+
+    save_ledger(ledger)
+    failures = {int(day_index): entry["failures"] for day_index, entry in ledger["days"].items() if entry["failures"]}
+    print(f"\nUsed {max_calls - calls_left} of {max_calls} calls in {time.perf_counter() - started:.1f}s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify a sample of (day, address) pairs of the whole history")
+    parser.add_argument("--max-calls", type=int, default=MAX_CALLS, help="eth_call sub-calls to spend")
+    parser.add_argument("--max-seconds", type=float, default=MAX_SECONDS, help="Time to spend")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the sampling")
+    args = parser.parse_args()
+
+    failures = verify_history(args.max_calls, args.max_seconds, args.seed)
+    if failures:
+        raise ValueError(f"Verification failed for days {sorted(failures)}")
+
+
+if __name__ == "__main__":
+    main()
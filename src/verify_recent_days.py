@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Reorg check for the most recently saved days.
+
+Days are only saved once their last block is finalized (see
+find_daily_blocks.py), but files written before that rule, or fetched from a
+provider that was on a fork, would otherwise be kept forever. For the last
+REORG_CHECK_DAYS days (config.json) this compares the stored block hashes
+with the hashes a provider quorum returns now:
+
+- the boundary blocks in data/days_blocks,
+- the block of every event in data/events/nft and data/events/pilot_vault,
+  and the end block the events file was read up to.
+
+A day with a hash that is no longer on the chain has its boundary and events
+files, and the cached headers of its blocks (utils/header_cache.py), removed,
+so the next run of the fetching scripts writes them again.
+The stage manifests (utils/stage_cache.py) then recompute that day's states
+and points, and the days after it whose inputs changed.
+
+    python3 -m src.verify_recent_days
+"""
+import os
+from .nft_events import get_day_block_files
+from .utils.aggregated_w3_request import get_w3_instances, make_aggregated_call, STATE_READ_POLICY
+from .utils.block_verification import normalize_hash
+from .utils.config import get_reorg_check_days
+from .utils.header_cache import header_cache
+from .utils.event_repository import get_nft_events_file, get_transfer_events_file
+from .utils.json_backend import load_json
+from .utils.schemas import DayBlocks, EventsFile
+
+
+def get_canonical_block_hash(block_number, cache):
+    if block_number not in cache:
+        block = make_aggregated_call(get_w3_instances(), lambda w3: w3.eth.get_block(block_number), STATE_READ_POLICY)
+        cache[block_number] = normalize_hash(block["hash"])
+    return cache[block_number]
+
+
+def get_stored_block_hashes(day_blocks_file, events_files):
+    """(block number, hash) pairs a day's files were written from"""
+    day_blocks = load_json(day_blocks_file, DayBlocks)
+    stored = set()
+    for block in (day_blocks["last_block_of_day"], day_blocks["first_block_of_next_day"]):
+        if block is not None:
+            stored.add((block["number"], normalize_hash(block["hash"])))
+    for events_file in events_files:
+        if not os.path.exists(events_file):
+            continue
+        events_data = load_json(events_file, EventsFile)
+        metadata = events_data.get("metadata", {})
+        if metadata.get("endBlockHash") is not None:
+            stored.add((metadata["endBlock"], normalize_hash(metadata["endBlockHash"])))
+        # Files fetched before block hashes were recorded only have their boundaries checked
+        for event in events_data.get("events", []):
+            if "blockHash" in event:
+                stored.add((event["blockNumber"], normalize_hash(event["blockHash"])))
+    return sorted(stored)
+
+
+def find_stale_block(day_blocks_file, events_files, cache):
+    """First block of a day's files whose hash isn't on the chain anymore, None if all are"""
+    for block_number, block_hash in get_stored_block_hashes(day_blocks_file, events_files):
+        if block_hash != get_canonical_block_hash(block_number, cache):
+            return block_number
+    return None
+
+
+def get_day_block_range(day_files, position, events_files):
+    """Blocks [first, last] of a day's files, from after the previous day to the first block of the next one"""
+    day_blocks = load_json(day_files[position][1], DayBlocks)
+    last_block = (day_blocks["first_block_of_next_day"] or day_blocks["last_block_of_day"])["number"]
+    if position > 0:
+        return load_json(day_files[position - 1][1], DayBlocks)["last_block_of_day"]["number"] + 1, last_block
+    start_blocks = [
+        load_json(events_file, EventsFile)["metadata"]["startBlock"]
+        for events_file in events_files
+        if os.path.exists(events_file)
+    ]
+    return min(start_blocks, default=day_blocks["last_block_of_day"]["number"]), last_block
+
+
+def verify_recent_days(days_amount=None):
+    """Remove the files of recent days that don't match the chain, returns their indexes"""
+    days_amount = get_reorg_check_days() if days_amount is None else days_amount
+    if days_amount <= 0 or not os.path.exists("data/days_blocks"):
+        return []
+
+    cache = {}
+    invalidated_days = []
+    day_files = get_day_block_files()
+    for position in range(max(0, len(day_files) - days_amount), len(day_files)):
+        day_index, day_blocks_file = day_files[position]
+        events_files = [get_nft_events_file(day_index), get_transfer_events_file(day_index)]
+        stale_block = find_stale_block(day_blocks_file, events_files, cache)
+        if stale_block is None:
+            print(f"Day {day_index}: all block hashes match the chain")
+            continue
+        print(f"Day {day_index}: block {stale_block} was reorged, removing the day's files")
+        header_cache.remove_blocks(*get_day_block_range(day_files, position, events_files))
+        for path in (day_blocks_file, *events_files):
+            if os.path.exists(path):
+                os.remove(path)
+        invalidated_days.append(day_index)
+    return invalidated_days
+
+
+def main():
+    print("Checking recent days for reorgs...")
+    invalidated_days = verify_recent_days()
+    if invalidated_days:
+        print(f"Removed files of days {invalidated_days}, they will be fetched again")
+
+
+if __name__ == "__main__":
+    main()
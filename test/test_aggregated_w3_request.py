@@ -0,0 +1,116 @@
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils import aggregated_w3_request
+from src.utils.aggregated_w3_request import (
+    ProviderHealth,
+    ProviderManager,
+    QuorumPolicy,
+    make_aggregated_call,
+    verified_single_provider_policy,
+)
+
+
+def fake_instance(endpoint, result=None, error=None):
+    provider = SimpleNamespace(endpoint_uri=endpoint)
+    return SimpleNamespace(provider=provider, result=result, error=error, calls=0)
+
+
+def call(instance):
+    instance.calls += 1
+    if instance.error is not None:
+        raise instance.error
+    return instance.result
+
+
+@pytest.fixture(autouse=True)
+def provider_manager(monkeypatch):
+    manager = ProviderManager(seed=0)
+    monkeypatch.setattr(aggregated_w3_request, "provider_manager", manager)
+    return manager
+
+
+class TestProviderHealth:
+    def test_rate_limit_ejects_with_backoff(self):
+        """Test that a 429 ejects the provider and repeated ejections back off exponentially"""
+        health = ProviderHealth("a")
+        health.record(0.1, Exception("429 Client Error: Too Many Requests"), now=100.0)
+        assert not health.is_available(now=100.0)
+        assert health.ejected_until == 100.0 + aggregated_w3_request.BASE_EJECTION_SECONDS
+        health.record(0.1, Exception("429 Client Error: Too Many Requests"), now=200.0)
+        assert health.ejected_until == 200.0 + 2 * aggregated_w3_request.BASE_EJECTION_SECONDS
+
+    def test_consecutive_transport_failures_eject(self):
+        """Test that only repeated provider failures eject a provider"""
+        health = ProviderHealth("a")
+        for _ in range(aggregated_w3_request.EJECT_AFTER_CONSECUTIVE_FAILURES - 1):
+            health.record(0.1, ConnectionError("reset"), now=0.0)
+        assert health.is_available(now=0.0)
+        health.record(0.1, ConnectionError("reset"), now=0.0)
+        assert not health.is_available(now=0.0)
+
+    def test_rpc_errors_do_not_count_against_provider(self):
+        """Test that request-level JSON-RPC errors don't hurt provider health"""
+        health = ProviderHealth("a")
+        for _ in range(10):
+            health.record(0.1, ValueError("query returned more than 10000 results"), now=0.0)
+        assert health.is_available(now=0.0)
+        assert health.error_rate == 0
+
+
+class TestMakeAggregatedCall:
+    def test_majority_stops_after_agreeing_providers(self):
+        """Test that a third provider is not called when the first two agree"""
+        instances = [fake_instance(endpoint, result=7) for endpoint in "abc"]
+        assert make_aggregated_call(instances, call) == 7
+        assert sum(instance.calls for instance in instances) == 2
+
+    def test_disagreement_escalates_to_next_provider(self):
+        """Test that a failed provider is replaced by the next one, whatever the routing order"""
+        instances = [
+            fake_instance("a", error=ConnectionError("down")),
+            fake_instance("b", result=7),
+            fake_instance("c", result=7),
+        ]
+        assert make_aggregated_call(instances, call) == 7
+        assert instances[1].calls == 1 and instances[2].calls == 1
+
+    def test_no_quorum_raises(self):
+        instances = [fake_instance(endpoint, result=i) for i, endpoint in enumerate("abc")]
+        with pytest.raises(ValueError, match="No result found"):
+            make_aggregated_call(instances, call)
+
+    def test_verified_single_provider(self):
+        """Test that a verified result from one provider is accepted as is"""
+        instances = [fake_instance(endpoint, result=7) for endpoint in "abc"]
+        assert make_aggregated_call(instances, call, verified_single_provider_policy(lambda r: r == 7)) == 7
+        assert sum(instance.calls for instance in instances) == 1
+
+    def test_failed_verification_escalates_to_majority(self):
+        """Test that a majority of the other providers is asked when the first result fails verification"""
+        instances = [fake_instance(endpoint, result=7) for endpoint in "abc"]
+        assert make_aggregated_call(instances, call, verified_single_provider_policy(lambda r: False)) == 7
+        assert sum(instance.calls for instance in instances) == 3
+
+    def test_failed_verification_is_not_a_vote(self):
+        """Test that the result that failed verification doesn't help the same result to a majority"""
+        instances = [fake_instance(endpoint) for endpoint in "abc"]
+        answers = iter([8, 8, 7])
+        with pytest.raises(ValueError, match="failed verification: 1"):
+            make_aggregated_call(
+                instances, lambda instance: next(answers), verified_single_provider_policy(lambda r: False)
+            )
+
+    def test_ejected_provider_is_called_last(self, provider_manager):
+        """Test that routing skips ejected providers while others are available"""
+        instances = [fake_instance(endpoint, result=7) for endpoint in "abc"]
+        provider_manager.get_health("a").ejected_until = time.monotonic() + 60
+        make_aggregated_call(instances, call, QuorumPolicy(required=2))
+        assert instances[0].calls == 0
+        assert provider_manager.rank(instances)[-1] is instances[0]
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+from web3 import AsyncWeb3
+from web3.providers.async_base import AsyncBaseProvider
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.async_ingestion import run_ingestion
+from src.utils import aggregated_w3_request
+from src.utils.aggregated_w3_request import ProviderManager
+from src.utils.async_w3_request import AsyncEndpoint
+from src.utils.config import EndpointConfig
+from src.utils.json_backend import load_json
+from benchmarks.synthetic_chain import SyntheticChain, SyntheticChainProvider
+from test.utils.synthetic_pipeline import ROOT, ingest, prepare_workdir
+
+
+class AsyncSyntheticChainProvider(AsyncBaseProvider):
+    def __init__(self, chain, endpoint_uri):
+        super().__init__()
+        self.endpoint_uri = endpoint_uri
+        self.sync_provider = SyntheticChainProvider(chain, endpoint_uri)
+        self.calls = 0
+
+    async def make_request(self, method, params):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.sync_provider.make_request(method, params)
+
+    async def is_connected(self, show_traceback=False):
+        return True
+
+
+@pytest.fixture(autouse=True)
+def provider_manager(monkeypatch):
+    monkeypatch.setattr(aggregated_w3_request, "provider_manager", ProviderManager(seed=0))
+
+
+def read_outputs(data_dir):
+    """Every file under data/, without the export timestamps"""
+    outputs = {}
+    for path in sorted(Path(data_dir).rglob("*.json")):
+        data = load_json(str(path))
+        data.get("metadata", {}).pop("exportedAt", None)
+        outputs[str(path.relative_to(data_dir))] = data
+    return outputs
+
+
+class TestAsyncIngestion:
+    def test_writes_same_data_as_sync_stages(self, tmp_path, monkeypatch):
+        """Test that the async pipeline produces the files of the four sync ingestion stages"""
+        chain = SyntheticChain(days_amount=2, holders_amount=10, transfers_per_day=30, nft_transfers_per_day=5)
+        prepare_workdir(tmp_path / "sync", chain, monkeypatch, lp_balances_snapshot=None)
+        ingest()
+
+        os.makedirs(tmp_path / "async")
+        shutil.copy(ROOT / "config.json", tmp_path / "async" / "config.json")
+        monkeypatch.chdir(tmp_path / "async")
+        providers = [AsyncSyntheticChainProvider(chain, f"synthetic://async-{i}") for i in range(3)]
+        endpoints = [
+            AsyncEndpoint(EndpointConfig(provider.endpoint_uri, max_concurrency=2, requests_per_second=0), AsyncWeb3(provider))
+            for provider in providers
+        ]
+        asyncio.run(run_ingestion(endpoints))
+
+        sync_outputs = read_outputs(tmp_path / "sync" / "data")
+        async_outputs = read_outputs(tmp_path / "async" / "data")
+        assert len(async_outputs) == 1 + 3 * 3  # deployments, then days_blocks and both events per day
+        assert async_outputs == sync_outputs
+
+    def test_concurrency_is_bounded_per_provider(self, tmp_path, monkeypatch):
+        chain = SyntheticChain(days_amount=1, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=2)
+        shutil.copy(ROOT / "config.json", tmp_path / "config.json")
+        monkeypatch.chdir(tmp_path)
+
+        in_flight = {"current": 0, "max": 0}
+
+        class TrackingProvider(AsyncSyntheticChainProvider):
+            async def make_request(self, method, params):
+                in_flight["current"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["current"])
+                try:
+                    await asyncio.sleep(0.001)
+                    return self.sync_provider.make_request(method, params)
+                finally:
+                    in_flight["current"] -= 1
+
+        provider = TrackingProvider(chain, "synthetic://only")
+        endpoint = AsyncEndpoint(EndpointConfig(provider.endpoint_uri, max_concurrency=2, requests_per_second=0), AsyncWeb3(provider))
+        asyncio.run(run_ingestion([endpoint]))
+        assert in_flight["max"] == 2
@@ -0,0 +1,164 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils import aggregated_w3_request
+from src.utils.aggregated_w3_request import ProviderManager
+from src.utils.block_verification import (
+    get_block_verified,
+    get_bloom_mask,
+    get_logs_verified,
+    load_trusted_block_hashes,
+    normalize_hash,
+)
+from src.utils.json_backend import dump_json
+
+CONTRACT_ADDRESS = "0x" + "ab" * 20
+CANONICAL_HASH = "0x" + "11" * 32
+FORK_HASH = "0x" + "22" * 32
+
+
+class FakeNode:
+    """A provider serving one version of the chain, counting the calls it gets"""
+
+    def __init__(self, endpoint, block_hash, logs):
+        self.calls = 0
+        self.block_hash = block_hash
+        self.logs = logs
+        self.w3 = SimpleNamespace(
+            provider=SimpleNamespace(endpoint_uri=endpoint),
+            eth=SimpleNamespace(get_block=self.get_block),
+        )
+        self.contract = SimpleNamespace(address=CONTRACT_ADDRESS, w3=self.w3)
+
+    def get_block(self, block_number):
+        self.calls += 1
+        return {"number": block_number, "hash": bytes.fromhex(self.block_hash[2:])}
+
+    def get_logs(self, contract, from_block, to_block):
+        self.calls += 1
+        return [log for log in self.logs if from_block <= log["blockNumber"] <= to_block]
+
+
+def make_log(block_number, log_index, block_hash="0x" + "33" * 32):
+    return {
+        "address": CONTRACT_ADDRESS,
+        "blockNumber": block_number,
+        "blockHash": block_hash,
+        "logIndex": log_index,
+    }
+
+
+def make_headers(from_block, to_block, logs):
+    """Headers whose blooms match the contract's Transfer logs exactly in the blocks of `logs`"""
+    blocks_with_logs = {log["blockNumber"] for log in logs}
+    return {
+        block_number: {
+            "hash": "0x" + "33" * 32,
+            "logsBloom": "0x%0512x" % (get_bloom_mask(CONTRACT_ADDRESS) if block_number in blocks_with_logs else 0),
+        }
+        for block_number in range(from_block, to_block + 1)
+    }
+
+
+def get_logs(contract, from_block, to_block):
+    return contract.node.get_logs(contract, from_block, to_block)
+
+
+def make_nodes(hashes, logs=()):
+    nodes = [FakeNode(f"http://node-{i}", block_hash, list(logs)) for i, block_hash in enumerate(hashes)]
+    for node in nodes:
+        node.contract.node = node
+    return nodes
+
+
+@pytest.fixture(autouse=True)
+def provider_manager(monkeypatch):
+    manager = ProviderManager(seed=0)
+    monkeypatch.setattr(aggregated_w3_request, "provider_manager", manager)
+    return manager
+
+
+class TestTrustedBlockHashes:
+    def test_load_from_days_blocks(self, tmp_path):
+        """Test that both boundary blocks of every day are trusted, with normalized hashes"""
+        dump_json(
+            {
+                "day": "2025-01-01",
+                "last_block_of_day": {"number": 10, "timestamp": 1, "utc_datetime": "", "hash": "AA" * 32},
+                "first_block_of_next_day": {"number": 11, "timestamp": 2, "utc_datetime": "", "hash": "0x" + "bb" * 32},
+                "is_final_day": False,
+            },
+            str(tmp_path / "0_2025-01-01.json"),
+        )
+        assert load_trusted_block_hashes(str(tmp_path)) == {10: "0x" + "aa" * 32, 11: "0x" + "bb" * 32}
+
+    def test_normalize_hash(self):
+        assert normalize_hash(bytes.fromhex("aa" * 32)) == "0x" + "aa" * 32
+        assert normalize_hash("0xAA") == normalize_hash("aa") == "0xaa"
+
+
+class TestGetBlockVerified:
+    def test_trusted_block_uses_one_provider(self):
+        nodes = make_nodes([CANONICAL_HASH] * 3)
+        block = get_block_verified([node.w3 for node in nodes], 100, {100: CANONICAL_HASH})
+        assert normalize_hash(block["hash"]) == CANONICAL_HASH
+        assert sum(node.calls for node in nodes) == 1
+
+    def test_mismatch_escalates_to_quorum(self):
+        """Test that a provider on a fork is outvoted instead of trusted"""
+        nodes = make_nodes([FORK_HASH, CANONICAL_HASH, CANONICAL_HASH])
+        trusted = {100: CANONICAL_HASH}
+        for _ in range(5):
+            block = get_block_verified([node.w3 for node in nodes], 100, trusted)
+            assert normalize_hash(block["hash"]) == CANONICAL_HASH
+
+    def test_unknown_block_uses_quorum(self):
+        nodes = make_nodes([CANONICAL_HASH] * 3)
+        get_block_verified([node.w3 for node in nodes], 100, {})
+        assert sum(node.calls for node in nodes) == 2
+
+
+class TestGetLogsVerified:
+    def test_range_ending_on_trusted_block_uses_majority(self):
+        """Test that logs are read from a majority even when the range ends on a block with an agreed hash"""
+        logs = [make_log(95, 0), make_log(100, 1, CANONICAL_HASH)]
+        nodes = make_nodes([CANONICAL_HASH] * 3, logs)
+        result = get_logs_verified([node.contract for node in nodes], get_logs, 90, 100, {100: CANONICAL_HASH})
+        assert result == logs
+        assert sum(node.calls for node in nodes) == 2
+
+    def test_provider_missing_logs_is_outvoted(self):
+        """Test that a provider on the canonical chain that leaves logs out is not trusted alone"""
+        nodes = make_nodes([CANONICAL_HASH] * 3, [make_log(95, 0)])
+        nodes[0].get_logs = lambda contract, from_block, to_block: []
+        for _ in range(5):
+            result = get_logs_verified([node.contract for node in nodes], get_logs, 90, 100, {100: CANONICAL_HASH})
+            assert result == [make_log(95, 0)]
+
+    def test_cached_headers_use_one_provider(self):
+        logs = [make_log(95, 0), make_log(97, 1)]
+        nodes = make_nodes([CANONICAL_HASH] * 3, logs)
+        headers = make_headers(90, 100, logs)
+        result = get_logs_verified([node.contract for node in nodes], get_logs, 90, 100, {}, headers)
+        assert result == logs
+        assert sum(node.calls for node in nodes) == 1
+
+    def test_logs_missing_from_matching_block_escalate(self):
+        """Test that a provider leaving out the logs of a block whose bloom matches is outvoted"""
+        logs = [make_log(95, 0), make_log(97, 1)]
+        nodes = make_nodes([CANONICAL_HASH] * 3, logs)
+        nodes[0].get_logs = lambda contract, from_block, to_block: logs[:1]
+        headers = make_headers(90, 100, logs)
+        for _ in range(5):
+            assert get_logs_verified([node.contract for node in nodes], get_logs, 90, 100, {}, headers) == logs
+
+    def test_logs_of_other_fork_raise(self):
+        """Test that logs a majority returns from blocks that don't match the agreed hashes are rejected"""
+        nodes = make_nodes([FORK_HASH] * 3, [make_log(100, 0, FORK_HASH)])
+        with pytest.raises(ValueError, match="agreed hashes"):
+            get_logs_verified([node.contract for node in nodes], get_logs, 90, 100, {100: CANONICAL_HASH})
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.bench_cold_start import ROOT, get_imported_modules
+
+
+def run_python(code):
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+class TestColdStart:
+    @pytest.mark.parametrize(
+        "command",
+        [
+            ["-c", "import src.aggregate_daily_points"],
+            ["-c", "import src.daily_states_and_points"],
+            ["-c", "import src.daily_states_v2, src.daily_points_v2"],
+            ["-c", "import src.copy_last_aggregated_points_file_to_latest_folder"],
+            ["main.py", "--help"],
+        ],
+    )
+    def test_offline_stages_do_not_import_web3(self, command):
+        """Test that offline stages and the command line start without importing web3"""
+        assert "web3" not in get_imported_modules(command)
+
+    def test_providers_are_created_on_first_use(self):
+        """Test that importing the RPC stages creates no providers until they are used"""
+        output = run_python(
+            "import src.find_daily_blocks, src.nft_events, src.pilot_vault_events, src.streaming_pipeline\n"
+            "from src.utils import aggregated_w3_request\n"
+            "print('w3_instances' in vars(aggregated_w3_request))\n"
+            "instances = aggregated_w3_request.get_w3_instances()\n"
+            "print(instances is aggregated_w3_request.w3_instances, len(instances) > 0)"
+        )
+        assert output.splitlines() == ["False", "True True"]
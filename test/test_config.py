@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils.config import (
+    DEFAULT_MAX_LOGS_BLOCK_RANGE,
+    DEFAULT_RPC_ENDPOINTS,
+    EndpointConfig,
+    get_max_logs_block_range,
+    get_rpc_endpoints,
+)
+
+
+class TestRpcEndpoints:
+    def test_endpoints_with_limits(self, monkeypatch):
+        monkeypatch.delenv("POINTS_RPC_ENDPOINTS", raising=False)
+        config = {
+            "RPC_ENDPOINTS": [
+                {"url": "https://a", "max_concurrency": 2, "requests_per_second": 5, "max_logs_block_range": 2000},
+                "https://b",
+            ]
+        }
+        endpoints = get_rpc_endpoints(config)
+        assert endpoints == [EndpointConfig("https://a", 2, 5.0, 2000), EndpointConfig("https://b")]
+        assert get_max_logs_block_range(endpoints) == 2000
+
+    def test_defaults_without_endpoints_in_config(self, monkeypatch):
+        """Test that a config with only contract addresses keeps the built-in endpoints"""
+        monkeypatch.delenv("POINTS_RPC_ENDPOINTS", raising=False)
+        endpoints = get_rpc_endpoints({"NFT_CONTRACT_ADDRESS": "0x0"})
+        assert [endpoint.url for endpoint in endpoints] == DEFAULT_RPC_ENDPOINTS
+        assert get_max_logs_block_range(endpoints) == DEFAULT_MAX_LOGS_BLOCK_RANGE
+
+    def test_environment_override(self, monkeypatch):
+        monkeypatch.setenv("POINTS_RPC_ENDPOINTS", "http://127.0.0.1:8545, http://127.0.0.1:8546")
+        endpoints = get_rpc_endpoints({"RPC_ENDPOINTS": ["https://a"]})
+        assert [endpoint.url for endpoint in endpoints] == ["http://127.0.0.1:8545", "http://127.0.0.1:8546"]
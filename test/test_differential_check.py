@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.daily_states_and_points import process_daily_states_and_points
+from src.differential_check import run_differential_check
+from src.utils import process_event_above_user_state
+from src.utils.event_repository import event_repository
+from test.utils.synthetic_data import write_synthetic_data
+
+
+@pytest.fixture
+def synthetic_data(tmp_path, monkeypatch):
+    data_dir = write_synthetic_data(tmp_path, days_amount=6)
+    monkeypatch.chdir(tmp_path)
+    event_repository.clear()
+    yield data_dir
+    event_repository.clear()
+
+
+class TestDifferentialCheck:
+    def test_pipeline_matches_reference(self, synthetic_data):
+        """Test that the reference recompute agrees with the pipeline on every day, sharded over processes"""
+        process_daily_states_and_points()
+        assert run_differential_check(workers=2) == []
+
+    def test_finds_bug_shared_by_states_and_points(self, synthetic_data, monkeypatch):
+        """Test that a replay bug the end state validation can't see is reported at its first divergence"""
+        process_transfer_event = process_event_above_user_state.process_transfer_event
+
+        def process_transfer_event_without_negative_block(event, user_state):
+            from_addr = event["args"]["from"].lower()
+            last_negative_block = user_state[from_addr].last_negative_balance_update_block
+            user_state = process_transfer_event(event, user_state)
+            user_state[from_addr].last_negative_balance_update_block = last_negative_block
+            return user_state
+
+        monkeypatch.setattr(
+            process_event_above_user_state, "process_transfer_event", process_transfer_event_without_negative_block
+        )
+        process_daily_states_and_points()
+
+        divergences = run_differential_check(workers=1)
+        assert divergences
+        first = divergences[0]
+        assert first.field == "end_state.last_negative_balance_update_block"
+        assert first.stored < first.reference
+        assert all(divergence.day_index >= first.day_index for divergence in divergences)
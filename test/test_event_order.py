@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import nft_events, pilot_vault_events
+from src.utils.json_backend import dump_json
+from src.utils.read_combined_sorted_events import combine_and_sort_events
+from src.utils.read_nft_events_as_block_number_to_array import read_nft_events_as_block_number_to_array
+from src.utils.read_transfer_events_as_block_number_to_array import read_transfer_events_as_block_number_to_array
+
+ADDRESS = "0x0000000000000000000000000000000000000001"
+
+
+def make_log(block_number, transaction_index, log_index, value):
+    return AttributeDict({
+        "blockNumber": block_number,
+        "blockHash": HexBytes(block_number.to_bytes(32, "big")),
+        "transactionHash": HexBytes((block_number * 1000 + transaction_index).to_bytes(32, "big")),
+        "logIndex": log_index,
+        "transactionIndex": transaction_index,
+        "args": AttributeDict({"from": ADDRESS, "to": ADDRESS, "value": value}),
+    })
+
+
+def get_keys(events):
+    return [(event["blockNumber"], event["logIndex"]) for event in events]
+
+
+class TestEventOrder:
+    def test_fetched_events_are_sorted_and_deduplicated(self):
+        """Test that logs from overlapping chunks are saved once, in block and log order"""
+        logs = [make_log(12, 0, 0, 1), make_log(10, 1, 3, 2), make_log(10, 0, 1, 3), make_log(12, 0, 0, 1)]
+        for module in (nft_events, pilot_vault_events):
+            data = module.build_events_file_data(ADDRESS, 10, 12, logs)
+            assert get_keys(data["events"]) == [(10, 1), (10, 3), (12, 0)]
+            assert data["metadata"]["totalEvents"] == 3
+            assert data["metadata"]["isSorted"] is True
+
+    def test_readers_sort_only_unflagged_files(self, tmp_path):
+        events = [
+            {"blockNumber": 10, "transactionHash": "0x01", "logIndex": 5, "args": {}, "transactionIndex": 2},
+            {"blockNumber": 10, "transactionHash": "0x02", "logIndex": 1, "args": {}, "transactionIndex": 0},
+        ]
+        metadata = {"contractAddress": ADDRESS, "eventName": "Transfer", "startBlock": 10, "endBlock": 10,
+                    "totalEvents": 2, "exportedAt": "2025-01-01T00:00:00"}
+        dump_json({"metadata": metadata, "events": events}, str(tmp_path / "old.json"))
+        # A flagged file is trusted as is, even when it isn't actually sorted
+        dump_json({"metadata": {**metadata, "isSorted": True}, "events": events}, str(tmp_path / "flagged.json"))
+
+        for read in (read_nft_events_as_block_number_to_array, read_transfer_events_as_block_number_to_array):
+            assert get_keys(read(str(tmp_path / "old.json"))[10]) == [(10, 1), (10, 5)]
+            assert get_keys(read(str(tmp_path / "flagged.json"))[10]) == [(10, 5), (10, 1)]
+
+    def test_flagged_files_are_merged_in_order(self, tmp_path):
+        """Test that events of two flagged files are merged into the same blocks and order as sorting gives"""
+        metadata = {"contractAddress": ADDRESS, "eventName": "Transfer", "startBlock": 10, "endBlock": 14,
+                    "totalEvents": 3, "exportedAt": "2025-01-01T00:00:00", "isSorted": True}
+        transfer_events = [make_log(10, 0, 0, 1), make_log(12, 0, 1, 2), make_log(12, 2, 4, 3)]
+        nft_events = [make_log(11, 0, 0, 4), make_log(12, 1, 2, 5), make_log(14, 0, 0, 6)]
+        for name, logs in (("transfer", transfer_events), ("nft", nft_events)):
+            events = [
+                {**log, "blockHash": log["blockHash"].hex(), "transactionHash": log["transactionHash"].hex(), "args": {}}
+                for log in logs
+            ]
+            dump_json({"metadata": metadata, "events": events}, str(tmp_path / f"{name}.json"))
+
+        transfer, transfer_is_sorted = read_transfer_events_as_block_number_to_array(
+            str(tmp_path / "transfer.json"), return_is_sorted=True
+        )
+        nft, nft_is_sorted = read_nft_events_as_block_number_to_array(str(tmp_path / "nft.json"), return_is_sorted=True)
+        assert transfer_is_sorted and nft_is_sorted
+
+        merged = combine_and_sort_events(transfer, nft, is_sorted=True)
+        assert merged == combine_and_sort_events(transfer, nft)
+        assert list(merged) == [10, 11, 12, 14]
+        assert get_keys(merged[12]) == [(12, 1), (12, 2), (12, 4)]
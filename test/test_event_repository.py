@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils.event_repository import EventRepository, get_transfer_events_file
+from test.utils.synthetic_data import write_synthetic_data
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    write_synthetic_data(tmp_path, days_amount=4)
+    monkeypatch.chdir(tmp_path)
+    return EventRepository(max_cached_days=2, preload_window=1)
+
+
+class TestEventRepository:
+    def test_repeated_reads_decode_once(self, repository):
+        """Test that a cached day is returned without decoding the files again"""
+        first = repository.get_combined_sorted_events(0)
+        second = repository.get_combined_sorted_events(0)
+        assert first is second
+        assert repository.loads == 1
+        assert repository.hits == 1
+
+    def test_lru_eviction(self, repository):
+        """Test that only the most recently used days are kept"""
+        repository.get_day(0)
+        repository.get_day(1)
+        repository.get_day(0)
+        repository.get_day(2)  # evicts day 1
+        repository.get_day(0)
+        assert repository.loads == 3
+        repository.get_day(1)
+        assert repository.loads == 4
+
+    def test_changed_file_is_decoded_again(self, repository):
+        """Test that a refetched event file is not served from the cache"""
+        repository.get_day(0)
+        path = get_transfer_events_file(0)
+        with open(path) as f:
+            data = json.load(f)
+        data["events"] = []
+        with open(path, "w") as f:
+            json.dump(data, f)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert repository.get_day(0).transfer == {}
+        assert repository.loads == 2
+
+    def test_deleted_file_is_a_cache_miss(self, repository):
+        """Test that a cached day whose file was deleted is evicted and loaded again once it is refetched"""
+        repository.get_day(0)
+        path = get_transfer_events_file(0)
+        data = Path(path).read_bytes()
+        os.remove(path)
+
+        with pytest.raises(FileNotFoundError, match=path):
+            repository.get_day(0)
+        assert 0 not in repository._cache
+        Path(path).write_bytes(data)
+        repository.get_day(0)
+        assert repository.loads == 2
+        assert repository.hits == 0
+
+    def test_iter_days_prefetches_next_day(self, repository):
+        """Test that iterating days preloads the next one in the background"""
+        days = repository.iter_days(range(3))
+        day_index, _ = next(days)
+        assert day_index == 0
+        repository._executor.shutdown(wait=True)
+        assert 1 in repository._cache
+        repository._executor = None
+        assert [day_index for day_index, _ in days] == [1, 2]
+        assert repository.loads == 3
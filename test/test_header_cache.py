@@ -0,0 +1,60 @@
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils import aggregated_w3_request
+from src.utils.aggregated_w3_request import ProviderManager
+from src.utils.header_cache import HeaderCache
+from benchmarks.synthetic_chain import SyntheticChain
+from test.utils.synthetic_pipeline import use_chain
+
+
+@pytest.fixture
+def chain(tmp_path, monkeypatch):
+    chain = SyntheticChain(days_amount=1, holders_amount=5, transfers_per_day=5, nft_transfers_per_day=1)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(aggregated_w3_request, "provider_manager", ProviderManager(seed=0))
+    return chain
+
+
+@pytest.fixture
+def batch_sizes(chain, monkeypatch):
+    """Sizes of the JSON-RPC batches the providers get"""
+    batch_sizes = []
+    use_chain(chain, monkeypatch, "headers", Counter(), batch_sizes)
+    return batch_sizes
+
+
+class TestHeaderCache:
+    def test_scattered_blocks_are_fetched_in_one_batch_and_cached(self, batch_sizes):
+        """Test that missing headers come in one batch per provider and are read from disk afterwards"""
+        block_numbers = [7199, 7200, 100, 14399]
+        headers = HeaderCache().get_headers_of_blocks(aggregated_w3_request.w3_instances, block_numbers)
+        assert sorted(headers) == sorted(block_numbers)
+        assert headers[7200]["parentHash"] == headers[7199]["hash"]
+        majority = aggregated_w3_request.MAJORITY.get_required(len(aggregated_w3_request.w3_instances))
+        assert len(batch_sizes) == majority
+        assert sum(batch_sizes) == len(block_numbers) * majority
+
+        batch_sizes.clear()
+        cached = HeaderCache().get_headers_of_blocks(aggregated_w3_request.w3_instances, block_numbers + [100])
+        assert cached == headers
+        assert len(batch_sizes) == 0
+
+    def test_header_cached_from_fork_is_fetched_again(self, chain, batch_sizes):
+        """Test that cached headers that don't link up to a trusted hash are replaced by the chain's"""
+        HeaderCache().get_headers(aggregated_w3_request.w3_instances, 1000, 1199)
+        chain.reorg(1150)
+
+        batch_sizes.clear()
+        trusted_hashes = {1199: chain.get_block_hash(1199)}
+        headers = HeaderCache().get_headers(aggregated_w3_request.w3_instances, 1000, 1199, trusted_hashes)
+        assert {number: header["hash"] for number, header in headers.items()} == {
+            number: chain.get_block_hash(number) for number in range(1000, 1200)
+        }
+        assert batch_sizes
+        assert HeaderCache().get_cached(1150)["hash"] == chain.get_block_hash(1150)
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils import aggregated_w3_request, json_backend
+from src.utils.event_repository import event_repository
+from src.utils.instrumentation import LATEST_REPORT_FILE, Instrumentation
+from src.utils.json_backend import load_json, dump_json
+from benchmarks.synthetic_chain import SyntheticChain
+from test.utils.synthetic_pipeline import ingest, prepare_workdir, use_chain
+
+
+@pytest.fixture
+def instrumentation(tmp_path, monkeypatch):
+    """A run's own instrumentation, so the tests leave the one of a running pipeline alone"""
+    monkeypatch.chdir(tmp_path)
+    instrumentation = Instrumentation()
+    monkeypatch.setattr(aggregated_w3_request, "count", instrumentation.count)
+    monkeypatch.setattr(json_backend, "count", instrumentation.count)
+    was_tracing = tracemalloc.is_tracing()
+    yield instrumentation
+    if tracemalloc.is_tracing() and not was_tracing:
+        tracemalloc.stop()
+
+
+def get_counters(instrumentation, name):
+    return {
+        tuple(sorted(counter["labels"].items())): counter["value"]
+        for counter in instrumentation.get_report()["counters"]
+        if counter["name"] == name
+    }
+
+
+class TestInstrumentation:
+    def test_spans_nest_and_record_bytes(self, instrumentation):
+        """Test that spans record their path, duration and the bytes read and written inside them"""
+        with instrumentation.span("stage"):
+            for day_index in range(2):
+                with instrumentation.span("day", day_index=day_index):
+                    dump_json({"day": day_index}, f"{day_index}.json")
+                    load_json(f"{day_index}.json")
+                    time.sleep(0.01)
+
+        report = instrumentation.get_report()
+        stage, day_0, day_1 = report["spans"]
+        assert [span["path"] for span in report["spans"]] == ["stage", "stage/day", "stage/day"]
+        assert [day_0["attributes"], day_1["attributes"]] == [{"day_index": 0}, {"day_index": 1}]
+        file_size = os.path.getsize("0.json")
+        assert day_0["bytes_written"] == day_0["bytes_read"] == file_size
+        assert stage["bytes_written"] == 2 * file_size
+        assert stage["duration_seconds"] >= day_0["duration_seconds"] + day_1["duration_seconds"] >= 0.02
+        assert report["summary"]["stage/day"]["count"] == 2
+
+    def test_counts_rpc_requests_by_provider_and_method(self, instrumentation, tmp_path, monkeypatch):
+        """Test that the middleware counts every request the providers get, batch items included"""
+        chain = SyntheticChain(days_amount=2, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=2)
+        prepare_workdir(tmp_path, chain, monkeypatch, lp_balances_snapshot=None)
+        calls = Counter()
+        use_chain(chain, monkeypatch, "counted", calls)
+
+        with instrumentation.span("ingestion"):
+            ingest()
+        event_repository.clear()
+
+        counted = get_counters(instrumentation, "rpc_requests")
+        assert counted == {
+            (("method", method), ("provider", provider)): amount for (provider, method), amount in calls.items()
+        }
+        logs_calls = {provider: amount for (provider, method), amount in calls.items() if method == "eth_getLogs"}
+        assert logs_calls
+        assert {
+            provider: counted[(("method", "eth_getLogs"), ("provider", provider))] for provider in logs_calls
+        } == logs_calls
+        provider_calls = get_counters(instrumentation, "provider_calls")
+        assert set(provider_calls) <= {(("provider", provider),) for provider, _ in calls}
+        ingestion = instrumentation.get_report()["spans"][0]
+        assert ingestion["path"] == "ingestion"
+        assert ingestion["rpc_requests"] == sum(calls.values())
+
+    def test_writes_report(self, instrumentation):
+        """Test that the report, profile and memory peaks of a run are written"""
+        instrumentation.start(trace_memory=True, profile=True)
+        with instrumentation.span("allocate"):
+            data = [bytes(1024) for _ in range(1000)]
+        del data
+
+        report_file = instrumentation.write_report("ok")
+        report = load_json(report_file)
+        assert load_json(LATEST_REPORT_FILE) == report
+        assert report["status"] == "ok"
+        assert report["spans"][0]["peak_traced_memory_bytes"] >= 1000 * 1024
+        assert report["peak_rss_bytes"] > 0
+        assert os.path.getsize(report["profile_file"]) > 0
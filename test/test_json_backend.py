@@ -0,0 +1,185 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils import json_backend
+from src.utils.schemas import (
+    AggregatedPointsFile,
+    DailyStateFile,
+    DayBlocks,
+    DeploymentBlocks,
+    EventsFile,
+    HeaderCacheFile,
+    PointsFile,
+    StageManifest,
+    StateCheckpoint,
+    VerificationLedger,
+)
+
+BACKENDS = ["json"]
+if json_backend.orjson is not None:
+    BACKENDS.append("orjson")
+if json_backend.msgspec is not None:
+    BACKENDS.append("msgspec")
+
+POINTS_DOCUMENT = {
+    "day_index": 3,
+    "date": "2025-09-20",
+    "start_block": 23400000,
+    "end_block": 23407199,
+    "points": {
+        "0x1111111111111111111111111111111111111111": 2**200 + 7,
+        "0x2222222222222222222222222222222222222222": 15,
+    },
+}
+
+STATE_DOCUMENT = {
+    "start_block": 1,
+    "end_block": 10,
+    "date": "2025-09-20",
+    "day_index": 0,
+    "nft": {"start_state": {}, "end_state": {"0xaa": [1, 2]}},
+    "pilot_vault": {
+        "start_state": {},
+        "end_state": {
+            "0xaa": {
+                "balance": 10**24,
+                "last_positive_balance_update_block": 5,
+                "last_negative_balance_update_block": 0,
+            }
+        },
+    },
+}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+class TestJsonBackend:
+    def test_dumps_matches_stdlib_indent(self, backend):
+        """Test that every backend writes the same bytes as json.dump(indent=2)"""
+        for document in (POINTS_DOCUMENT, STATE_DOCUMENT):
+            expected = json.dumps(document, indent=2).encode()
+            assert json_backend.dumps(document, backend=backend) == expected
+
+    def test_large_integers_roundtrip_exactly(self, backend):
+        """Test that 256-bit integers are not truncated or turned into floats"""
+        encoded = json_backend.dumps(POINTS_DOCUMENT, backend=backend)
+        decoded = json_backend.loads(encoded, backend=backend)
+        assert decoded["points"]["0x1111111111111111111111111111111111111111"] == 2**200 + 7
+        assert isinstance(decoded["points"]["0x1111111111111111111111111111111111111111"], int)
+
+    def test_typed_load_returns_plain_dicts(self, backend, tmp_path):
+        """Test that loading with a schema returns the same plain dict"""
+        path = tmp_path / "state.json"
+        json_backend.dump_json(STATE_DOCUMENT, path, backend=backend)
+        assert json_backend.load_json(path, DailyStateFile, backend=backend) == STATE_DOCUMENT
+
+
+@pytest.mark.skipif(json_backend.msgspec is None, reason="msgspec is not installed")
+def test_msgspec_schema_rejects_invalid_document():
+    """Test that the msgspec backend validates documents against the schema"""
+    document = dict(POINTS_DOCUMENT, points={"0x11": "not a number"})
+    with pytest.raises(Exception):
+        json_backend.loads(json.dumps(document), schema=PointsFile, backend="msgspec")
+
+
+# One document per artifact type, with keys the schemas don't declare at the top and nested levels
+ARTIFACTS = {
+    "days_blocks": (DayBlocks, {
+        "day": "2025-09-20",
+        "last_block_of_day": {"number": 10, "timestamp": 120, "utc_datetime": "", "hash": "0x0a", "miner": "0xaa"},
+        "first_block_of_next_day": None,
+        "is_final_day": False,
+        "source": "rpc",
+    }),
+    "deployment_blocks": (DeploymentBlocks, {
+        "deployments": {"nft": {"address": "0xf478", "block_number": 1, "chain": "mainnet"}},
+        "generatedAt": "",
+    }),
+    "events": (EventsFile, {
+        "error": False,
+        "metadata": {
+            "contractAddress": "0x",
+            "eventName": "Transfer",
+            "startBlock": 1,
+            "endBlock": 10,
+            "totalEvents": 1,
+            "isSorted": True,
+            "exportedAt": "",
+            "provider": "archive",
+        },
+        "events": [{
+            "blockNumber": 5,
+            "blockHash": "0x05",
+            "transactionHash": "0x",
+            "logIndex": 0,
+            "args": {"from": "0xaa", "to": "0xbb", "value": 2**200},
+            "transactionIndex": 0,
+            "removed": False,
+        }],
+    }),
+    "states": (DailyStateFile, dict(STATE_DOCUMENT, holders=1)),
+    "points": (PointsFile, dict(POINTS_DOCUMENT, total_points=2**200 + 22)),
+    "aggregated_points": (AggregatedPointsFile, {
+        "day_index": 3,
+        "date": "2025-09-20",
+        "start_block": None,
+        "end_block": None,
+        "metadata": {
+            "days_included": 4,
+            "total_users": 1,
+            "total_points_all_users": 2**200,
+            "day_points": 1,
+            "day_users_count": 1,
+            "version": "2",
+        },
+        "points": {"0xaa": {"day_points": 1, "cumulative_points": 2**200, "rank": 1}},
+    }),
+    "verification_ledger": (VerificationLedger, {
+        "days": {"3": {"state_hash": None, "holders": 1, "verified": ["onchain"], "failures": {}, "checkedAt": ""}},
+    }),
+    "stage_manifest": (StageManifest, {
+        "stage": "states_and_points",
+        "day_index": 3,
+        "version": "1",
+        "inputs": {"events": "ab"},
+        "outputs": {"states": None},
+        "end_state_addresses": ["0xaa"],
+        "host": "",
+    }),
+    "header_cache": (HeaderCacheFile, {
+        "first_block": 1,
+        "headers": {"1": {"number": 1, "hash": "0x01", "parentHash": "0x00", "timestamp": 12, "logsBloom": "0x", "size": 1}},
+    }),
+    "state_checkpoint": (StateCheckpoint, {
+        "day_index": 3,
+        "state_file_hash": "ab",
+        "user_state": [{
+            "address": "0xaa",
+            "balance": 2**200,
+            "nft_ids": [1],
+            "last_positive_balance_update_block": 5,
+            "last_negative_balance_update_block": 0,
+            "label": "",
+        }],
+    }),
+}
+
+
+@pytest.mark.parametrize("backend", ["msgspec", "orjson", "json"])
+@pytest.mark.parametrize("artifact", sorted(ARTIFACTS))
+def test_artifacts_roundtrip_with_selected_backend(backend, artifact, tmp_path, monkeypatch):
+    """Test that every artifact type loads back unchanged, unknown keys included, with the backend POINTS_JSON_BACKEND picks"""
+    if getattr(json_backend, backend, json) is None:
+        pytest.skip(f"{backend} is not installed")
+    monkeypatch.setenv("POINTS_JSON_BACKEND", backend)
+    monkeypatch.setattr(json_backend, "BACKEND", json_backend._select_backend())
+    schema, document = ARTIFACTS[artifact]
+    path = tmp_path / f"{artifact}.json"
+
+    json_backend.dump_json(document, path)
+    assert path.read_bytes() == json.dumps(document, indent=2).encode()
+    assert json_backend.load_json(path, schema) == document
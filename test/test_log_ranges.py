@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import find_daily_blocks, find_deployment_blocks, nft_events, pilot_vault_events
+from src.utils.header_cache import header_cache
+from src.utils.json_backend import load_json
+from src.utils.log_ranges import bloom_matches, get_bloom_mask, group_block_ranges, split_block_range
+from benchmarks.synthetic_chain import NFT_ADDRESS, PILOT_VAULT_ADDRESS, SyntheticChain
+from test.utils.synthetic_pipeline import ROOT, count_by_method, prepare_workdir, use_chain
+
+
+@pytest.fixture(autouse=True)
+def clean_header_cache():
+    header_cache.clear()
+    yield
+    header_cache.clear()
+
+
+def run_fetchers(workdir, chain, prefilter, monkeypatch):
+    """Fetch a chain's events in `workdir`, returning the RPC calls made by method"""
+    with open(ROOT / "config.json") as f:
+        config = json.load(f)
+    for endpoint in config["RPC_ENDPOINTS"]:
+        endpoint["max_logs_block_range"] = 1000
+    config["LOGS_BLOOM_PREFILTER"] = prefilter
+    prepare_workdir(workdir, chain, monkeypatch, lp_balances_snapshot=None, config=config)
+    calls = Counter()
+    use_chain(chain, monkeypatch, workdir.name, calls)
+    find_deployment_blocks.main()
+    find_daily_blocks.main()
+    calls.clear()
+    nft_events.main()
+    pilot_vault_events.main()
+    return count_by_method(calls)
+
+
+def read_events(data_dir):
+    events = {}
+    for path in sorted(Path(data_dir).rglob("events/*/*.json")):
+        data = load_json(str(path))
+        data["metadata"].pop("exportedAt")
+        events[str(path.relative_to(data_dir))] = data
+    return events
+
+
+class TestLogRanges:
+    def test_split_and_group_block_ranges(self):
+        assert split_block_range(0, 2500, 1000) == [(0, 999), (1000, 1999), (2000, 2500)]
+        assert split_block_range(100, 100, 10) == [(100, 100)]
+        assert split_block_range(0, 20, 10) == [(0, 9), (10, 19), (20, 20)]
+        assert group_block_ranges([5, 7, 1004, 1005, 3000], 1000) == [(5, 1004), (1005, 1005), (3000, 3000)]
+        assert group_block_ranges([], 1000) == []
+
+    def test_bloom_matches_only_blocks_with_contract_logs(self):
+        chain = SyntheticChain(days_amount=1, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=2)
+        nft_mask = get_bloom_mask(NFT_ADDRESS)
+        pilot_vault_mask = get_bloom_mask(PILOT_VAULT_ADDRESS)
+        for block_number in range(chain.deployment_block, chain.latest_block):
+            logs_bloom = chain.get_block(block_number)["logsBloom"]
+            logs = chain.logs.get(block_number, [])
+            if any(log["address"] == NFT_ADDRESS for log in logs):
+                assert bloom_matches(logs_bloom, nft_mask)
+            if any(log["address"] == PILOT_VAULT_ADDRESS for log in logs):
+                assert bloom_matches(logs_bloom, pilot_vault_mask)
+            if not logs:
+                assert not bloom_matches(logs_bloom, nft_mask)
+
+    def test_prefilter_fetches_same_events_with_fewer_log_queries(self, tmp_path, monkeypatch):
+        """Test that the prefilter skips ranges without logs and writes the same events"""
+        chain = SyntheticChain(days_amount=3, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=1)
+        calls = run_fetchers(tmp_path / "chunks", chain, False, monkeypatch)
+        prefilter_calls = run_fetchers(tmp_path / "prefilter", chain, True, monkeypatch)
+
+        assert read_events(tmp_path / "prefilter" / "data") == read_events(tmp_path / "chunks" / "data")
+        assert prefilter_calls["eth_getLogs"] * 2 < calls["eth_getLogs"]
+        assert os.listdir(tmp_path / "prefilter" / "data" / "cache" / "headers")
+
+    def test_cached_headers_are_not_fetched_again(self, tmp_path, monkeypatch):
+        chain = SyntheticChain(days_amount=1, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=1)
+        run_fetchers(tmp_path / "first", chain, True, monkeypatch)
+        shutil.rmtree(tmp_path / "first" / "data" / "events")
+        header_cache.clear()
+
+        calls = Counter()
+        use_chain(chain, monkeypatch, "again", calls)
+        nft_events.main()
+        calls = count_by_method(calls)
+        assert calls["eth_getLogs"] > 0
+        # Only the end block hashes of verified log chunks, no header batches
+        assert calls["eth_getBlockByNumber"] <= calls["eth_getLogs"]
+
+    def test_cached_headers_let_one_provider_serve_logs(self, tmp_path, monkeypatch):
+        """Test that chunks whose headers are cached read their logs once instead of from a majority"""
+        chain = SyntheticChain(days_amount=2, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=1)
+        run_fetchers(tmp_path / "prefilter", chain, True, monkeypatch)
+        header_cache.clear()
+        majority_calls = run_fetchers(tmp_path / "chunks", chain, False, monkeypatch)
+        majority_events = read_events(tmp_path / "chunks" / "data")
+        shutil.rmtree(tmp_path / "chunks" / "data" / "events")
+        shutil.copytree(tmp_path / "prefilter" / "data" / "cache", tmp_path / "chunks" / "data" / "cache")
+        header_cache.clear()
+
+        calls = Counter()
+        use_chain(chain, monkeypatch, "chunks-again", calls)
+        nft_events.main()
+        pilot_vault_events.main()
+        calls = count_by_method(calls)
+        assert calls["eth_getLogs"] * 2 == majority_calls["eth_getLogs"]
+        assert read_events(tmp_path / "chunks" / "data") == majority_events
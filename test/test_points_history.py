@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.daily_states_and_points import process_daily_states_and_points
+from src.utils import points_history as points_history_module
+from src.utils.points_history import PointsHistory, points_history
+from test.utils.synthetic_data import write_synthetic_data
+
+ROOT = Path(__file__).parent.parent
+
+
+def read_day_files(points_dir):
+    """{address: [(day_index, points)]} from the day files"""
+    histories = {}
+    for path in sorted(Path(points_dir).glob("*.json"), key=lambda path: int(path.stem)):
+        day = json.loads(path.read_text())
+        for address, points in day["points"].items():
+            histories.setdefault(address, []).append((day["day_index"], points))
+    return histories
+
+
+class TestPointsHistory:
+    def test_recomputed_day_replaces_earlier_write(self, tmp_path):
+        """Test that a day written again replaces its points, also for addresses without points anymore"""
+        history = PointsHistory(str(tmp_path / "history"))
+        history.append_day(0, {"0xa": 5, "0xb": 7})
+        history.append_day(1, {"0xa": 6, "0xb": 8})
+        history.compact()
+        history.append_day(1, {"0xa": 60})
+
+        assert history.get_history("0xA") == [(0, 5), (1, 60)]
+        assert history.get_history("0xb") == [(0, 7)]
+        history.compact()
+        assert history.get_history("0xb") == [(0, 7)]
+        assert history.get_history("0xc") == []
+
+    def test_runs_are_merged(self, tmp_path, monkeypatch):
+        """Test that the log is compacted into runs that are merged into one past MAX_RUNS"""
+        monkeypatch.setattr(points_history_module, "COMPACT_AFTER_RECORDS", 2)
+        history = PointsHistory(str(tmp_path / "history"))
+        expected = {}
+        for day_index in range(20):
+            points = {f"0x{address}": day_index * 10 + address for address in range(day_index % 3, 4)}
+            history.append_day(day_index, points)
+            for address, value in points.items():
+                expected.setdefault(address, []).append((day_index, value))
+            assert len(history.manifest["runs"]) <= points_history_module.MAX_RUNS
+
+        history.compact(full=True)
+        assert len(history.manifest["runs"]) == 1
+        assert len(list((tmp_path / "history" / "runs").glob("*.txt"))) == 1
+        reloaded = PointsHistory(str(tmp_path / "history"))
+        assert {address: reloaded.get_history(address) for address in expected} == expected
+
+    def test_query_seeks_log_lines(self, tmp_path, monkeypatch):
+        """Test that a query reads an address's log lines by offset and the log is compacted after a few days"""
+        history = PointsHistory(str(tmp_path / "history"))
+        days = range(points_history_module.COMPACT_AFTER_DAYS - 2)
+        for day_index in days:
+            history.append_day(day_index, {"0xa": day_index, "0xb": 100 + day_index})
+        history.append_day(2, {"0xb": 7})
+
+        def scan(path):
+            raise AssertionError(f"scanned {path}")
+
+        monkeypatch.setattr(points_history_module, "iter_lines", scan)
+        assert history.get_history("0xa") == [(day_index, day_index) for day_index in days if day_index != 2]
+        reloaded = PointsHistory(str(tmp_path / "history"))
+        assert reloaded.get_history("0xb") == [(0, 100), (1, 101), (2, 7)] + [
+            (day_index, 100 + day_index) for day_index in days[3:]
+        ]
+        assert reloaded.manifest["runs"] == []
+
+        monkeypatch.undo()
+        reloaded.append_day(20, {"0xa": 20})
+        assert reloaded.manifest["runs"] == [0]
+        assert reloaded.manifest["log_records"] == 0
+        assert reloaded.get_history("0xa")[-1] == (20, 20)
+
+    def test_uncommitted_append_is_dropped(self, tmp_path):
+        """Test that lines a stopped append wrote after the manifest's length are truncated on load"""
+        history = PointsHistory(str(tmp_path / "history"))
+        history.append_day(0, {"0xa": 5})
+        with open(tmp_path / "history" / "log.txt", "a") as f:
+            f.write("0 1 1 99\n")
+        with open(tmp_path / "history" / "addresses.txt", "a") as f:
+            f.write("0xb\n")
+
+        reloaded = PointsHistory(str(tmp_path / "history"))
+        reloaded.append_day(1, {"0xc": 3})
+        assert reloaded.get_history("0xa") == [(0, 5)]
+        assert reloaded.get_history("0xc") == [(1, 3)]
+        assert reloaded.address_ids == {"0xa": 0, "0xc": 1}
+
+    def test_points_stage_appends_history(self, tmp_path, monkeypatch):
+        """Test that the points stage keeps the history of every address of the day files"""
+        data_dir = write_synthetic_data(tmp_path, days_amount=6)
+        monkeypatch.chdir(tmp_path)
+        process_daily_states_and_points()
+        points_history.sync()
+
+        expected = read_day_files(data_dir / "points")
+        assert expected
+        assert points_history.get_days() == list(range(6))
+        assert {address: points_history.get_history(address) for address in expected} == expected
+
+        (data_dir / "points_history" / "manifest.json").unlink()
+        output = subprocess.run(
+            [sys.executable, "-m", "src.address_history", "--rebuild", "--json", next(iter(expected))],
+            cwd=tmp_path, env={**os.environ, "PYTHONPATH": str(ROOT)}, capture_output=True, text=True, check=True,
+        ).stdout
+        assert [tuple(day) for day in json.loads(output.splitlines()[-1])] == expected[next(iter(expected))]
@@ -0,0 +1,131 @@
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import find_daily_blocks, find_deployment_blocks, nft_events
+from src.utils import aggregated_w3_request
+from src.utils.json_backend import load_json
+from src.utils.progress import Progress
+from src.utils.schemas import EventsFile
+from benchmarks.synthetic_chain import SyntheticChain
+from test.utils.synthetic_pipeline import prepare_workdir
+
+
+@pytest.fixture
+def progress(monkeypatch):
+    """The tests' own progress, so they leave the one of a running pipeline alone"""
+    progress = Progress()
+    for module in (nft_events, aggregated_w3_request):
+        monkeypatch.setattr(module, "progress", progress)
+    return progress
+
+
+def parse_textfile(path):
+    """{(name, labels): value} of a Prometheus textfile"""
+    samples = {}
+    for line in Path(path).read_text().splitlines():
+        if line.startswith("#"):
+            continue
+        name_and_labels, value = line.rsplit(" ", 1)
+        samples[name_and_labels] = float(value)
+    return samples
+
+
+class TestProgress:
+    def test_console_is_rate_limited(self, progress, capsys):
+        """Test that progress is printed once per interval and once more when the task finishes"""
+        progress.configure(interval=3600, output_format="text")
+        progress.start_task("events", total_blocks=7200 * 100, total_days=100)
+        for _ in range(50):
+            progress.advance("events", blocks=7200, events=10, days=1)
+        assert capsys.readouterr().out == ""
+
+        progress.finish_task("events")
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 1
+        assert lines[0].startswith("[events] 50/100 days, 360,000/720,000 blocks")
+        assert lines[0].endswith("done")
+
+    def test_json_events(self, progress, capsys):
+        """Test that JSON progress lines have the rates and an ETA from the block total"""
+        progress.configure(interval=0, output_format="json")
+        progress.start_task("events", total_blocks=1000)
+        progress.advance("events", blocks=250, events=40)
+
+        event = json.loads(capsys.readouterr().out.splitlines()[-1])
+        assert event["event"] == "progress"
+        assert (event["task"], event["blocks"], event["total_blocks"], event["events"]) == ("events", 250, 1000, 40)
+        assert event["blocks_per_second"] > 0
+        assert event["eta_seconds"] is not None and not event["finished"]
+
+    def test_textfile(self, progress, tmp_path):
+        """Test that the textfile has counters, rates, queue depths and cumulative latency buckets"""
+        textfile = tmp_path / "textfile" / "points.prom"
+        progress.configure(interval=3600, output_format="text", textfile=str(textfile))
+        progress.start_task("states and points", total_days=10)
+        progress.advance("states and points", days=3)
+        progress.set_queue_depth("events", 2)
+        for seconds in (0.01, 0.2, 3.0):
+            progress.observe_rpc_latency('http://node"1', seconds)
+        progress.finish_task("states and points")
+
+        samples = parse_textfile(textfile)
+        assert samples['points_days_completed_total{task="states and points"}'] == 3
+        assert samples['points_queue_depth{stage="events"}'] == 2
+        provider = 'provider="http://node\\"1"'
+        assert samples[f'points_rpc_latency_seconds_bucket{{{provider},le="0.05"}}'] == 1
+        assert samples[f'points_rpc_latency_seconds_bucket{{{provider},le="0.25"}}'] == 2
+        assert samples[f'points_rpc_latency_seconds_bucket{{{provider},le="+Inf"}}'] == 3
+        assert samples[f"points_rpc_latency_seconds_count{{{provider}}}"] == 3
+        assert not list(textfile.parent.glob("*.tmp"))
+
+    def test_concurrent_reports(self, progress, tmp_path):
+        """Test that stage threads reporting at the same time don't break each other's textfile writes"""
+        textfile = tmp_path / "points.prom"
+        progress.configure(interval=0, output_format="json", textfile=str(textfile))
+        errors = []
+
+        def report(name):
+            try:
+                for _ in range(50):
+                    progress.advance(name, days=1)
+                progress.finish_task(name)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=report, args=(f"stage {i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        samples = parse_textfile(textfile)
+        assert all(samples[f'points_days_completed_total{{task="stage {i}"}}'] == 50 for i in range(8))
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_fetcher_progress(self, progress, tmp_path, monkeypatch, capsys):
+        """Test that the NFT fetcher reports every block and event it saved instead of a line per chunk"""
+        chain = SyntheticChain(days_amount=3, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=3)
+        prepare_workdir(tmp_path, chain, monkeypatch, lp_balances_snapshot=None)
+        find_deployment_blocks.main()
+        find_daily_blocks.main()
+
+        textfile = tmp_path / "points.prom"
+        progress.configure(interval=3600, output_format="text", textfile=str(textfile))
+        nft_events.main()
+
+        events_files = [load_json(path, EventsFile) for path in sorted((tmp_path / "data/events/nft").glob("*.json"))]
+        samples = parse_textfile(textfile)
+        assert samples['points_days_completed_total{task="nft events"}'] == len(events_files)
+        assert samples['points_events_total{task="nft events"}'] == sum(len(f["events"]) for f in events_files)
+        assert samples['points_blocks_total{task="nft events"}'] == sum(
+            f["metadata"]["endBlock"] - f["metadata"]["startBlock"] + 1 for f in events_files
+        )
+        assert any(name.startswith("points_rpc_latency_seconds_count") for name in samples)
+        assert "Fetching logs from block" not in capsys.readouterr().out
@@ -0,0 +1,142 @@
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.daily_states_and_points import process_daily_states_and_points
+from src.reconcile_states import call_batch, reconcile_states
+from src.utils import aggregated_w3_request
+from src.utils.event_repository import event_repository
+from src.utils.json_backend import load_json, dump_json
+from benchmarks.synthetic_chain import (
+    BASE_TOTAL_SUPPLY_SELECTOR,
+    NFT_ADDRESS,
+    PILOT_VAULT_ADDRESS,
+    CallReverted,
+    SyntheticChain,
+)
+from test.utils.synthetic_pipeline import count_by_method, ingest, prepare_workdir, use_chain
+
+
+@pytest.fixture
+def chain(tmp_path, monkeypatch):
+    """A synthetic chain with the states of its days computed in `tmp_path`"""
+    chain = SyntheticChain(days_amount=3, holders_amount=10, transfers_per_day=20, nft_transfers_per_day=4)
+    prepare_workdir(tmp_path, chain, monkeypatch)
+    ingest()
+    process_daily_states_and_points()
+    yield chain
+    event_repository.clear()
+
+
+def count_calls(chain, monkeypatch):
+    calls = Counter()
+    use_chain(chain, monkeypatch, "counting", calls)
+    return calls
+
+
+class TestReconcileStates:
+    def test_states_match_chain_with_two_multicalls_per_day(self, chain, monkeypatch):
+        """Test that every day is checked with one balances and one owners aggregate3 call"""
+        calls = count_calls(chain, monkeypatch)
+        assert reconcile_states() == {}
+        days_amount = len(os.listdir("data/states"))
+        assert days_amount == 4
+        quorum = aggregated_w3_request.STATE_READ_POLICY.required
+        assert count_by_method(calls)["eth_call"] == 2 * days_amount * quorum
+
+    def test_reports_differences(self, chain):
+        state = load_json("data/states/2.json")
+        holder = next(iter(state["pilot_vault"]["end_state"]))
+        state["pilot_vault"]["end_state"][holder]["balance"] += 1
+        owner, token_ids = next((owner, ids) for owner, ids in state["nft"]["end_state"].items() if ids)
+        state["nft"]["end_state"][owner] = token_ids[1:]
+        dump_json(state, "data/states/2.json")
+
+        mismatched_days = reconcile_states()
+        assert list(mismatched_days) == [2]
+        assert any(f"pilot vault balance of {holder}" in mismatch for mismatch in mismatched_days[2])
+        assert any(f"NFTs of {owner.lower()}" in mismatch for mismatch in mismatched_days[2])
+
+    def test_json_rpc_batches_without_multicall(self, chain):
+        """Test that blocks before Multicall3 was deployed are checked with batched eth_calls"""
+        chain.multicall = False
+        assert reconcile_states(workers=1) == {}
+
+    def test_reports_missing_holder(self, chain):
+        """Test that a holder missing from a state file is found by the pilot vault total supply"""
+        state = load_json("data/states/2.json")
+        end_state = state["pilot_vault"]["end_state"]
+        total_supply = sum(holder_state["balance"] for holder_state in end_state.values())
+        holder = next(holder for holder, holder_state in end_state.items() if holder_state["balance"])
+        missing_balance = end_state.pop(holder)["balance"]
+        dump_json(state, "data/states/2.json")
+
+        assert reconcile_states() == {
+            2: [
+                f"pilot vault total supply: stored balances add up to {total_supply - missing_balance}, "
+                f"on-chain {total_supply}"
+            ]
+        }
+
+    def test_failed_batch_raises(self, chain, monkeypatch):
+        """Test that a batch the node rejects as a whole raises instead of reading as reverted calls"""
+        w3 = aggregated_w3_request.get_w3_instances()[0]
+        monkeypatch.setattr(
+            w3.provider, "make_batch_request", lambda requests: {"error": {"code": -32005, "message": "limit"}}
+        )
+        with pytest.raises(ValueError, match="limit"):
+            call_batch(w3, [("0x" + "1" * 40, b"")], 1)
+
+    def test_reports_failed_calls(self, chain, monkeypatch):
+        """Test that reverted balance and total supply calls are reported instead of decoded"""
+        state = load_json("data/states/2.json")
+        holder = next(iter(state["pilot_vault"]["end_state"]))
+        call = chain.call
+
+        def reverting_call(to, data, block_number):
+            if to.lower() == PILOT_VAULT_ADDRESS.lower() and (
+                data[:4] == BASE_TOTAL_SUPPLY_SELECTOR or holder[2:] in data.hex()
+            ):
+                raise CallReverted("paused")
+            return call(to, data, block_number)
+
+        monkeypatch.setattr(chain, "call", reverting_call)
+        mismatched_days = reconcile_states()
+        assert f"pilot vault balance of {holder}: balanceOf call failed on-chain" in mismatched_days[2]
+        assert "pilot vault total supply: baseTotalSupply call failed on-chain" in mismatched_days[2]
+
+    def test_checks_tokens_above_total_supply_after_burns(self, tmp_path, monkeypatch):
+        """Test that owners are checked up to the highest minted token id when burns lowered the total supply"""
+        chain = SyntheticChain(days_amount=3, holders_amount=10, transfers_per_day=20, nft_transfers_per_day=4)
+        mint_blocks = {
+            int(log["topics"][3], 16): block_number
+            for block_number, block_logs in chain.logs.items()
+            for log in block_logs
+            if log["address"] == NFT_ADDRESS
+        }
+        highest_token_id = max(mint_blocks)
+        burned_token_ids = [token_id for token_id in sorted(mint_blocks, key=mint_blocks.get) if token_id != highest_token_id][:2]
+        burn_block = max(mint_blocks[token_id] for token_id in burned_token_ids) + 1
+        for token_id in burned_token_ids:
+            chain.burn_nft(token_id, burn_block)
+        prepare_workdir(tmp_path, chain, monkeypatch)
+        ingest()
+        process_daily_states_and_points()
+        assert reconcile_states() == {}
+
+        state = load_json("data/states/3.json")
+        stored_token_ids = set().union(*state["nft"]["end_state"].values())
+        assert len(stored_token_ids) == len(mint_blocks) - 2 < highest_token_id
+        owner, token_ids = next((owner, ids) for owner, ids in state["nft"]["end_state"].items() if highest_token_id in ids)
+        state["nft"]["end_state"][owner] = [token_id for token_id in token_ids if token_id != highest_token_id]
+        dump_json(state, "data/states/3.json")
+
+        assert reconcile_states() == {
+            3: [f"NFTs of {owner.lower()}: stored {sorted(state['nft']['end_state'][owner])}, on-chain {sorted(token_ids)}"]
+        }
+        event_repository.clear()
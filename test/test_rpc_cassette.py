@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+
+import pytest
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils.rpc_cassette import RECORD, REPLAY, Cassette, use_cassette
+
+
+class BlockNumberProvider(BaseProvider):
+    """Answers every request with `block_number` and counts the requests"""
+
+    def __init__(self, endpoint_uri, block_number):
+        super().__init__()
+        self.endpoint_uri = endpoint_uri
+        self.block_number = block_number
+        self.calls = 0
+
+    def make_request(self, method, params):
+        self.calls += 1
+        return {"jsonrpc": "2.0", "id": 1, "result": hex(self.block_number)}
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+class TestRpcCassette:
+    def test_record_then_replay_without_provider(self, tmp_path):
+        """Test that a recorded cassette replays without touching the real provider"""
+        provider = BlockNumberProvider("http://node-a", 100)
+        w3_instances = [Web3(provider)]
+        with use_cassette(w3_instances, Cassette(str(tmp_path), RECORD)) as cassette:
+            assert w3_instances[0].eth.block_number == 100
+        assert cassette.calls == {"eth_blockNumber": 1}
+        assert w3_instances[0].provider is provider
+
+        with use_cassette(w3_instances, Cassette(str(tmp_path), REPLAY)) as cassette:
+            assert w3_instances[0].eth.block_number == 100
+            assert w3_instances[0].eth.block_number == 100
+        assert provider.calls == 1
+        assert cassette.calls == {"eth_blockNumber": 2}
+        assert not cassette.misses
+
+    def test_replay_falls_back_to_other_providers_recordings(self, tmp_path):
+        """Test that a request recorded on one provider is replayed on another"""
+        recorded = [Web3(BlockNumberProvider("http://node-a", 100))]
+        with use_cassette(recorded, Cassette(str(tmp_path), RECORD)):
+            recorded[0].eth.block_number
+
+        replayed = [Web3(BlockNumberProvider("http://node-b", 0))]
+        with use_cassette(replayed, Cassette(str(tmp_path), REPLAY)):
+            assert replayed[0].eth.block_number == 100
+
+    def test_missing_recording_is_counted(self, tmp_path):
+        w3_instances = [Web3(BlockNumberProvider("http://node-a", 100))]
+        with use_cassette(w3_instances, Cassette(str(tmp_path), REPLAY)) as cassette:
+            with pytest.raises(Exception, match="No recorded response"):
+                w3_instances[0].eth.block_number
+        assert cassette.misses == {"eth_blockNumber": 1}
+
+    def test_replay_latency(self, tmp_path):
+        cassette = Cassette(str(tmp_path), REPLAY, latency=0.05, jitter=0.01, seed=1)
+        delays = [cassette.get_delay() for _ in range(100)]
+        assert all(0.04 <= delay <= 0.06 for delay in delays)
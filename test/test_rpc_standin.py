@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import pytest
+from web3 import Web3
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.rpc_standin import create_server, get_server_url, serve_in_background
+from src.utils.aggregated_w3_request import LimitedHTTPProvider
+from src.utils.config import EndpointConfig
+from src.utils.rpc_fixtures import RpcFixtures
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(fixtures, upstream=None):
+        server = create_server(fixtures, port=0, upstream=upstream)
+        serve_in_background(server)
+        servers.append(server)
+        return get_server_url(server)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestRpcStandin:
+    def test_replays_recorded_responses(self, tmp_path, start_server):
+        fixtures = RpcFixtures(str(tmp_path / "fixtures.json"))
+        fixtures.record("eth_blockNumber", [], {"jsonrpc": "2.0", "id": 7, "result": "0x10"})
+        fixtures.save()
+
+        url = start_server(RpcFixtures(str(tmp_path / "fixtures.json")))
+        w3 = Web3(LimitedHTTPProvider(EndpointConfig(url)))
+        assert w3.eth.block_number == 16
+
+    def test_missing_response_is_an_rpc_error(self, tmp_path, start_server):
+        url = start_server(RpcFixtures(str(tmp_path / "fixtures.json")))
+        w3 = Web3(Web3.HTTPProvider(url))
+        with pytest.raises(Exception, match="No recorded response"):
+            w3.eth.get_block(1)
+
+    def test_records_from_upstream(self, tmp_path, start_server):
+        """Test that record mode captures upstream responses for later offline replay"""
+        upstream_fixtures = RpcFixtures(str(tmp_path / "upstream.json"))
+        upstream_fixtures.record("eth_chainId", [], {"result": "0x1"})
+        upstream_url = start_server(upstream_fixtures)
+
+        recorded = RpcFixtures(str(tmp_path / "recorded.json"))
+        url = start_server(recorded, upstream=upstream_url)
+        assert Web3(Web3.HTTPProvider(url)).eth.chain_id == 1
+        recorded.save()
+
+        replay_url = start_server(RpcFixtures(str(tmp_path / "recorded.json")))
+        assert Web3(Web3.HTTPProvider(replay_url)).eth.chain_id == 1
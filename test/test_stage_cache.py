@@ -0,0 +1,118 @@
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import aggregate_daily_points, daily_states_and_points
+from src.utils import stage_cache
+from src.utils.event_repository import event_repository
+from src.utils.json_backend import load_json, dump_json
+from benchmarks.synthetic_chain import SyntheticChain
+from test.utils.synthetic_pipeline import ingest, prepare_workdir
+
+
+@pytest.fixture
+def pipeline_dir(tmp_path, monkeypatch):
+    """Working directory with the events of a synthetic chain fetched"""
+    chain = SyntheticChain(days_amount=3, holders_amount=10, transfers_per_day=30, nft_transfers_per_day=5)
+    prepare_workdir(tmp_path, chain, monkeypatch)
+    ingest()
+    yield tmp_path
+    event_repository.clear()
+
+
+def run_stages():
+    """Run the states/points and aggregation stages, returning the days each one recomputed"""
+    recomputed = {"states_and_points": [], "aggregated_points": []}
+    process_day = daily_states_and_points.process_day
+    aggregate_day = aggregate_daily_points.aggregate_day
+
+    def tracked_process_day(day_index, user_state_before_start_block):
+        recomputed["states_and_points"].append(day_index)
+        return process_day(day_index, user_state_before_start_block)
+
+    def tracked_aggregate_day(day_index, *args, **kwargs):
+        recomputed["aggregated_points"].append(day_index)
+        return aggregate_day(day_index, *args, **kwargs)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(daily_states_and_points, "process_day", tracked_process_day)
+        monkeypatch.setattr(aggregate_daily_points, "aggregate_day", tracked_aggregate_day)
+        event_repository.clear()
+        daily_states_and_points.process_daily_states_and_points()
+        aggregate_daily_points.aggregate_daily_points()
+    return recomputed
+
+
+def read_outputs():
+    return {
+        str(path): path.read_bytes()
+        for folder in ("points", "aggregated_points", "states")
+        for path in sorted(Path("data", folder).glob("*.json"))
+    }
+
+
+class TestStageCache:
+    def test_version_covers_imported_modules(self):
+        """Test that a stage's version hashes the modules its replay imports, not only the stage's own"""
+        replay_modules = {module.__name__ for module in stage_cache.get_imported_modules(daily_states_and_points)}
+        assert {
+            "src.daily_states_v2",
+            "src.daily_points_v2",
+            "src.utils.process_event_above_user_state",
+            "src.utils.read_combined_sorted_events",
+            "src.utils.event_repository",
+            "src.utils.read_nft_events_as_block_number_to_array",
+            "src.utils.read_transfer_events_as_block_number_to_array",
+            "src.utils.event_order",
+            "src.utils.get_additional_data",
+        } <= replay_modules
+        aggregate_modules = {module.__name__ for module in stage_cache.get_imported_modules(aggregate_daily_points)}
+        assert "src.utils.json_backend" in aggregate_modules
+
+    def test_unchanged_rerun_skips_every_day(self, pipeline_dir):
+        """Test that a rerun with unchanged inputs recomputes nothing and keeps the outputs"""
+        assert run_stages() == {"states_and_points": [0, 1, 2, 3], "aggregated_points": [0, 1, 2, 3]}
+        outputs = read_outputs()
+        assert run_stages() == {"states_and_points": [], "aggregated_points": []}
+        assert read_outputs() == outputs
+
+    def test_refetched_events_with_same_content_recompute_one_day(self, pipeline_dir):
+        """Test that downstream days are skipped when a recomputed day's outputs didn't change"""
+        run_stages()
+        events_file = "data/events/pilot_vault/1.json"
+        events = load_json(events_file)
+        events["metadata"]["exportedAt"] = "2030-01-01T00:00:00"
+        dump_json(events, events_file)
+        assert run_stages() == {"states_and_points": [1], "aggregated_points": []}
+
+    def test_changed_events_recompute_downstream_days(self, pipeline_dir):
+        """Test that a changed input recomputes its day and every day after it, and gives fresh-run outputs"""
+        run_stages()
+        events_file = "data/events/pilot_vault/1.json"
+        events = load_json(events_file)
+        event = next(e for e in events["events"] if e["args"]["value"] > 1 and int(e["args"]["from"], 16) != 0)
+        event["args"]["value"] -= 1
+        dump_json(events, events_file)
+
+        assert run_stages() == {"states_and_points": [1, 2, 3], "aggregated_points": [1, 2, 3]}
+        outputs = read_outputs()
+        shutil.rmtree("data/manifests")
+        assert run_stages()["states_and_points"] == [0, 1, 2, 3]
+        assert read_outputs() == outputs
+
+    def test_changed_version_or_edited_output_is_not_up_to_date(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("data")
+        dump_json({"a": 1}, "data/in.json")
+        dump_json({"b": 2}, "data/out.json")
+        stage_cache.save_manifest("stage", 0, "v1", ["data/in.json"], ["data/out.json"])
+        assert stage_cache.is_up_to_date("stage", 0, "v1", ["data/in.json"], ["data/out.json"])
+        assert not stage_cache.is_up_to_date("stage", 0, "v2", ["data/in.json"], ["data/out.json"])
+        assert not stage_cache.is_up_to_date("stage", 1, "v1", ["data/in.json"], ["data/out.json"])
+        dump_json({"b": 3}, "data/out.json")
+        assert not stage_cache.is_up_to_date("stage", 0, "v1", ["data/in.json"], ["data/out.json"])
@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import daily_states_and_points, daily_states_v2
+from src.daily_states_and_points import process_daily_states_and_points
+from src.daily_states_v2 import process_daily_states
+from src.utils.json_backend import load_json, dump_json
+from src.utils.state_checkpoints import find_checkpoint, get_checkpoint_days
+from test.utils.synthetic_data import write_synthetic_data
+
+
+def read_state_files(folders=("states",)):
+    return {
+        f"{folder}/{path.name}": path.read_bytes()
+        for folder in folders
+        for path in sorted(Path(f"data/{folder}").glob("*.json"))
+    }
+
+
+@pytest.fixture
+def synthetic_data(tmp_path, monkeypatch):
+    data_dir = write_synthetic_data(tmp_path, days_amount=6)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(daily_states_v2, "get_checkpoint_interval_days", lambda: 2)
+    monkeypatch.setattr(daily_states_and_points, "get_checkpoint_interval_days", lambda: 2)
+    return data_dir
+
+
+@pytest.fixture
+def replayed_days(monkeypatch):
+    days = []
+    calculate = daily_states_v2.calculate_daily_state_after_end_block
+
+    def calculate_and_record(day_index, user_state):
+        days.append(day_index)
+        return calculate(day_index, user_state)
+
+    monkeypatch.setattr(daily_states_v2, "calculate_daily_state_after_end_block", calculate_and_record)
+    return days
+
+
+class TestStateCheckpoints:
+    @pytest.mark.parametrize("from_day, first_replayed_day", [(1, 0), (2, 2), (3, 2), (4, 4), (5, 4)])
+    def test_resume_matches_full_replay(self, synthetic_data, replayed_days, from_day, first_replayed_day):
+        """Test that resuming from a checkpoint replays only the days after it and writes the same files"""
+        process_daily_states()
+        assert get_checkpoint_days() == [1, 3, 5]
+        full_replay = read_state_files()
+
+        for day_index in range(from_day, 6):
+            (synthetic_data / "states" / f"{day_index}.json").unlink()
+        replayed_days.clear()
+        process_daily_states(from_day=from_day)
+
+        assert replayed_days == list(range(first_replayed_day, 6))
+        assert read_state_files() == full_replay
+
+    def test_changed_state_file_invalidates_checkpoint(self, synthetic_data, replayed_days):
+        """Test that a checkpoint whose day was recomputed since is skipped for an earlier one"""
+        process_daily_states()
+        state_file = daily_states_v2.get_state_file(3)
+        state_data = load_json(state_file)
+        state_data["date"] = "corrected"
+        dump_json(state_data, state_file)
+
+        assert find_checkpoint(5, daily_states_v2.get_state_file)[0] == 1
+        replayed_days.clear()
+        process_daily_states(from_day=5)
+        assert replayed_days == [2, 3, 4, 5]
+        assert load_json(state_file)["date"] == "corrected"
+
+    def test_fused_stage_resumes_from_checkpoint(self, synthetic_data, monkeypatch):
+        """Test that the fused stage saves checkpoints and a recomputed day replays only the states after one"""
+        process_daily_states_and_points()
+        assert get_checkpoint_days() == [1, 3, 5]
+        full_run = read_state_files(("states", "points"))
+
+        replayed_days, processed_days = [], []
+        calculate = daily_states_and_points.calculate_daily_state_after_end_block
+        process_day = daily_states_and_points.process_day
+
+        def calculate_and_record(day_index, user_state):
+            replayed_days.append(day_index)
+            return calculate(day_index, user_state)
+
+        def process_and_record(day_index, user_state):
+            processed_days.append(day_index)
+            return process_day(day_index, user_state)
+
+        monkeypatch.setattr(daily_states_and_points, "calculate_daily_state_after_end_block", calculate_and_record)
+        monkeypatch.setattr(daily_states_and_points, "process_day", process_and_record)
+        (synthetic_data / "states" / "5.json").unlink()
+        (synthetic_data / "points" / "5.json").unlink()
+        process_daily_states_and_points()
+
+        assert (replayed_days, processed_days) == ([4], [5])
+        assert read_state_files(("states", "points")) == full_run
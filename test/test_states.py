@@ -1,11 +1,13 @@
 import json
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
-from web3 import Web3
-from src.utils.get_rpc import get_rpc
+from src.utils.aggregated_w3_request import get_w3_instances
+from src.utils.header_cache import header_cache
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 STATES_DIR = DATA_DIR / "states"
+DAYS_BLOCKS_DIR = DATA_DIR / "days_blocks"
+DEPLOYMENT_BLOCKS_FILE = DATA_DIR / "deployment_blocks.json"
 
 
 def load_states_sorted():
@@ -13,6 +15,38 @@ def load_states_sorted():
     return [json.loads(f.read_text()) for f in files]
 
 
+def load_recorded_block_timestamps():
+    """Timestamps of the day boundary and deployment blocks recorded when they were found"""
+    timestamps = {}
+    for f in DAYS_BLOCKS_DIR.glob("*.json"):
+        day_blocks = json.loads(f.read_text())
+        for block in (day_blocks["last_block_of_day"], day_blocks["first_block_of_next_day"]):
+            if block is not None:
+                timestamps[block["number"]] = block["timestamp"]
+    if DEPLOYMENT_BLOCKS_FILE.exists():
+        deployments = json.loads(DEPLOYMENT_BLOCKS_FILE.read_text())["deployments"]
+        for deployment in deployments.values():
+            if deployment.get("block_number") is not None and "timestamp" in deployment:
+                timestamps[deployment["block_number"]] = deployment["timestamp"]
+    return timestamps
+
+
+def get_block_days(block_numbers):
+    """
+    UTC day of each block, from the recorded timestamps or the header cache;
+    the rest are fetched together in batched requests and cached.
+    """
+    timestamps = load_recorded_block_timestamps()
+    missing = [block_number for block_number in block_numbers if block_number not in timestamps]
+    if missing:
+        headers = header_cache.get_headers_of_blocks(get_w3_instances(), missing)
+        timestamps.update((block_number, header["timestamp"]) for block_number, header in headers.items())
+    return {
+        block_number: datetime.fromtimestamp(timestamps[block_number], tz=timezone.utc).day
+        for block_number in block_numbers
+    }
+
+
 class TestStates:
     """Each file's date is exactly one day after previous file's date"""
 
@@ -27,11 +61,13 @@ class TestStates:
 
     def test_block_corresponds_to_day(self):
         states = load_states_sorted()
-        w3 = Web3(Web3.HTTPProvider(get_rpc()))
+        block_days = get_block_days(
+            [state["start_block"] for state in states] + [state["end_block"] for state in states]
+        )
         for state in states:
             current_day = datetime.fromisoformat(state["date"]).day
-            start_block_day = self._get_block_day(w3, state["start_block"])
-            end_block_day = self._get_block_day(w3, state["end_block"])
+            start_block_day = block_days[state["start_block"]]
+            end_block_day = block_days[state["end_block"]]
 
             assert (
                 end_block_day == current_day
@@ -42,25 +78,20 @@ class TestStates:
 
     def test_start_block_is_first_of_day(self):
         states = load_states_sorted()
-        w3 = Web3(Web3.HTTPProvider(get_rpc()))
+        block_days = get_block_days([state["start_block"] - 1 for state in states[1:]])
         for state in states[1:]:
             current_date = datetime.fromisoformat(state["date"])
-            start_block_day = self._get_block_day(w3, state["start_block"] - 1)
+            start_block_day = block_days[state["start_block"] - 1]
             assert (
                 start_block_day == (current_date - timedelta(days=1)).day
             ), f"Day {state['day_index']} start block is not the first of the day"
 
     def test_end_block_is_last_of_day(self):
         states = load_states_sorted()
-        w3 = Web3(Web3.HTTPProvider(get_rpc()))
+        block_days = get_block_days([state["end_block"] + 1 for state in states])
         for state in states:
             current_date = datetime.fromisoformat(state["date"])
-            end_block_day = self._get_block_day(w3, state["end_block"] + 1)
+            end_block_day = block_days[state["end_block"] + 1]
             assert (
                 end_block_day == (current_date + timedelta(days=1)).day
             ), f"Day {state['day_index']} end block is not the last of the day"
-
-    def _get_block_day(self, w3, block_number):
-        return datetime.fromtimestamp(
-            w3.eth.get_block(block_number).timestamp, tz=timezone.utc
-        ).day
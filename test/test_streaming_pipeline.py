@@ -0,0 +1,65 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import daily_states_and_points, streaming_pipeline
+from src.aggregate_daily_points import aggregate_daily_points
+from src.daily_states_and_points import process_daily_states_and_points
+from src.utils.event_repository import event_repository
+from src.utils.json_backend import load_json
+from benchmarks.synthetic_chain import SyntheticChain
+from test.utils.synthetic_pipeline import ingest, prepare_workdir
+
+
+@pytest.fixture(autouse=True)
+def clear_event_repository():
+    yield
+    event_repository.clear()
+
+
+def read_outputs(data_dir):
+    """Every file under data/, without the export timestamps and the manifests that hash them"""
+    outputs = {}
+    for path in sorted(Path(data_dir).rglob("*.json")):
+        if path.parts[-3] == "manifests":
+            continue
+        data = load_json(str(path))
+        data.get("metadata", {}).pop("exportedAt", None)
+        outputs[str(path.relative_to(data_dir))] = data
+    return outputs
+
+
+class TestStreamingPipeline:
+    def test_writes_same_data_as_stage_by_stage_run(self, tmp_path, monkeypatch):
+        """Test that streaming days through the stages gives the files of running the stages one after another"""
+        chain = SyntheticChain(days_amount=3, holders_amount=10, transfers_per_day=30, nft_transfers_per_day=5)
+
+        prepare_workdir(tmp_path / "stages", chain, monkeypatch)
+        ingest()
+        process_daily_states_and_points()
+        aggregate_daily_points()
+
+        prepare_workdir(tmp_path / "streaming", chain, monkeypatch)
+        assert streaming_pipeline.run_pipeline(queue_size=1) == 4  # deployment day and three full days
+
+        stages_outputs = read_outputs(tmp_path / "stages" / "data")
+        streaming_outputs = read_outputs(tmp_path / "streaming" / "data")
+        assert "aggregated_points/3.json" in streaming_outputs
+        assert streaming_outputs == stages_outputs
+
+    def test_failing_stage_stops_pipeline(self, tmp_path, monkeypatch):
+        """Test that an error in one stage is raised instead of leaving the other stages waiting"""
+        chain = SyntheticChain(days_amount=3, holders_amount=5, transfers_per_day=10, nft_transfers_per_day=2)
+        prepare_workdir(tmp_path, chain, monkeypatch)
+
+        def failing_process_day(day_index, user_state_before_start_block):
+            raise ValueError(f"cannot process day {day_index}")
+
+        monkeypatch.setattr(daily_states_and_points, "process_day", failing_process_day)
+        with pytest.raises(RuntimeError, match="states and points"):
+            streaming_pipeline.run_pipeline(queue_size=1)
+        assert not os.path.exists("data/aggregated_points")
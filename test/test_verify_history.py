@@ -0,0 +1,94 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.daily_states_and_points import process_daily_states_and_points
+from src.utils.event_repository import event_repository
+from src.utils.get_additional_data import get_end_block_for_day, get_start_block_for_day
+from src.utils.json_backend import load_json, dump_json
+from src.verify_history import LEDGER_FILE, get_strata, sample_addresses, verify_history
+from benchmarks.synthetic_chain import SyntheticChain
+from test.utils.synthetic_pipeline import EMPTY_LP_BALANCES_SNAPSHOT, ingest, prepare_workdir
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    """States and points of a synthetic chain with holders that have no events on some days"""
+    chain = SyntheticChain(days_amount=3, holders_amount=20, transfers_per_day=4, nft_transfers_per_day=3)
+    prepare_workdir(tmp_path, chain, monkeypatch)
+    ingest()
+    process_daily_states_and_points()
+    yield chain
+    event_repository.clear()
+
+
+def get_verified_pairs():
+    ledger = load_json(LEDGER_FILE)
+    return {(day_index, address) for day_index, entry in ledger["days"].items() for address in entry["verified"]}
+
+
+class TestVerifyHistory:
+    def test_sample_draws_from_every_balance_stratum(self):
+        holders = {f"0x{i:040x}": (i * 10**18, []) for i in range(40)}
+        sample = sample_addresses(holders, set(), 8, random.Random(0))
+        strata = get_strata(holders)
+        assert len(sample) == 4
+        assert [sum(address in stratum for address in sample) for stratum in strata] == [1, 1, 1, 1]
+
+    def test_runs_cover_new_pairs_until_history_is_verified(self, history):
+        """Test that each budgeted run verifies pairs earlier runs didn't, until all are covered"""
+        assert verify_history(max_calls=40, seed=0) == {}
+        first_run = get_verified_pairs()
+        assert 0 < len(first_run) <= 20
+
+        assert verify_history(max_calls=40, seed=0) == {}
+        second_run = get_verified_pairs()
+        assert first_run < second_run
+        assert len(second_run) - len(first_run) >= 10
+
+        assert verify_history(max_calls=10000, seed=0) == {}
+        ledger = load_json(LEDGER_FILE)
+        assert len(ledger["days"]) == 4
+        assert all(len(entry["verified"]) == entry["holders"] for entry in ledger["days"].values())
+
+    def test_wrong_balance_and_points_are_reported_and_rechecked(self, history):
+        state = load_json("data/states/2.json")
+        holder = next(iter(state["pilot_vault"]["end_state"]))
+        state["pilot_vault"]["end_state"][holder]["balance"] += 1
+        dump_json(state, "data/states/2.json")
+        # A holder without events on day 3 gets points for its end state on every block
+        events = load_json("data/events/pilot_vault/3.json")["events"] + load_json("data/events/nft/3.json")["events"]
+        active = {event["args"][key].lower() for event in events for key in ("from", "to")}
+        points = load_json("data/points/3.json")
+        quiet_holder = next(address for address in points["points"] if address not in active)
+        points["points"][quiet_holder] -= 1
+        dump_json(points, "data/points/3.json")
+
+        failures = verify_history(max_calls=10000, seed=0)
+        assert set(failures) == {2, 3}
+        assert "pilot vault balance" in failures[2][holder]
+        assert "points of a day without events" in failures[3][quiet_holder]
+        assert ("2", holder) not in get_verified_pairs()
+        # Failed pairs stay unverified and are checked again
+        assert set(verify_history(max_calls=10000, seed=0)) == {2, 3}
+
+    def test_no_quiet_points_before_lp_snapshot(self, tmp_path, monkeypatch):
+        """Test that quiet holders are only expected to get points for the blocks after the LP snapshot"""
+        chain = SyntheticChain(days_amount=3, holders_amount=20, transfers_per_day=4, nft_transfers_per_day=3)
+        prepare_workdir(tmp_path, chain, monkeypatch)
+        ingest()
+        snapshot_start_block = (get_start_block_for_day(2) + get_end_block_for_day(2)) // 2
+        dump_json(
+            {**EMPTY_LP_BALANCES_SNAPSHOT, "start_block": snapshot_start_block, "end_block": snapshot_start_block},
+            "data/lp_balances_snapshot.json",
+        )
+        process_daily_states_and_points()
+        assert load_json("data/points/1.json")["points"] == {}
+        assert load_json("data/points/2.json")["points"]
+
+        assert verify_history(max_calls=10000, seed=0) == {}
+        event_repository.clear()
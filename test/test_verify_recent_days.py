@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import find_daily_blocks, find_deployment_blocks, nft_events, pilot_vault_events
+from src.verify_recent_days import verify_recent_days
+from src.utils.header_cache import BUCKET_SIZE, header_cache
+from src.utils.json_backend import load_json
+from benchmarks.synthetic_chain import BLOCKS_PER_DAY, SyntheticChain
+from test.utils.synthetic_pipeline import ROOT, prepare_workdir
+
+
+@pytest.fixture(autouse=True)
+def clean_header_cache():
+    header_cache.clear()
+    yield
+    header_cache.clear()
+
+
+def ingest():
+    """Fetch the chain's days, searching the deployments only on the first run"""
+    if not os.path.exists("data/deployment_blocks.json"):
+        find_deployment_blocks.main()
+    find_daily_blocks.main()
+    nft_events.main()
+    pilot_vault_events.main()
+
+
+class TestVerifyRecentDays:
+    def test_only_days_ending_before_finalized_block_are_saved(self, tmp_path, monkeypatch):
+        """Test that the day holding the finalized block and the days after it are not saved"""
+        chain = SyntheticChain(days_amount=3, holders_amount=5, transfers_per_day=10, finality_lag=BLOCKS_PER_DAY)
+        prepare_workdir(tmp_path, chain, monkeypatch, lp_balances_snapshot=None)
+        ingest()
+        day_files = nft_events.get_day_block_files()
+        assert len(day_files) == 3
+        for _, path in day_files:
+            day_blocks = load_json(path)
+            assert day_blocks["first_block_of_next_day"]["number"] <= chain.finalized_block
+
+    def test_reorg_in_trailing_window_refetches_affected_days(self, tmp_path, monkeypatch):
+        """Test that a reorg removes and refetches only the days whose stored hashes changed"""
+        chain = SyntheticChain(days_amount=3, holders_amount=10, transfers_per_day=30, nft_transfers_per_day=5)
+        prepare_workdir(tmp_path, chain, monkeypatch, lp_balances_snapshot=None)
+        ingest()
+        assert verify_recent_days(2) == []
+        exported_at = {
+            path: load_json(path)["metadata"]["exportedAt"] for path in map(str, Path("data/events").rglob("*.json"))
+        }
+
+        chain.reorg(3 * BLOCKS_PER_DAY + 100)  # in the middle of day 3
+        assert verify_recent_days(2) == [3]
+        assert not os.path.exists("data/events/nft/3.json")
+
+        ingest()
+        assert verify_recent_days(2) == []
+        for path, day_exported_at in exported_at.items():
+            unchanged = load_json(path)["metadata"]["exportedAt"] == day_exported_at
+            assert unchanged == (not path.endswith("/3.json")), path
+        events = load_json("data/events/pilot_vault/3.json")
+        assert events["metadata"]["endBlockHash"] == chain.get_block_hash(events["metadata"]["endBlock"])
+
+    def test_events_file_of_replaced_end_block_is_refetched(self, tmp_path, monkeypatch):
+        """Test that the fetchers refetch a day whose last block hash changed even if its file is kept"""
+        chain = SyntheticChain(days_amount=2, holders_amount=5, transfers_per_day=10)
+        prepare_workdir(tmp_path, chain, monkeypatch, lp_balances_snapshot=None)
+        ingest()
+        exported_at = load_json("data/events/nft/2.json")["metadata"]["exportedAt"]
+
+        chain.reorg(3 * BLOCKS_PER_DAY - 1)  # the last block of day 2
+        ingest()
+        events = load_json("data/events/nft/2.json")
+        assert events["metadata"]["exportedAt"] != exported_at
+        assert events["metadata"]["endBlockHash"] == chain.get_block_hash(3 * BLOCKS_PER_DAY - 1)
+
+    def test_reorg_removes_cached_headers_of_day(self, tmp_path, monkeypatch):
+        """Test that the cached headers of a removed day are dropped and fetched again from the chain"""
+        chain = SyntheticChain(days_amount=3, holders_amount=10, transfers_per_day=30, nft_transfers_per_day=5)
+        with open(ROOT / "config.json") as f:
+            config = json.load(f)
+        config["LOGS_BLOOM_PREFILTER"] = True
+        prepare_workdir(tmp_path, chain, monkeypatch, lp_balances_snapshot=None, config=config)
+        ingest()
+        buckets = set(os.listdir("data/cache/headers"))
+        day_files = dict(nft_events.get_day_block_files())
+        first_block = load_json(day_files[2])["last_block_of_day"]["number"] + 1
+        last_block = load_json(day_files[3])["first_block_of_next_day"]["number"]
+
+        reorged_block = 3 * BLOCKS_PER_DAY + 100
+        chain.reorg(reorged_block)
+        assert verify_recent_days(2) == [3]
+        day_buckets = {
+            f"{bucket}.json" for bucket in range(first_block - first_block % BUCKET_SIZE, last_block + 1, BUCKET_SIZE)
+        }
+        assert day_buckets < buckets
+        assert set(os.listdir("data/cache/headers")) == buckets - day_buckets
+        assert header_cache.get_cached(reorged_block) is None
+
+        ingest()
+        assert header_cache.get_cached(reorged_block)["hash"] == chain.get_block_hash(reorged_block)
@@ -1,15 +1,15 @@
 from pathlib import Path
-import json
+from src.utils.event_repository import event_repository
 
 DATA_DIR = Path("data")
 EVENTS_DIR = DATA_DIR / "events"
 
 def load_events_sorted(folder_name):
     events_dir = EVENTS_DIR / folder_name
-    events = sorted(events_dir.glob("*.json"), key=lambda f: int(f.stem))
-    events_data = [json.loads(f.read_text()) for f in events]
-    events_sorted = sorted(
-        [event for data in events_data for event in data["events"]],
-        key=lambda x: (x["blockNumber"], x["transactionIndex"], x["logIndex"]),
-    )
+    day_indexes = sorted(int(f.stem) for f in events_dir.glob("*.json"))
+    events_sorted = []
+    for _, day_events in event_repository.iter_days(day_indexes):
+        block_number_to_events = day_events.nft if folder_name == "nft" else day_events.transfer
+        for block_number in sorted(block_number_to_events):
+            events_sorted.extend(block_number_to_events[block_number])
     return events_sorted
@@ -0,0 +1,120 @@
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+ZERO_ADDRESS = "0x" + "0" * 40
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2))
+
+
+def write_synthetic_data(root, days_amount=4, blocks_per_day=60, users_amount=12, seed=0):
+    """
+    Write a consistent data/ directory (deployments, day boundaries, NFT and
+    pilot vault events, LP snapshot) under `root`. Transfers never overdraw,
+    some send a holder's whole balance, and NFTs are only moved by their
+    owners. NFTs only go to the first half of the users, so the others stop
+    being holders when they are drained and become holders again when refilled.
+    """
+    rng = random.Random(seed)
+    data_dir = Path(root) / "data"
+    first_block = 1000
+    nft_deployment_block = first_block
+    pilot_vault_deployment_block = first_block + blocks_per_day // 2
+
+    _write(data_dir / "deployment_blocks.json", {
+        "deployments": {
+            "nft": {"address": "0xf478", "deployment_block": nft_deployment_block, "block_number": nft_deployment_block},
+            "pilot_vault": {"address": "0xa260", "deployment_block": pilot_vault_deployment_block, "block_number": pilot_vault_deployment_block},
+        }
+    })
+
+    users = ["0x" + "%040x" % rng.getrandbits(160) for _ in range(users_amount)]
+    balances = {user: 0 for user in users}
+    token_owners = {}
+    first_day = date(2025, 9, 1)
+
+    for day_index in range(days_amount):
+        start_block = first_block + day_index * blocks_per_day
+        end_block = start_block + blocks_per_day - 1
+        day = str(first_day + timedelta(days=day_index))
+        _write(data_dir / "days_blocks" / f"{day_index}_{day}.json", {
+            "day": day,
+            "last_block_of_day": {"number": end_block, "timestamp": end_block * 12, "utc_datetime": "", "hash": "0x%064x" % end_block},
+            "first_block_of_next_day": {"number": end_block + 1, "timestamp": (end_block + 1) * 12, "utc_datetime": "", "hash": "0x%064x" % (end_block + 1)},
+            "is_final_day": False,
+        })
+
+        nft_events, transfer_events = [], []
+        for block_number in sorted(rng.sample(range(start_block, end_block + 1), blocks_per_day // 4)):
+            for log_index in range(rng.randint(1, 3)):
+                event = {
+                    "blockNumber": block_number,
+                    "transactionHash": "0x%064x" % rng.getrandbits(256),
+                    "logIndex": log_index,
+                    "transactionIndex": log_index,
+                }
+                if rng.random() < 0.4:
+                    if not token_owners or rng.random() < 0.5:
+                        token_id, from_addr = len(token_owners) + 1, ZERO_ADDRESS
+                    else:
+                        token_id = rng.choice(sorted(token_owners))
+                        from_addr = token_owners[token_id]
+                    to_addr = rng.choice(users[: users_amount // 2])
+                    token_owners[token_id] = to_addr
+                    event["args"] = {"from": from_addr, "to": to_addr, "tokenId": token_id}
+                    nft_events.append(event)
+                elif block_number >= pilot_vault_deployment_block:
+                    holders = [user for user in users if balances[user] > 1]
+                    if not holders or rng.random() < 0.3:
+                        from_addr, value = ZERO_ADDRESS, rng.randrange(10**17, 10**21)
+                    else:
+                        from_addr = rng.choice(holders)
+                        drain = rng.random() < 0.2
+                        value = balances[from_addr] if drain else rng.randrange(1, balances[from_addr])
+                    to_addr = ZERO_ADDRESS if rng.random() < 0.1 else rng.choice(users)
+                    if from_addr != ZERO_ADDRESS:
+                        balances[from_addr] -= value
+                    if to_addr != ZERO_ADDRESS:
+                        balances[to_addr] += value
+                    event["args"] = {"from": from_addr, "to": to_addr, "value": value}
+                    transfer_events.append(event)
+
+        rng.shuffle(nft_events)
+        rng.shuffle(transfer_events)
+        for folder, events, deployment_block in (
+            ("nft", nft_events, nft_deployment_block),
+            ("pilot_vault", transfer_events, pilot_vault_deployment_block),
+        ):
+            events_start_block = start_block if day_index > 0 else deployment_block
+            _write(data_dir / "events" / folder / f"{day_index}.json", {
+                "error": False,
+                "metadata": {
+                    "contractAddress": "0x",
+                    "eventName": "Transfer",
+                    "startBlock": events_start_block,
+                    "endBlock": end_block,
+                    "totalEvents": len(events),
+                    "exportedAt": "",
+                },
+                "events": events,
+            })
+
+    _write(data_dir / "lp_balances_snapshot.json", {
+        "start_block": first_block + blocks_per_day + blocks_per_day // 3,
+        "end_block": first_block + blocks_per_day + blocks_per_day // 3,
+        "date": str(first_day),
+        "day_index": 0,
+        "nft": {"start_state": {}, "end_state": {}},
+        "pilot_vault": {
+            "start_state": {
+                user: {"balance": 10**18, "last_positive_balance_update_block": 0, "last_negative_balance_update_block": 0}
+                for user in users[:3]
+            },
+            "end_state": {},
+        },
+    })
+    return data_dir
@@ -0,0 +1,94 @@
+"""
+Running the pipeline in a test against a SyntheticChain
+(benchmarks/synthetic_chain.py) instead of the RPC endpoints.
+"""
+import json
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+
+from src import find_daily_blocks, find_deployment_blocks, nft_events, pilot_vault_events
+from src.utils import aggregated_w3_request
+from src.utils.aggregated_w3_request import ProviderManager
+from src.utils.event_repository import event_repository
+from src.utils.json_backend import dump_json
+from benchmarks.synthetic_chain import SyntheticChainProvider
+
+ROOT = Path(__file__).parent.parent.parent
+
+EMPTY_LP_BALANCES_SNAPSHOT = {
+    "start_block": 0,
+    "end_block": 0,
+    "date": "2024-12-31",
+    "day_index": 0,
+    "nft": {"start_state": {}, "end_state": {}},
+    "pilot_vault": {"start_state": {}, "end_state": {}},
+}
+
+
+class CountingProvider(SyntheticChainProvider):
+    """Counts its requests in `calls` by (endpoint, method), batch items included, and its batches' sizes"""
+
+    def __init__(self, chain, endpoint_uri, calls, batch_sizes=None):
+        super().__init__(chain, endpoint_uri)
+        self.calls = calls
+        self.batch_sizes = batch_sizes
+
+    def make_request(self, method, params):
+        self.calls[(self.endpoint_uri, method)] += 1
+        return super().make_request(method, params)
+
+    def make_batch_request(self, requests):
+        if self.batch_sizes is not None:
+            self.batch_sizes.append(len(requests))
+        for method, _ in requests:
+            self.calls[(self.endpoint_uri, method)] += 1
+        return super().make_batch_request(requests)
+
+
+def count_by_method(calls):
+    methods = Counter()
+    for (_, method), amount in calls.items():
+        methods[method] += amount
+    return methods
+
+
+def use_chain(chain, monkeypatch, name, calls=None, batch_sizes=None):
+    """Point every provider at `chain`, through CountingProviders when `calls` is given"""
+    for i, w3 in enumerate(aggregated_w3_request.get_w3_instances()):
+        endpoint_uri = f"synthetic://{name}-{i}"
+        if calls is None:
+            provider = SyntheticChainProvider(chain, endpoint_uri)
+        else:
+            provider = CountingProvider(chain, endpoint_uri, calls, batch_sizes)
+        monkeypatch.setattr(w3, "provider", provider)
+
+
+def prepare_workdir(workdir, chain, monkeypatch, lp_balances_snapshot=EMPTY_LP_BALANCES_SNAPSHOT, config=None):
+    """
+    Make `workdir` the working directory of a run on `chain`: its config.json
+    (the repo's unless `config` is given), a data/ directory with the LP
+    snapshot when one is given, seeded provider ranking and no retry sleeps.
+    """
+    os.makedirs(Path(workdir) / "data", exist_ok=True)
+    if config is None:
+        shutil.copy(ROOT / "config.json", Path(workdir) / "config.json")
+    else:
+        with open(Path(workdir) / "config.json", "w") as f:
+            json.dump(config, f)
+    if lp_balances_snapshot is not None:
+        dump_json(lp_balances_snapshot, str(Path(workdir) / "data" / "lp_balances_snapshot.json"))
+    monkeypatch.chdir(workdir)
+    monkeypatch.setattr(aggregated_w3_request, "provider_manager", ProviderManager(seed=0))
+    monkeypatch.setattr(nft_events.time, "sleep", lambda seconds: None)
+    event_repository.clear()
+    use_chain(chain, monkeypatch, Path(workdir).name)
+
+
+def ingest():
+    """Fetch the deployments, day boundaries and events, like main.py"""
+    find_deployment_blocks.main()
+    find_daily_blocks.main()
+    nft_events.main()
+    pilot_vault_events.main()